@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import Config
+from .models import User
+
+_admin_ids: frozenset[int] | None = None
+_generation = 0
+
+
+def invalidate_admins() -> None:
+    global _admin_ids, _generation
+    _admin_ids = None
+    _generation += 1
+
+
+async def get_admin_ids(session: AsyncSession, config: Config) -> frozenset[int]:
+    global _admin_ids
+    if _admin_ids is not None:
+        return _admin_ids
+    generation = _generation
+    db_ids = (await session.execute(select(User.tg_id).where(User.is_admin.is_(True)))).scalars().all()
+    ids = frozenset(db_ids) | frozenset(config.admin_ids)
+    if generation == _generation:
+        _admin_ids = ids
+    return ids
+
+
+async def is_admin(session: AsyncSession, config: Config, tg_id: int) -> bool:
+    return tg_id in await get_admin_ids(session, config)
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import time as _time
+from dataclasses import dataclass
+from datetime import date as dt_date, datetime, time as dt_time, timedelta
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .archive import archived_stats_tasks
+from .db import seconds_between
+from .enums import ReportStatus
+from .models import User, WorkType, Report, ReportTask, WorkSession
+
+STATS_CACHE_TTL = 60.0
+_CHUNK = 5000
+
+_cache: dict[tuple[dt_date, dt_date], tuple[float, "Stats"]] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class GroupStats:
+    name: str
+    tasks: int
+    hours: float
+
+    @property
+    def per_hour(self) -> float:
+        return self.tasks / self.hours if self.hours > 0 else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class Stats:
+    start: dt_date
+    end: dt_date
+    total_tasks: int
+    total_hours: float
+    workers: list[GroupStats]
+    cities: list[GroupStats]
+    leaders: list[GroupStats]
+    work_types: list[GroupStats]
+    city_work_types: dict[str, list[GroupStats]]
+    per_hour_percentiles: dict[int, float]
+
+
+class _Codes:
+    def __init__(self):
+        self.index: dict[object, int] = {}
+        self.names: list[object] = []
+
+    def code(self, value: object) -> int:
+        c = self.index.get(value)
+        if c is None:
+            c = len(self.names)
+            self.index[value] = c
+            self.names.append(value)
+        return c
+
+
+async def _load_columns(session: AsyncSession, start: dt_date, end: dt_date, archive_dir: str | None):
+    users = _Codes()
+    cities = _Codes()
+    leaders = _Codes()
+    wts = _Codes()
+    user_city: list[int] = []
+    user_leader: list[int] = []
+    user_name: list[str] = []
+
+    def user_code(user_id: int, first_name, last_name, tg_id, city, leader) -> int:
+        c = users.code(user_id)
+        if c == len(user_city):
+            user_city.append(cities.code(city or "-"))
+            user_leader.append(leaders.code(leader or "-"))
+            user_name.append(f"{first_name or ''} {last_name or ''}".strip() or str(tg_id))
+        return c
+
+    t_user: list[int] = []
+    t_wt: list[int] = []
+    t_qty: list[int] = []
+    tasks_stmt = (
+        select(
+            User.id, User.first_name, User.last_name, User.tg_id, User.city, User.leader,
+            WorkType.name, ReportTask.quantity,
+        )
+        .join(Report, Report.id == ReportTask.report_id)
+        .join(User, User.id == Report.user_id)
+        .join(WorkType, WorkType.id == ReportTask.work_type_id)
+        .where(Report.status != ReportStatus.REJECTED)
+        .where(Report.report_date >= start)
+        .where(Report.report_date <= end)
+    )
+    for uid, fn, ln, tg, city, leader, wt_name, qty in await archived_stats_tasks(session, archive_dir, start, end):
+        t_user.append(user_code(uid, fn, ln, tg, city, leader))
+        t_wt.append(wts.code(wt_name))
+        t_qty.append(qty)
+
+    result = await session.stream(tasks_stmt.execution_options(yield_per=_CHUNK))
+    async for partition in result.partitions(_CHUNK):
+        for uid, fn, ln, tg, city, leader, wt_name, qty in partition:
+            t_user.append(user_code(uid, fn, ln, tg, city, leader))
+            t_wt.append(wts.code(wt_name))
+            t_qty.append(qty)
+
+    s_user: list[int] = []
+    s_sec: list[float] = []
+    dialect = session.bind.dialect.name
+    sessions_stmt = (
+        select(
+            User.id, User.first_name, User.last_name, User.tg_id, User.city, User.leader,
+            seconds_between(dialect, WorkSession.started_at, WorkSession.ended_at),
+        )
+        .join(User, User.id == WorkSession.user_id)
+        .where(WorkSession.ended_at.is_not(None))
+        .where(WorkSession.started_at >= datetime.combine(start, dt_time.min))
+        .where(WorkSession.started_at <= datetime.combine(end, dt_time.max))
+    )
+    result = await session.stream(sessions_stmt.execution_options(yield_per=_CHUNK))
+    async for partition in result.partitions(_CHUNK):
+        for uid, fn, ln, tg, city, leader, seconds in partition:
+            s_user.append(user_code(uid, fn, ln, tg, city, leader))
+            s_sec.append(float(seconds or 0))
+
+    return (
+        users, cities, leaders, wts, user_name,
+        np.asarray(user_city, dtype=np.int64),
+        np.asarray(user_leader, dtype=np.int64),
+        np.asarray(t_user, dtype=np.int64),
+        np.asarray(t_wt, dtype=np.int64),
+        np.asarray(t_qty, dtype=np.int64),
+        np.asarray(s_user, dtype=np.int64),
+        np.asarray(s_sec, dtype=np.float64),
+    )
+
+
+def _groups(names: list, tasks: np.ndarray, hours: np.ndarray) -> list[GroupStats]:
+    out = [GroupStats(str(names[i]), int(tasks[i]), float(hours[i])) for i in range(len(names))]
+    out.sort(key=lambda g: g.tasks, reverse=True)
+    return out
+
+
+def invalidate_stats_cache() -> None:
+    _cache.clear()
+
+
+async def compute_stats(session: AsyncSession, start: dt_date, end: dt_date, archive_dir: str | None = None) -> Stats:
+    key = (start, end)
+    hit = _cache.get(key)
+    now = _time.monotonic()
+    if hit is not None and now - hit[0] < STATS_CACHE_TTL:
+        return hit[1]
+
+    (users, cities, leaders, wts, user_name, user_city, user_leader,
+     t_user, t_wt, t_qty, s_user, s_sec) = await _load_columns(session, start, end, archive_dir)
+
+    n_users = len(users.names)
+    n_cities = len(cities.names)
+    n_leaders = len(leaders.names)
+    n_wts = len(wts.names)
+
+    user_tasks = np.bincount(t_user, weights=t_qty, minlength=n_users)
+    user_hours = np.bincount(s_user, weights=s_sec, minlength=n_users) / 3600.0
+
+    city_tasks = np.bincount(user_city, weights=user_tasks, minlength=n_cities)
+    city_hours = np.bincount(user_city, weights=user_hours, minlength=n_cities)
+    leader_tasks = np.bincount(user_leader, weights=user_tasks, minlength=n_leaders)
+    leader_hours = np.bincount(user_leader, weights=user_hours, minlength=n_leaders)
+    wt_tasks = np.bincount(t_wt, weights=t_qty, minlength=n_wts)
+
+    t_city = user_city[t_user] if len(t_user) else t_user
+    city_wt = np.bincount(t_city * n_wts + t_wt, weights=t_qty, minlength=n_cities * n_wts)
+    city_wt = city_wt.reshape(n_cities, n_wts) if n_cities and n_wts else np.zeros((n_cities, n_wts))
+
+    worked = user_hours > 0
+    per_hour = user_tasks[worked] / user_hours[worked]
+    percentiles: dict[int, float] = {}
+    if per_hour.size:
+        for p, v in zip((50, 90, 99), np.percentile(per_hour, [50, 90, 99])):
+            percentiles[p] = float(v)
+
+    city_work_types: dict[str, list[GroupStats]] = {}
+    for ci in range(n_cities):
+        row = city_wt[ci]
+        items = [
+            GroupStats(str(wts.names[wi]), int(row[wi]), float(city_hours[ci]))
+            for wi in np.flatnonzero(row)
+        ]
+        items.sort(key=lambda g: g.tasks, reverse=True)
+        city_work_types[str(cities.names[ci])] = items
+
+    stats = Stats(
+        start=start,
+        end=end,
+        total_tasks=int(t_qty.sum()),
+        total_hours=float(user_hours.sum()),
+        workers=_groups(user_name, user_tasks, user_hours),
+        cities=_groups(cities.names, city_tasks, city_hours),
+        leaders=_groups(leaders.names, leader_tasks, leader_hours),
+        work_types=_groups(wts.names, wt_tasks, np.full(n_wts, user_hours.sum())),
+        city_work_types=city_work_types,
+        per_hour_percentiles=percentiles,
+    )
+    if len(_cache) > 32:
+        _cache.clear()
+    _cache[key] = (now, stats)
+    return stats
+
+
+def default_window(days: int = 7) -> tuple[dt_date, dt_date]:
+    end = dt_date.today()
+    return end - timedelta(days=days - 1), end
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import gzip
+import json
+import os
+from datetime import date, datetime, time
+from enum import Enum
+from typing import Any, Callable
+
+from sqlalchemy import Table, select, delete, Date, DateTime, Time, LargeBinary, Enum as SAEnum
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .enums import ReportStatus
+from .models import User, WorkType, Report, ReportTask, ReportMedia, ReportEditLog, Problem, ProblemMedia
+
+ARCHIVE_BATCH = 1000
+
+_REPORT_CHILDREN = (ReportTask, ReportMedia, ReportEditLog)
+_PROBLEM_CHILDREN = (ProblemMedia,)
+_TABLES: dict[str, Table] = {
+    t.name: t
+    for t in (Report.__table__, ReportTask.__table__, ReportMedia.__table__, ReportEditLog.__table__,
+              Problem.__table__, ProblemMedia.__table__)
+}
+
+
+def _suffix() -> str:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return ".jsonl.gz"
+    return ".jsonl.zst"
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    return value
+
+
+def _decoder(column) -> Callable[[Any], Any] | None:
+    t = column.type
+    if isinstance(t, SAEnum):
+        return lambda v: t.enum_class[v]
+    if isinstance(t, DateTime):
+        return datetime.fromisoformat
+    if isinstance(t, Date):
+        return date.fromisoformat
+    if isinstance(t, Time):
+        return time.fromisoformat
+    if isinstance(t, LargeBinary):
+        return base64.b64decode
+    return None
+
+
+def _write_part(path: str, rows: list[dict]) -> None:
+    data = "".join(json.dumps({k: _encode(v) for k, v in row.items()}, ensure_ascii=False) + "\n" for row in rows).encode()
+    if path.endswith(".zst"):
+        import zstandard
+
+        data = zstandard.ZstdCompressor(level=10).compress(data)
+    else:
+        data = gzip.compress(data, compresslevel=9)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def _read_part(path: str) -> list[str]:
+    with open(path, "rb") as fh:
+        data = fh.read()
+    if path.endswith(".zst"):
+        import zstandard
+
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        data = gzip.decompress(data)
+    return data.decode().splitlines()
+
+
+def _months(start: date, end: date) -> list[str]:
+    out = []
+    y, m = start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        out.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+
+def _month_parts(archive_dir: str, table: str, start: date, end: date) -> list[str]:
+    parts = []
+    for month in _months(start, end):
+        folder = os.path.join(archive_dir, table, month)
+        if os.path.isdir(folder):
+            parts.extend(
+                os.path.join(folder, name) for name in sorted(os.listdir(folder))
+                if name.endswith((".jsonl.gz", ".jsonl.zst"))
+            )
+    return parts
+
+
+def has_archive(archive_dir: str | None, table: str, start: date, end: date) -> bool:
+    return bool(archive_dir) and bool(_month_parts(archive_dir, table, start, end))
+
+
+def read_archived(archive_dir: str, table: str, start: date, end: date) -> list[dict]:
+    columns = _TABLES[table].c
+    decoders = {c.name: _decoder(c) for c in columns}
+    rows: dict[int, dict] = {}
+    for path in _month_parts(archive_dir, table, start, end):
+        for line in _read_part(path):
+            raw = json.loads(line)
+            for key, value in raw.items():
+                dec = decoders.get(key)
+                if dec is not None and value is not None:
+                    raw[key] = dec(value)
+            rows[raw["id"]] = raw
+    return [rows[k] for k in sorted(rows)]
+
+
+async def _archive_batch(
+    session: AsyncSession,
+    archive_dir: str,
+    parent: type,
+    children: tuple[type, ...],
+    fk: str,
+    where,
+    month_of: Callable[[dict], date],
+    batch: int,
+) -> int:
+    parents = [dict(r) for r in (await session.execute(
+        select(parent.__table__).where(where).order_by(parent.id).limit(batch)
+    )).mappings().all()]
+    if not parents:
+        return 0
+
+    ids = [r["id"] for r in parents]
+    month = {r["id"]: month_of(r).strftime("%Y-%m") for r in parents}
+    tables: list[tuple[Table, list[dict], Callable[[dict], str]]] = [
+        (parent.__table__, parents, lambda r: month[r["id"]])
+    ]
+    for child in children:
+        rows = [dict(r) for r in (await session.execute(
+            select(child.__table__).where(getattr(child, fk).in_(ids)).order_by(child.id)
+        )).mappings().all()]
+        tables.append((child.__table__, rows, lambda r: month[r[fk]]))
+
+    suffix = _suffix()
+    name = f"part-{ids[0]:09d}-{ids[-1]:09d}{suffix}"
+
+    def write() -> None:
+        for table, rows, key in tables:
+            grouped: dict[str, list[dict]] = {}
+            for row in rows:
+                grouped.setdefault(key(row), []).append(row)
+            for m, items in grouped.items():
+                _write_part(os.path.join(archive_dir, table.name, m, name), items)
+
+    await asyncio.to_thread(write)
+
+    for child in children:
+        await session.execute(delete(child).where(getattr(child, fk).in_(ids)))
+    await session.execute(delete(parent).where(parent.id.in_(ids)))
+    await session.commit()
+    return len(ids)
+
+
+async def archive_old_records(
+    session: AsyncSession,
+    archive_dir: str,
+    cutoff: date,
+    batch: int = ARCHIVE_BATCH,
+    max_batches: int = 50,
+    on_batch: Callable[[], Any] | None = None,
+) -> dict[str, int]:
+    counts = {"reports": 0, "problems": 0}
+    for _ in range(max_batches):
+        n = await _archive_batch(
+            session, archive_dir, Report, _REPORT_CHILDREN, "report_id",
+            (Report.report_date < cutoff) & (Report.status != ReportStatus.PENDING),
+            lambda r: r["report_date"], batch,
+        )
+        counts["reports"] += n
+        if n and on_batch is not None:
+            on_batch()
+        if n < batch:
+            break
+    for _ in range(max_batches):
+        n = await _archive_batch(
+            session, archive_dir, Problem, _PROBLEM_CHILDREN, "problem_id",
+            Problem.created_at < datetime.combine(cutoff, time.min),
+            lambda r: r["created_at"], batch,
+        )
+        counts["problems"] += n
+        if n < batch:
+            break
+    return counts
+
+
+async def _lookups(session: AsyncSession, user_ids: set[int], work_type_ids: set[int]) -> tuple[dict, dict]:
+    users = {}
+    if user_ids:
+        users = {u.id: u for u in (await session.execute(select(User).where(User.id.in_(user_ids)))).scalars()}
+    work_types = {}
+    if work_type_ids:
+        work_types = dict((await session.execute(
+            select(WorkType.id, WorkType.name).where(WorkType.id.in_(work_type_ids))
+        )).all())
+    return users, work_types
+
+
+async def _archived_reports(
+    session: AsyncSession, archive_dir: str, start: date, end: date, with_tasks: bool,
+) -> tuple[dict[int, dict], list[dict]]:
+    live = set((await session.execute(
+        select(Report.id).where(Report.report_date >= start).where(Report.report_date <= end)
+    )).scalars())
+
+    def load() -> tuple[dict[int, dict], list[dict]]:
+        reports = {
+            r["id"]: r for r in read_archived(archive_dir, "reports", start, end)
+            if start <= r["report_date"] <= end and r["id"] not in live
+        }
+        tasks = []
+        if with_tasks:
+            tasks = [t for t in read_archived(archive_dir, "report_tasks", start, end) if t["report_id"] in reports]
+        return reports, tasks
+
+    return await asyncio.to_thread(load)
+
+
+async def archived_stats_tasks(session: AsyncSession, archive_dir: str | None, start: date, end: date) -> list[tuple]:
+    if not has_archive(archive_dir, "reports", start, end):
+        return []
+    reports, tasks = await _archived_reports(session, archive_dir, start, end, with_tasks=True)
+    users, work_types = await _lookups(
+        session, {r["user_id"] for r in reports.values()}, {t["work_type_id"] for t in tasks},
+    )
+    out = []
+    for t in tasks:
+        r = reports[t["report_id"]]
+        u = users.get(r["user_id"])
+        if r["status"] == ReportStatus.REJECTED or u is None:
+            continue
+        out.append((u.id, u.first_name, u.last_name, u.tg_id, u.city, u.leader,
+                    work_types.get(t["work_type_id"], "-"), t["quantity"]))
+    return out
+
+
+async def archived_payroll_tasks(session: AsyncSession, archive_dir: str | None, start: date, end: date) -> list[tuple]:
+    if not has_archive(archive_dir, "reports", start, end):
+        return []
+    reports, tasks = await _archived_reports(session, archive_dir, start, end, with_tasks=True)
+    out = []
+    for t in tasks:
+        r = reports[t["report_id"]]
+        if r["status"] != ReportStatus.ACCEPTED:
+            continue
+        out.append((r["user_id"], t["work_type_id"], t["quantity"]))
+    return out
+
+
+async def archived_export_rows(
+    session: AsyncSession,
+    archive_dir: str | None,
+    kind: str,
+    start: date,
+    end: date,
+) -> list[tuple]:
+    if kind in ("reports", "tasks"):
+        if not has_archive(archive_dir, "reports", start, end):
+            return []
+        reports, tasks = await _archived_reports(session, archive_dir, start, end, with_tasks=True)
+        users, work_types = await _lookups(
+            session, {r["user_id"] for r in reports.values()}, {t["work_type_id"] for t in tasks},
+        )
+        if kind == "reports":
+            totals: dict[int, int] = {}
+            for t in tasks:
+                totals[t["report_id"]] = totals.get(t["report_id"], 0) + t["quantity"]
+            out = []
+            for r in reports.values():
+                u = users.get(r["user_id"])
+                if u is None:
+                    continue
+                out.append((
+                    r["id"], r["report_date"], r["start_time"], r["end_time"],
+                    u.tg_id, u.first_name, u.last_name, u.position, u.city, u.leader,
+                    r["partner_name"], totals.get(r["id"], 0), r["comment"], r["status"],
+                    r["admin_comment"], r["edit_count"], r["created_at"],
+                ))
+            return out
+        out = []
+        for t in tasks:
+            r = reports[t["report_id"]]
+            u = users.get(r["user_id"])
+            if u is None:
+                continue
+            out.append((
+                r["id"], r["report_date"], u.tg_id, u.first_name, u.last_name, u.city, u.leader,
+                work_types.get(t["work_type_id"], "-"), t["quantity"], r["status"],
+            ))
+        return out
+
+    if kind == "problems":
+        if not has_archive(archive_dir, "problems", start, end):
+            return []
+        lo, hi = datetime.combine(start, time.min), datetime.combine(end, time.max)
+        live = set((await session.execute(
+            select(Problem.id).where(Problem.created_at >= lo).where(Problem.created_at <= hi)
+        )).scalars())
+        problems = [
+            p for p in await asyncio.to_thread(read_archived, archive_dir, "problems", start, end)
+            if lo <= p["created_at"] <= hi and p["id"] not in live
+        ]
+        users, _ = await _lookups(session, {p["user_id"] for p in problems}, set())
+        out = []
+        for p in problems:
+            u = users.get(p["user_id"])
+            if u is None:
+                continue
+            out.append((
+                p["id"], p["created_at"], u.tg_id, u.first_name, u.last_name, u.city, p["problem_type"],
+                p["description"], p["address"], p["scooter_number"], p["urgency"],
+            ))
+        return out
+
+    return []
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .enums import DeliveryStatus
+from .models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.005
+BACKUP_PREFIX = "bot-"
+BACKUP_SUFFIX = ".db"
+RESTORED_OUTBOX_ERROR = "restored from backup, not resent"
+
+_lock = asyncio.Lock()
+
+
+@dataclass(frozen=True, slots=True)
+class BackupInfo:
+    name: str
+    path: str
+    size: int
+    sha256: str
+    created_at: datetime
+
+
+def sqlite_path(database_url: str) -> str | None:
+    url = make_url(database_url)
+    if not url.drivername.startswith("sqlite") or url.database in (None, "", ":memory:"):
+        return None
+    return os.path.abspath(url.database)
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _integrity_ok(path: str) -> bool:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    finally:
+        conn.close()
+
+
+def _copy(src_path: str, dst_path: str, pages: int = BACKUP_PAGES) -> None:
+    src = sqlite3.connect(src_path)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst, pages=pages, sleep=BACKUP_SLEEP)
+    finally:
+        dst.close()
+        src.close()
+
+
+def _info(path: str, sha256: str) -> BackupInfo:
+    st = os.stat(path)
+    return BackupInfo(
+        name=os.path.basename(path),
+        path=path,
+        size=st.st_size,
+        sha256=sha256,
+        created_at=datetime.fromtimestamp(st.st_mtime),
+    )
+
+
+def _read_checksum(path: str) -> str | None:
+    try:
+        with open(path + ".sha256", encoding="utf-8") as fh:
+            return fh.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+
+def _backup_sync(db_path: str, backup_dir: str, keep: int | None) -> BackupInfo:
+    os.makedirs(backup_dir, exist_ok=True)
+    name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]}{BACKUP_SUFFIX}"
+    path = os.path.join(backup_dir, name)
+    tmp = path + ".tmp"
+
+    try:
+        _copy(db_path, tmp)
+        if not _integrity_ok(tmp):
+            raise RuntimeError(f"Backup {name} failed integrity check.")
+        digest = _sha256(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    with open(path + ".sha256", "w", encoding="utf-8") as fh:
+        fh.write(f"{digest}  {name}\n")
+
+    if keep is not None:
+        _rotate(backup_dir, keep)
+    return _info(path, digest)
+
+
+def _rotate(backup_dir: str, keep: int) -> None:
+    for old in _list_sync(backup_dir)[keep:]:
+        for p in (old.path, old.path + ".sha256"):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+
+def _list_sync(backup_dir: str) -> list[BackupInfo]:
+    if not os.path.isdir(backup_dir):
+        return []
+    names = sorted(
+        (n for n in os.listdir(backup_dir) if n.startswith(BACKUP_PREFIX) and n.endswith(BACKUP_SUFFIX)),
+        reverse=True,
+    )
+    out = []
+    for n in names:
+        path = os.path.join(backup_dir, n)
+        out.append(_info(path, _read_checksum(path) or ""))
+    return out
+
+
+def _verify_sync(path: str) -> bool:
+    expected = _read_checksum(path)
+    return expected is not None and _sha256(path) == expected and _integrity_ok(path)
+
+
+async def make_backup(db_path: str, backup_dir: str, keep: int) -> BackupInfo:
+    async with _lock:
+        return await asyncio.to_thread(_backup_sync, db_path, backup_dir, keep)
+
+
+async def list_backups(backup_dir: str) -> list[BackupInfo]:
+    return await asyncio.to_thread(_list_sync, backup_dir)
+
+
+async def verify_backup(path: str) -> bool:
+    return await asyncio.to_thread(_verify_sync, path)
+
+
+def resolve_backup(backup_dir: str, name: str) -> str | None:
+    if os.path.basename(name) != name or not name.startswith(BACKUP_PREFIX) or not name.endswith(BACKUP_SUFFIX):
+        return None
+    path = os.path.join(backup_dir, name)
+    return path if os.path.isfile(path) else None
+
+
+async def restore_backup(engine: AsyncEngine, db_path: str, backup_path: str, backup_dir: str, keep: int) -> BackupInfo:
+    async with _lock:
+        if not await asyncio.to_thread(_verify_sync, backup_path):
+            raise ValueError(f"Backup {os.path.basename(backup_path)} failed verification.")
+        safety = await asyncio.to_thread(_backup_sync, db_path, backup_dir, None)
+        await engine.dispose()
+        await asyncio.to_thread(_copy, backup_path, db_path, -1)
+        await engine.dispose()
+        async with engine.begin() as conn:
+            dropped = (await conn.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.status == DeliveryStatus.PENDING)
+                .values(status=DeliveryStatus.FAILED, error=RESTORED_OUTBOX_ERROR)
+            )).rowcount
+        await asyncio.to_thread(_rotate, backup_dir, keep)
+    logger.info("Restored %s (previous state saved as %s).", backup_path, safety.name)
+    if dropped:
+        logger.warning("Marked %s pending notification(s) from the backup as failed.", dropped)
+    return safety
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .db import commit
+from .models import Broadcast
+from .repositories import (
+    list_pending_deliveries,
+    record_deliveries,
+    finish_broadcast,
+    list_running_broadcast_ids,
+)
+from .sender import RateLimitedSender
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+PROGRESS_EVERY = 3.0
+
+_running: dict[int, asyncio.Task] = {}
+
+
+def progress_text(bc: Broadcast) -> str:
+    done = bc.sent + bc.failed
+    head = "✅ Рассылка завершена" if bc.finished_at else "📣 Рассылка идёт"
+    return (
+        f"{head} <b>#{bc.id}</b>\n"
+        f"Доставлено: <b>{bc.sent}</b>, ошибок: <b>{bc.failed}</b>, всего: <b>{bc.total}</b>\n"
+        f"Прогресс: {done}/{bc.total}"
+    )
+
+
+async def _report_progress(bot: Bot, bc: Broadcast) -> None:
+    if bc.progress_chat_id is None or bc.progress_message_id is None:
+        return
+    try:
+        await bot.edit_message_text(
+            progress_text(bc),
+            chat_id=bc.progress_chat_id,
+            message_id=bc.progress_message_id,
+        )
+    except Exception:
+        pass
+
+
+async def run_broadcast(
+    bot: Bot,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    sender: RateLimitedSender,
+    broadcast_id: int,
+) -> None:
+    async with sessionmaker() as session:
+        bc = await session.get(Broadcast, broadcast_id)
+    if bc is None:
+        return
+    text = bc.text
+
+    last_id = 0
+    last_progress = 0.0
+    while True:
+        async with sessionmaker() as session:
+            batch = await list_pending_deliveries(session, broadcast_id, after_id=last_id, limit=BATCH_SIZE)
+        if not batch:
+            break
+
+        errors = await asyncio.gather(*(sender.send_message(tg_id, text) for _, tg_id in batch))
+        async with sessionmaker() as session:
+            bc = await record_deliveries(session, broadcast_id, [(d_id, err) for (d_id, _), err in zip(batch, errors)])
+            await commit(session)
+        last_id = batch[-1][0]
+
+        now = time.monotonic()
+        if bc is not None and now - last_progress >= PROGRESS_EVERY:
+            last_progress = now
+            await _report_progress(bot, bc)
+
+    async with sessionmaker() as session:
+        bc = await finish_broadcast(session, broadcast_id)
+        await commit(session)
+    if bc is not None:
+        logger.info("Broadcast %s finished: sent=%s failed=%s", bc.id, bc.sent, bc.failed)
+        await _report_progress(bot, bc)
+
+
+def start_broadcast(
+    bot: Bot,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    sender: RateLimitedSender,
+    broadcast_id: int,
+) -> None:
+    if broadcast_id in _running:
+        return
+    task = asyncio.create_task(run_broadcast(bot, sessionmaker, sender, broadcast_id), name=f"broadcast:{broadcast_id}")
+    _running[broadcast_id] = task
+
+    def _done(t: asyncio.Task) -> None:
+        _running.pop(broadcast_id, None)
+        if not t.cancelled() and t.exception() is not None:
+            logger.error("Broadcast %s crashed", broadcast_id, exc_info=t.exception())
+
+    task.add_done_callback(_done)
+
+
+async def resume_broadcasts(bot: Bot, sessionmaker: async_sessionmaker[AsyncSession], sender: RateLimitedSender) -> int:
+    async with sessionmaker() as session:
+        ids = await list_running_broadcast_ids(session)
+    for broadcast_id in ids:
+        logger.info("Resuming broadcast %s", broadcast_id)
+        start_broadcast(bot, sessionmaker, sender, broadcast_id)
+    return len(ids)
+
+
+async def stop_broadcasts() -> None:
+    tasks = list(_running.values())
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
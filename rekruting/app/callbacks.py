@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from aiogram.filters import Filter
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+SEP = ":"
+
+
+class MenuCb(CallbackData, prefix="menu"):
+    action: str
+
+
+class WorkCb(CallbackData, prefix="work"):
+    action: str
+
+
+class ReportCb(CallbackData, prefix="r"):
+    action: str
+
+
+class WorkTypeCb(CallbackData, prefix="wt"):
+    action: str
+
+
+class WorkTypeToggleCb(CallbackData, prefix="wt"):
+    action: str
+    work_type_id: int
+
+
+class ProblemCb(CallbackData, prefix="p"):
+    action: str
+
+
+class ProblemTypeCb(CallbackData, prefix="pt"):
+    index: int
+
+
+class UrgencyCb(CallbackData, prefix="p"):
+    action: str
+    level: str
+
+
+class HistoryCb(CallbackData, prefix="my"):
+    action: str
+    report_id: int
+
+
+class CityCb(CallbackData, prefix="city"):
+    action: str
+
+
+class CityPickCb(CallbackData, prefix="city"):
+    action: str
+    city: str
+
+
+class AdminCb(CallbackData, prefix="admin"):
+    action: str
+
+
+class AdminHistoryCb(CallbackData, prefix="admin"):
+    action: str
+    kind: str
+
+
+class ReviewCb(CallbackData, prefix="r"):
+    action: str
+    report_id: int
+
+
+class BulkCb(CallbackData, prefix="rb"):
+    action: str
+
+
+class BulkPickCb(CallbackData, prefix="rb"):
+    action: str
+    report_id: int
+
+
+class SettingsCb(CallbackData, prefix="set"):
+    action: str
+
+
+class SettingToggleCb(CallbackData, prefix="set"):
+    action: str
+    key: str
+
+
+class WorkerMsgCb(CallbackData, prefix="admin"):
+    action: str
+    tg_id: int
+
+
+class BroadcastCb(CallbackData, prefix="bc"):
+    action: str
+
+
+class SearchCb(CallbackData, prefix="sr"):
+    kind: str
+    page: int
+
+
+class BackupCb(CallbackData, prefix="bk"):
+    action: str
+
+
+class BackupRestoreCb(CallbackData, prefix="bk"):
+    action: str
+    name: str
+
+
+class CallbackPrefix(Filter):
+    def __init__(self, *factories: type[CallbackData]):
+        self.prefixes = frozenset(f.__prefix__ for f in factories)
+
+    async def __call__(self, cb: CallbackQuery) -> bool:
+        return bool(cb.data) and cb.data.partition(SEP)[0] in self.prefixes
@@ -21,6 +21,24 @@ class Config:
     database_url: str
     admin_ids: set[int]
     google_sheets: GoogleSheetsConfig | None
+    work_session_max_hours: int = 14
+    report_reminder_hour: int = 21
+    archive_dir: str = "archive"
+    archive_after_days: int = 0
+    backup_dir: str = "backups"
+    backup_interval_hours: int = 24
+    backup_keep: int = 14
+    incident_window_hours: int = 6
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise RuntimeError(f"Invalid {name} value: {raw!r} (must be integer).")
 
 
 def load_config() -> Config:
@@ -61,4 +79,12 @@ def load_config() -> Config:
         database_url=database_url,
         admin_ids=admin_ids,
         google_sheets=google_sheets,
+        work_session_max_hours=_env_int("WORK_SESSION_MAX_HOURS", 14),
+        report_reminder_hour=_env_int("REPORT_REMINDER_HOUR", 21),
+        archive_dir=os.getenv("ARCHIVE_DIR", "archive").strip() or "archive",
+        archive_after_days=_env_int("ARCHIVE_AFTER_DAYS", 0),
+        backup_dir=os.getenv("BACKUP_DIR", "backups").strip() or "backups",
+        backup_interval_hours=_env_int("BACKUP_INTERVAL_HOURS", 24),
+        backup_keep=_env_int("BACKUP_KEEP", 14),
+        incident_window_hours=_env_int("INCIDENT_WINDOW_HOURS", 6),
     )
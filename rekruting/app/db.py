@@ -1,14 +1,64 @@
 from __future__ import annotations
 
-from sqlalchemy import text
+import inspect
+import logging
+from datetime import timedelta
+from typing import Any, Callable
+
+from sqlalchemy import text, func
+from sqlalchemy.sql.elements import ColumnElement
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
 
+logger = logging.getLogger(__name__)
+
+AFTER_COMMIT = "after_commit"
+AFTER_COMMIT_DURABLE = "after_commit_durable"
+
+
 class Base(DeclarativeBase):
     pass
 
 
+FTS_TABLES = {
+    "problems_fts": ("problems", ("description", "address", "scooter_number")),
+    "reports_fts": ("reports", ("comment",)),
+}
+
+
+def _fts_ddl(fts: str, table: str, columns: tuple[str, ...]) -> list[str]:
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2');",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END;",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END;",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END;",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild');",
+    ]
+
+
+WORK_SESSION_TRIGGERS = {
+    "work_sessions_open_ai": (
+        "CREATE TRIGGER IF NOT EXISTS work_sessions_open_ai AFTER INSERT ON work_sessions "
+        "WHEN new.ended_at IS NULL BEGIN "
+        "UPDATE users SET is_working = 1, work_started_at = new.started_at WHERE id = new.user_id; END;"
+    ),
+    "work_sessions_close_au": (
+        "CREATE TRIGGER IF NOT EXISTS work_sessions_close_au AFTER UPDATE OF ended_at ON work_sessions "
+        "WHEN old.ended_at IS NULL AND new.ended_at IS NOT NULL BEGIN "
+        "UPDATE users SET is_working = 0, work_started_at = NULL WHERE id = new.user_id; END;"
+    ),
+}
+
+
 def make_engine(database_url: str) -> AsyncEngine:
     return create_async_engine(database_url, echo=False, future=True)
 
@@ -17,6 +67,77 @@ def make_sessionmaker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
     return async_sessionmaker(engine, expire_on_commit=False)
 
 
+def after_commit(session: AsyncSession, callback: Callable[[], Any]) -> None:
+    session.info.setdefault(AFTER_COMMIT, []).append(callback)
+
+
+async def commit_deferred(session: AsyncSession) -> None:
+    await session.commit()
+    session.info[AFTER_COMMIT_DURABLE] = len(session.info.get(AFTER_COMMIT, ()))
+
+
+async def run_after_commit(session: AsyncSession, durable_only: bool = False) -> None:
+    callbacks = session.info.pop(AFTER_COMMIT, [])
+    durable = session.info.pop(AFTER_COMMIT_DURABLE, 0)
+    if durable_only:
+        callbacks = callbacks[:durable]
+    for callback in callbacks:
+        try:
+            result = callback()
+            if inspect.isawaitable(result):
+                await result
+        except Exception:
+            logger.exception("after_commit callback %r failed", callback)
+
+
+async def commit(session: AsyncSession) -> None:
+    await session.commit()
+    await run_after_commit(session)
+
+
+class LazySession:
+    __slots__ = ("_sessionmaker", "_session")
+
+    def __init__(self, sessionmaker: async_sessionmaker[AsyncSession]):
+        self._sessionmaker = sessionmaker
+        self._session: AsyncSession | None = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str):
+        session = self._session
+        if session is None:
+            session = self._session = self._sessionmaker()
+        return getattr(session, name)
+
+    async def close(self) -> None:
+        session, self._session = self._session, None
+        if session is not None:
+            await session.close()
+
+
+def seconds_between(dialect: str, start: ColumnElement, end: ColumnElement) -> ColumnElement:
+    if dialect == "sqlite":
+        return (func.julianday(end) - func.julianday(start)) * 86400.0
+    return func.extract("epoch", end - start)
+
+
+def upsert(dialect: str, table):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def add_hours(dialect: str, column: ColumnElement, hours: int) -> ColumnElement:
+    if dialect == "sqlite":
+        return func.strftime("%Y-%m-%d %H:%M:%f", column, f"+{int(hours)} hours")
+    return column + timedelta(hours=hours)
+
+
 async def init_db(engine: AsyncEngine) -> None:
     from . import models
 
@@ -48,3 +169,56 @@ async def init_db(engine: AsyncEngine) -> None:
             await conn.execute(text("ALTER TABLE reports ADD COLUMN edited_by_user_id INTEGER NULL;"))
         if not await has_col("reports", "partner_name"):
             await conn.execute(text("ALTER TABLE reports ADD COLUMN partner_name VARCHAR(128) NULL;"))
+
+        for table in ("report_media", "problem_media"):
+            if not await has_col(table, "file_unique_id"):
+                await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN file_unique_id VARCHAR(64) NULL;"))
+                await conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_file_unique_id ON {table} (file_unique_id);"
+                ))
+
+        if not await has_col("report_edit_logs", "diff_z"):
+            await conn.execute(text("ALTER TABLE report_edit_logs ADD COLUMN diff_z BLOB NULL;"))
+
+        if not await has_col("problems", "scooter_norm"):
+            await conn.execute(text("ALTER TABLE problems ADD COLUMN scooter_norm VARCHAR(64) NULL;"))
+            await conn.execute(text("ALTER TABLE problems ADD COLUMN address_norm VARCHAR(256) NULL;"))
+            await conn.execute(text("ALTER TABLE problems ADD COLUMN incident_id INTEGER NULL REFERENCES incidents (id) ON DELETE SET NULL;"))
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_problems_scooter_norm_created ON problems (scooter_norm, created_at);"
+            ))
+            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_problems_incident_id ON problems (incident_id);"))
+
+        open_sessions_index = (await conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_work_sessions_open_user';")
+        )).first()
+        if not open_sessions_index:
+            await conn.execute(text(
+                "UPDATE work_sessions SET ended_at = started_at WHERE ended_at IS NULL AND id NOT IN "
+                "(SELECT MIN(id) FROM work_sessions WHERE ended_at IS NULL GROUP BY user_id);"
+            ))
+            await conn.execute(text(
+                "CREATE UNIQUE INDEX uq_work_sessions_open_user ON work_sessions (user_id) WHERE ended_at IS NULL;"
+            ))
+
+        triggers = set((await conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'trigger';")
+        )).scalars())
+        if not WORK_SESSION_TRIGGERS.keys() <= triggers:
+            for stmt in WORK_SESSION_TRIGGERS.values():
+                await conn.execute(text(stmt))
+            await conn.execute(text(
+                "UPDATE users SET "
+                "work_started_at = (SELECT started_at FROM work_sessions "
+                "WHERE work_sessions.user_id = users.id AND ended_at IS NULL), "
+                "is_working = EXISTS (SELECT 1 FROM work_sessions "
+                "WHERE work_sessions.user_id = users.id AND ended_at IS NULL);"
+            ))
+
+        for fts, (table, columns) in FTS_TABLES.items():
+            exists = (await conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name;"), {"name": fts}
+            )).first()
+            if not exists:
+                for stmt in _fts_ddl(fts, table, columns):
+                    await conn.execute(text(stmt))
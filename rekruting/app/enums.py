@@ -17,3 +17,14 @@ class ProblemUrgency(StrEnum):
 class MediaType(StrEnum):
     PHOTO = "photo"
     VIDEO = "video"
+
+
+class BroadcastStatus(StrEnum):
+    RUNNING = "running"
+    DONE = "done"
+
+
+class DeliveryStatus(StrEnum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
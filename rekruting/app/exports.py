@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import os
+import tempfile
+from datetime import date, datetime, time
+from enum import Enum
+from typing import Any, Callable
+
+from sqlalchemy import Select, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .archive import archived_export_rows
+from .models import User, WorkType, Report, ReportTask, Problem, WorkSession
+
+EXPORT_CHUNK = 1000
+EXPORT_FORMATS = ("csv", "xlsx")
+
+
+def _reports_query(start: date, end: date) -> tuple[list[str], Select]:
+    tasks_total = (
+        select(func.coalesce(func.sum(ReportTask.quantity), 0))
+        .where(ReportTask.report_id == Report.id)
+        .scalar_subquery()
+    )
+    header = [
+        "report_id", "report_date", "start_time", "end_time", "tg_id", "first_name", "last_name",
+        "position", "city", "leader", "partner_name", "tasks_total", "comment", "status",
+        "admin_comment", "edit_count", "created_at",
+    ]
+    stmt = (
+        select(
+            Report.id, Report.report_date, Report.start_time, Report.end_time,
+            User.tg_id, User.first_name, User.last_name, User.position, User.city, User.leader,
+            Report.partner_name, tasks_total, Report.comment, Report.status,
+            Report.admin_comment, Report.edit_count, Report.created_at,
+        )
+        .join(User, User.id == Report.user_id)
+        .where(Report.report_date >= start)
+        .where(Report.report_date <= end)
+        .order_by(Report.id)
+    )
+    return header, stmt
+
+
+def _tasks_query(start: date, end: date) -> tuple[list[str], Select]:
+    header = [
+        "report_id", "report_date", "tg_id", "first_name", "last_name", "city", "leader",
+        "work_type", "quantity", "status",
+    ]
+    stmt = (
+        select(
+            Report.id, Report.report_date, User.tg_id, User.first_name, User.last_name, User.city,
+            User.leader, WorkType.name, ReportTask.quantity, Report.status,
+        )
+        .join(Report, Report.id == ReportTask.report_id)
+        .join(User, User.id == Report.user_id)
+        .join(WorkType, WorkType.id == ReportTask.work_type_id)
+        .where(Report.report_date >= start)
+        .where(Report.report_date <= end)
+        .order_by(ReportTask.id)
+    )
+    return header, stmt
+
+
+def _problems_query(start: date, end: date) -> tuple[list[str], Select]:
+    header = [
+        "problem_id", "created_at", "tg_id", "first_name", "last_name", "city", "problem_type",
+        "description", "address", "scooter_number", "urgency",
+    ]
+    stmt = (
+        select(
+            Problem.id, Problem.created_at, User.tg_id, User.first_name, User.last_name, User.city,
+            Problem.problem_type, Problem.description, Problem.address, Problem.scooter_number,
+            Problem.urgency,
+        )
+        .join(User, User.id == Problem.user_id)
+        .where(Problem.created_at >= datetime.combine(start, time.min))
+        .where(Problem.created_at <= datetime.combine(end, time.max))
+        .order_by(Problem.id)
+    )
+    return header, stmt
+
+
+def _sessions_query(start: date, end: date) -> tuple[list[str], Select]:
+    header = [
+        "session_id", "tg_id", "first_name", "last_name", "city", "started_at", "ended_at",
+        "linked_report_id",
+    ]
+    stmt = (
+        select(
+            WorkSession.id, User.tg_id, User.first_name, User.last_name, User.city,
+            WorkSession.started_at, WorkSession.ended_at, WorkSession.linked_report_id,
+        )
+        .join(User, User.id == WorkSession.user_id)
+        .where(WorkSession.started_at >= datetime.combine(start, time.min))
+        .where(WorkSession.started_at <= datetime.combine(end, time.max))
+        .order_by(WorkSession.id)
+    )
+    return header, stmt
+
+
+EXPORTS: dict[str, Callable[[date, date], tuple[list[str], Select]]] = {
+    "reports": _reports_query,
+    "tasks": _tasks_query,
+    "problems": _problems_query,
+    "sessions": _sessions_query,
+}
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.strftime("%d.%m.%Y %H:%M")
+    if isinstance(value, date):
+        return value.strftime("%d.%m.%Y")
+    if isinstance(value, time):
+        return value.strftime("%H:%M")
+    return value
+
+
+class _CsvWriter:
+    def __init__(self, path: str, title: str, header: list[str]):
+        self._f = open(path, "w", newline="", encoding="utf-8-sig")
+        self._w = csv.writer(self._f, delimiter=";")
+        self._w.writerow(header)
+
+    def write_rows(self, rows: list[list[Any]]) -> None:
+        self._w.writerows(rows)
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class _XlsxWriter:
+    def __init__(self, path: str, title: str, header: list[str]):
+        from openpyxl import Workbook
+
+        self._path = path
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet(title)
+        self._ws.append(header)
+
+    def write_rows(self, rows: list[list[Any]]) -> None:
+        for row in rows:
+            self._ws.append(row)
+
+    def close(self) -> None:
+        self._wb.save(self._path)
+
+
+_WRITERS = {
+    "csv": _CsvWriter,
+    "xlsx": _XlsxWriter,
+}
+
+
+async def export_to_file(
+    session: AsyncSession,
+    kind: str,
+    start: date,
+    end: date,
+    fmt: str,
+    archive_dir: str | None = None,
+) -> tuple[str, int]:
+    header, stmt = EXPORTS[kind](start, end)
+    fd, path = tempfile.mkstemp(prefix=f"{kind}_", suffix=f".{fmt}")
+    os.close(fd)
+
+    count = 0
+    writer = None
+    try:
+        writer = await asyncio.to_thread(_WRITERS[fmt], path, kind, header)
+        archived = await archived_export_rows(session, archive_dir, kind, start, end)
+        for i in range(0, len(archived), EXPORT_CHUNK):
+            rows = [[_cell(v) for v in row] for row in archived[i:i + EXPORT_CHUNK]]
+            await asyncio.to_thread(writer.write_rows, rows)
+            count += len(rows)
+        result = await session.stream(stmt.execution_options(yield_per=EXPORT_CHUNK))
+        async for partition in result.partitions(EXPORT_CHUNK):
+            rows = [[_cell(v) for v in row] for row in partition]
+            await asyncio.to_thread(writer.write_rows, rows)
+            count += len(rows)
+        await asyncio.to_thread(writer.close)
+    except BaseException:
+        if isinstance(writer, _CsvWriter):
+            writer.close()
+        os.remove(path)
+        raise
+    return path, count
+
+
+async def rows_to_file(title: str, header: list[str], rows: list[list[Any]], fmt: str) -> str:
+    fd, path = tempfile.mkstemp(prefix=f"{title}_", suffix=f".{fmt}")
+    os.close(fd)
+
+    def write() -> None:
+        writer = _WRITERS[fmt](path, title, header)
+        try:
+            writer.write_rows([[_cell(v) for v in row] for row in rows])
+        finally:
+            writer.close()
+
+    try:
+        await asyncio.to_thread(write)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
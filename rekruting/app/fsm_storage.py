@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from dataclasses import astuple
+from datetime import datetime
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage, MemoryStorageRecord
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .db import commit
+from .repositories import list_fsm_states, save_fsm_states
+
+logger = logging.getLogger(__name__)
+
+FSM_FLUSH_INTERVAL = 1.0
+
+
+def _encode_key(key: StorageKey) -> str:
+    return json.dumps(astuple(key), separators=(",", ":"))
+
+
+def _decode_key(raw: str) -> StorageKey:
+    return StorageKey(*json.loads(raw))
+
+
+class PersistentStorage(MemoryStorage):
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        *groups: type[StatesGroup],
+        interval: float = FSM_FLUSH_INTERVAL,
+    ):
+        super().__init__()
+        self._sessionmaker = sessionmaker
+        self._states = frozenset(name for group in groups for name in group.__state_names__)
+        self._interval = interval
+        self._dirty: set[StorageKey] = set()
+        self._task: asyncio.Task | None = None
+
+    def _persisted(self, key: StorageKey) -> bool:
+        record = self.storage.get(key)
+        return record is not None and record.state in self._states
+
+    async def set_state(self, key: StorageKey, state: str | State | None = None) -> None:
+        was = self._persisted(key)
+        await super().set_state(key, state)
+        if was or self._persisted(key):
+            self._dirty.add(key)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await super().set_data(key, data)
+        if self._persisted(key):
+            self._dirty.add(key)
+
+    async def load(self) -> int:
+        async with self._sessionmaker() as session:
+            rows = await list_fsm_states(session)
+        self.storage.clear()
+        self._dirty.clear()
+        for row in rows:
+            self.storage[_decode_key(row.key)] = MemoryStorageRecord(data=json.loads(row.data), state=row.state)
+        return len(rows)
+
+    async def flush(self) -> int:
+        if not self._dirty:
+            return 0
+        keys, self._dirty = self._dirty, set()
+        now = datetime.utcnow()
+        rows, drop = [], []
+        for key in keys:
+            if self._persisted(key):
+                record = self.storage[key]
+                rows.append({
+                    "key": _encode_key(key),
+                    "state": record.state,
+                    "data": json.dumps(record.data, ensure_ascii=False),
+                    "updated_at": now,
+                })
+            else:
+                drop.append(_encode_key(key))
+        try:
+            async with self._sessionmaker() as session:
+                await save_fsm_states(session, rows, drop)
+                await commit(session)
+        except Exception:
+            self._dirty |= keys
+            raise
+        return len(keys)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("FSM state flush failed")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("FSM state flush failed")
+
+    async def close(self) -> None:
+        await self.stop()
+        await super().close()
@@ -5,14 +5,23 @@ from dataclasses import dataclass
 from datetime import date, datetime
 from typing import Any
 
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-
 logger = logging.getLogger(__name__)
 
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
 
+def _build_service(service_account_file: str):
+    from google.oauth2.service_account import Credentials
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+
+    doc = get_static_doc("sheets", "v4")
+    if doc is None:
+        raise RuntimeError("Bundled Sheets v4 discovery document not found in google-api-python-client.")
+    creds = Credentials.from_service_account_file(service_account_file, scopes=SCOPES)
+    return build_from_document(doc, credentials=creds)
+
+
 @dataclass(frozen=True, slots=True)
 class SheetsTarget:
     spreadsheet_id: str
@@ -36,11 +45,17 @@ class GoogleSheetsClient:
     }
 
     def __init__(self, service_account_file: str, target: SheetsTarget):
-        creds = Credentials.from_service_account_file(service_account_file, scopes=SCOPES)
-        self._service = build("sheets", "v4", credentials=creds, cache_discovery=False)
+        self._service_account_file = service_account_file
+        self._service_obj = None
         self._target = target
         self._sheet_titles_cache: list[str] | None = None
 
+    @property
+    def _service(self):
+        if self._service_obj is None:
+            self._service_obj = _build_service(self._service_account_file)
+        return self._service_obj
+
     def ensure_sheets_exist(self) -> None:
         
         meta = self._service.spreadsheets().get(spreadsheetId=self._target.spreadsheet_id).execute()
@@ -98,24 +113,40 @@ class GoogleSheetsClient:
         return None
 
     def _append_values(self, sheet_title: str, a1_range: str, values: list[Any]) -> None:
+        self._append_rows(sheet_title, a1_range, [values])
+
+    def _append_rows(self, sheet_title: str, a1_range: str, rows: list[list[Any]]) -> None:
         self._service.spreadsheets().values().append(
             spreadsheetId=self._target.spreadsheet_id,
             range=f"{sheet_title}!{a1_range}",
             valueInputOption="USER_ENTERED",
             insertDataOption="INSERT_ROWS",
-            body={"values": [values]},
+            body={"values": rows},
         ).execute()
 
     def _update_values(self, sheet_title: str, a1_range: str, values: list[Any]) -> None:
+        self._update_rows(sheet_title, a1_range, [values])
+
+    def _update_rows(self, sheet_title: str, a1_range: str, rows: list[list[Any]]) -> None:
         self._service.spreadsheets().values().update(
             spreadsheetId=self._target.spreadsheet_id,
             range=f"{sheet_title}!{a1_range}",
             valueInputOption="USER_ENTERED",
-            body={"values": [values]},
+            body={"values": rows},
         ).execute()
 
-    def _find_first_empty_row(self, sheet_title: str, col: str = "A", start_row: int = 2, max_rows: int = 5000) -> int:
-       
+    def _batch_update_rows(self, sheet_title: str, ranges: list[tuple[str, list[list[Any]]]]) -> None:
+        self._service.spreadsheets().values().batchUpdate(
+            spreadsheetId=self._target.spreadsheet_id,
+            body={
+                "valueInputOption": "USER_ENTERED",
+                "data": [{"range": f"{sheet_title}!{rng}", "values": rows} for rng, rows in ranges],
+            },
+        ).execute()
+
+    def _find_empty_rows(
+        self, sheet_title: str, count: int, col: str = "A", start_row: int = 2, max_rows: int = 5000
+    ) -> list[int]:
         end_row = start_row + max_rows - 1
         rng = f"{col}{start_row}:{col}{end_row}"
 
@@ -126,11 +157,15 @@ class GoogleSheetsClient:
         ).execute()
 
         col_values = (resp.get("values") or [[]])[0]
-        for idx, v in enumerate(col_values, start=start_row):
-            if v is None or str(v).strip() == "":
-                return idx
+        empty = [
+            idx for idx, v in enumerate(col_values, start=start_row)
+            if v is None or str(v).strip() == ""
+        ][:count]
+        tail = start_row + len(col_values)
+        return empty + list(range(tail, tail + count - len(empty)))
 
-        return start_row + len(col_values)
+    def _find_first_empty_row(self, sheet_title: str, col: str = "A", start_row: int = 2, max_rows: int = 5000) -> int:
+        return self._find_empty_rows(sheet_title, 1, col=col, start_row=start_row, max_rows=max_rows)[0]
 
     @staticmethod
     def _parse_report_date(value: Any) -> date | None:
@@ -222,15 +257,7 @@ class GoogleSheetsClient:
                 total += int(tasks_map.get(kk, 0) or 0)
         return int(total)
 
-    def append_report(self, payload: dict[str, Any]) -> None:
-        if not self._should_write_report_to_month_sheet(payload):
-            logger.info(
-                "Skip report write (not approved): report_id=%s status=%s",
-                payload.get("report_id"),
-                payload.get("status") or payload.get("new_status") or payload.get("report_status"),
-            )
-            return
-
+    def _month_sheet_or_warn(self, payload: dict[str, Any]) -> str | None:
         month_sheet = self._month_sheet_for_payload(payload)
 
         if month_sheet is None:
@@ -245,7 +272,9 @@ class GoogleSheetsClient:
                 d.month,
                 self._month_tab_candidates(d.month),
             )
+        return month_sheet
 
+    def _report_month_row(self, payload: dict[str, Any]) -> list[Any]:
         tasks_list = payload.get("tasks", []) or []
         tasks_map: dict[str, int] = {}
         for t in tasks_list:
@@ -291,7 +320,7 @@ class GoogleSheetsClient:
             d = self._parse_created_at_utc(payload.get("created_at_utc"))
         date_cell = d.strftime("%d.%m.%Y") if d else str(payload.get("report_date") or "")
 
-        row = [
+        return [
             date_cell,      # A
             full_name,      # B
             partner_name,   # C
@@ -304,12 +333,10 @@ class GoogleSheetsClient:
             comment,        # J
         ]
 
-        if month_sheet:
-            r = self._find_first_empty_row(month_sheet, col="A", start_row=2, max_rows=5000)
-            self._update_values(month_sheet, f"A{r}:J{r}", row)
-            return
-
-        self._append_values(self._target.sheet_reports, "A:Z", [
+    @staticmethod
+    def _report_log_row(payload: dict[str, Any]) -> list[Any]:
+        tasks_list = payload.get("tasks", []) or []
+        return [
             payload.get("event", "report_created"),
             payload.get("created_at_utc"),
             payload.get("report_id"),
@@ -329,7 +356,54 @@ class GoogleSheetsClient:
             payload.get("edit_count", 0),
             payload.get("edited_at_utc"),
             payload.get("edited_by_tg_id"),
-        ])
+        ]
+
+    def append_report(self, payload: dict[str, Any]) -> None:
+        if not self._should_write_report_to_month_sheet(payload):
+            logger.info(
+                "Skip report write (not approved): report_id=%s status=%s",
+                payload.get("report_id"),
+                payload.get("status") or payload.get("new_status") or payload.get("report_status"),
+            )
+            return
+
+        month_sheet = self._month_sheet_or_warn(payload)
+        if month_sheet:
+            r = self._find_first_empty_row(month_sheet, col="A", start_row=2, max_rows=5000)
+            self._update_values(month_sheet, f"A{r}:J{r}", self._report_month_row(payload))
+            return
+
+        self._append_values(self._target.sheet_reports, "A:Z", self._report_log_row(payload))
+
+    def append_reports(self, payloads: list[dict[str, Any]]) -> None:
+        by_month: dict[str, list[list[Any]]] = {}
+        log_rows: list[list[Any]] = []
+        for payload in payloads:
+            if not self._should_write_report_to_month_sheet(payload):
+                logger.info(
+                    "Skip report write (not approved): report_id=%s status=%s",
+                    payload.get("report_id"),
+                    payload.get("status") or payload.get("new_status") or payload.get("report_status"),
+                )
+                continue
+            month_sheet = self._month_sheet_or_warn(payload)
+            if month_sheet:
+                by_month.setdefault(month_sheet, []).append(self._report_month_row(payload))
+            else:
+                log_rows.append(self._report_log_row(payload))
+
+        for month_sheet, rows in by_month.items():
+            slots = self._find_empty_rows(month_sheet, len(rows), col="A", start_row=2, max_rows=5000)
+            runs: list[tuple[str, list[list[Any]]]] = []
+            first = 0
+            for i in range(1, len(slots) + 1):
+                if i == len(slots) or slots[i] != slots[i - 1] + 1:
+                    runs.append((f"A{slots[first]}:J{slots[i - 1]}", rows[first:i]))
+                    first = i
+            self._batch_update_rows(month_sheet, runs)
+
+        if log_rows:
+            self._append_rows(self._target.sheet_reports, "A:Z", log_rows)
 
     def append_problem(self, payload: dict[str, Any]) -> None:
         media_ids = ",".join([m.get("file_id", "") for m in (payload.get("media", []) or [])])
@@ -362,11 +436,20 @@ class GoogleSheetsClient:
         ])
 
     def append_report_status(self, payload: dict[str, Any]) -> None:
-        self._append_values(self._target.sheet_statuses, "A:Z", [
+        self._append_values(self._target.sheet_statuses, "A:Z", self._report_status_row(payload))
+
+    def append_report_statuses(self, payloads: list[dict[str, Any]]) -> None:
+        if not payloads:
+            return
+        self._append_rows(self._target.sheet_statuses, "A:Z", [self._report_status_row(p) for p in payloads])
+
+    @staticmethod
+    def _report_status_row(payload: dict[str, Any]) -> list[Any]:
+        return [
             payload.get("event", "report_status"),
             payload.get("changed_at_utc"),
             payload.get("report_id"),
             payload.get("status"),
             payload.get("admin_tg_id"),
             payload.get("admin_comment"),
-        ])
+        ]
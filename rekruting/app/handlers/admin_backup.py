@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import logging
+
+from aiogram import Bot, Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from ..config import Config
+from ..backup import sqlite_path, make_backup, list_backups, verify_backup, resolve_backup, restore_backup
+from ..keyboards import restore_confirm_inline
+from ..middlewares import AdminGuardMiddleware
+from ..admins import invalidate_admins
+from ..analytics import invalidate_stats_cache
+from ..payroll import invalidate_payroll_cache
+from ..callbacks import CallbackPrefix, BackupCb, BackupRestoreCb
+
+router = Router()
+router.callback_query.filter(CallbackPrefix(BackupCb, BackupRestoreCb))
+router.message.middleware(AdminGuardMiddleware())
+router.callback_query.middleware(AdminGuardMiddleware())
+
+logger = logging.getLogger(__name__)
+
+RESTORE_USAGE = (
+    "Использование: <code>/restore &lt;имя файла&gt;</code>\n"
+    "Список копий: <code>/restore</code>"
+)
+
+
+def _size(n: int) -> str:
+    return f"{n / (1024 * 1024):.1f} МБ"
+
+
+@router.message(Command("backup"))
+async def cmd_backup(message: Message, session: AsyncSession, config: Config) -> None:
+    db_path = sqlite_path(config.database_url)
+    if db_path is None:
+        await message.answer("Резервное копирование доступно только для SQLite.")
+        return
+
+    await message.answer("Создаю резервную копию...")
+    try:
+        info = await make_backup(db_path, config.backup_dir, config.backup_keep)
+    except Exception:
+        logger.exception("Backup failed.")
+        await message.answer("Не удалось создать резервную копию.")
+        return
+    await message.answer(
+        f"Готово: <code>{info.name}</code>\n"
+        f"Размер: <b>{_size(info.size)}</b>\n"
+        f"SHA-256: <code>{info.sha256[:16]}…</code>"
+    )
+
+
+@router.message(Command("restore"))
+async def cmd_restore(message: Message, command: CommandObject, session: AsyncSession, config: Config) -> None:
+    if sqlite_path(config.database_url) is None:
+        await message.answer("Восстановление доступно только для SQLite.")
+        return
+
+    name = (command.args or "").strip()
+    if not name:
+        backups = await list_backups(config.backup_dir)
+        if not backups:
+            await message.answer("Резервных копий нет.")
+            return
+        lines = [f"• <code>{b.name}</code> ({_size(b.size)})" for b in backups]
+        await message.answer("Резервные копии:\n" + "\n".join(lines) + "\n\n" + RESTORE_USAGE)
+        return
+
+    path = resolve_backup(config.backup_dir, name)
+    if path is None:
+        await message.answer("Копия не найдена.\n\n" + RESTORE_USAGE)
+        return
+    if not await verify_backup(path):
+        await message.answer("Копия повреждена: контрольная сумма или проверка целостности не совпадают.")
+        return
+
+    await message.answer(
+        f"Восстановить базу из <code>{name}</code>?\n"
+        "Текущее состояние будет сохранено отдельной копией.",
+        reply_markup=restore_confirm_inline(name),
+    )
+
+
+@router.callback_query(BackupCb.filter(F.action == "cancel"))
+async def restore_cancel(cb: CallbackQuery) -> None:
+    await cb.message.edit_reply_markup(reply_markup=None)
+    await cb.answer("Отменено.")
+
+
+@router.callback_query(BackupRestoreCb.filter(F.action == "restore"), flags={"idempotent": True})
+async def restore_confirm(
+    cb: CallbackQuery, callback_data: BackupRestoreCb, session: AsyncSession, config: Config, engine: AsyncEngine,
+    bot: Bot, db_sessions, workers, idempotency_commit,
+) -> None:
+    name = callback_data.name
+    db_path = sqlite_path(config.database_url)
+    path = resolve_backup(config.backup_dir, name)
+    if db_path is None or path is None:
+        await cb.answer("Копия не найдена.", show_alert=True)
+        return
+
+    await cb.answer("Восстанавливаю...")
+    await session.close()
+    safety = None
+    async with db_sessions.exclusive():
+        await workers.stop()
+        try:
+            safety = await restore_backup(engine, db_path, path, config.backup_dir, config.backup_keep)
+        except Exception:
+            logger.exception("Restore from %s failed.", name)
+        finally:
+            invalidate_admins()
+            invalidate_payroll_cache()
+            invalidate_stats_cache()
+            await workers.start(bot)
+    if safety is None:
+        await cb.message.answer("Не удалось восстановить базу.")
+        return
+    idempotency_commit()
+    await cb.message.edit_reply_markup(reply_markup=None)
+    await cb.message.answer(
+        f"База восстановлена из <code>{name}</code>.\n"
+        f"Предыдущее состояние: <code>{safety.name}</code>"
+    )
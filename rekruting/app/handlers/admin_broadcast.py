@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from functools import partial
+
+from aiogram import Router, F
+from aiogram.types import CallbackQuery, Message
+from aiogram.fsm.context import FSMContext
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..repositories import get_setting_text, create_broadcast, set_broadcast_progress_message
+from ..states import AdminBroadcast
+from ..keyboards import admin_menu_inline, broadcast_audience_inline
+from ..broadcast import start_broadcast, progress_text
+from ..db import after_commit
+from ..middlewares import AdminGuardMiddleware
+from ..callbacks import CallbackPrefix, AdminCb, BroadcastCb
+
+router = Router()
+router.callback_query.filter(CallbackPrefix(AdminCb, BroadcastCb))
+router.message.middleware(AdminGuardMiddleware())
+router.callback_query.middleware(AdminGuardMiddleware())
+
+
+async def _launch(message: Message, session: AsyncSession, sessionmaker, sender, admin_tg_id: int,
+                  text: str, city: str | None = None, leader: str | None = None) -> None:
+    bc = await create_broadcast(session, text, admin_tg_id, city=city, leader=leader)
+    if bc.total == 0:
+        await message.answer("Нет получателей для рассылки.", reply_markup=admin_menu_inline())
+        return
+
+    progress = await message.answer(progress_text(bc))
+    await set_broadcast_progress_message(session, bc.id, progress.chat.id, progress.message_id)
+    after_commit(session, partial(start_broadcast, message.bot, sessionmaker, sender, bc.id))
+
+
+@router.callback_query(AdminCb.filter(F.action == "broadcast"))
+async def broadcast_open(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
+    await state.set_state(AdminBroadcast.text)
+    await cb.message.answer("Введите текст рассылки:")
+    await cb.answer()
+
+
+@router.message(AdminBroadcast.text, F.text)
+async def broadcast_text(message: Message, state: FSMContext) -> None:
+    await state.update_data(broadcast_text=message.html_text)
+    await state.set_state(AdminBroadcast.audience)
+    await message.answer("Кому отправить?", reply_markup=broadcast_audience_inline())
+
+
+@router.callback_query(AdminBroadcast.audience, BroadcastCb.filter(F.action == "cancel"))
+async def broadcast_cancel(cb: CallbackQuery, state: FSMContext) -> None:
+    await state.clear()
+    await cb.message.answer("Рассылка отменена.", reply_markup=admin_menu_inline())
+    await cb.answer()
+
+
+@router.callback_query(AdminBroadcast.audience, BroadcastCb.filter(F.action == "city"))
+async def broadcast_pick_city(cb: CallbackQuery, state: FSMContext) -> None:
+    await state.set_state(AdminBroadcast.city)
+    await cb.message.answer("Введите город (как в профиле сотрудника):")
+    await cb.answer()
+
+
+@router.callback_query(AdminBroadcast.audience, BroadcastCb.filter(F.action == "leader"))
+async def broadcast_pick_leader(cb: CallbackQuery, state: FSMContext) -> None:
+    await state.set_state(AdminBroadcast.leader)
+    await cb.message.answer("Введите лидера (как в профиле сотрудника):")
+    await cb.answer()
+
+
+@router.callback_query(AdminBroadcast.audience, BroadcastCb.filter(F.action == "all"), flags={"idempotent": True})
+async def broadcast_all(cb: CallbackQuery, state: FSMContext, session: AsyncSession, sessionmaker, sender, idempotency_commit) -> None:
+    data = await state.get_data()
+    await state.clear()
+    idempotency_commit()
+    await _launch(cb.message, session, sessionmaker, sender, cb.from_user.id, data["broadcast_text"])
+    await cb.answer()
+
+
+@router.message(AdminBroadcast.city, F.text)
+async def broadcast_city(message: Message, state: FSMContext, session: AsyncSession, sessionmaker, sender) -> None:
+    data = await state.get_data()
+    await state.clear()
+    await _launch(message, session, sessionmaker, sender, message.from_user.id, data["broadcast_text"], city=message.text.strip())
+
+
+@router.message(AdminBroadcast.leader, F.text)
+async def broadcast_leader(message: Message, state: FSMContext, session: AsyncSession, sessionmaker, sender) -> None:
+    data = await state.get_data()
+    await state.clear()
+    await _launch(message, session, sessionmaker, sender, message.from_user.id, data["broadcast_text"], leader=message.text.strip())
+
+
+@router.callback_query(BroadcastCb.filter(F.action == "motd"), flags={"idempotent": True})
+async def broadcast_motd(cb: CallbackQuery, session: AsyncSession, sessionmaker, sender, idempotency_commit) -> None:
+    motd = await get_setting_text(session, "motd")
+    if not motd:
+        await cb.answer("Сообщение дня пустое.", show_alert=True)
+        return
+    idempotency_commit()
+
+    try:
+        await cb.message.edit_reply_markup(reply_markup=None)
+    except Exception:
+        pass
+    await _launch(cb.message, session, sessionmaker, sender, cb.from_user.id, f"<b>Сообщение дня</b>\n{motd}")
+    await cb.answer()
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import logging
+import os
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, FSInputFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import Config
+from ..exports import EXPORTS, EXPORT_FORMATS, export_to_file
+from ..utils import parse_date
+from ..middlewares import AdminGuardMiddleware
+
+router = Router()
+router.message.middleware(AdminGuardMiddleware())
+router.callback_query.middleware(AdminGuardMiddleware())
+
+logger = logging.getLogger(__name__)
+
+USAGE = (
+    "Использование:\n"
+    "<code>/export &lt;тип&gt; &lt;с ДД.ММ.ГГГГ&gt; &lt;по ДД.ММ.ГГГГ&gt; [csv|xlsx]</code>\n\n"
+    f"Типы: {', '.join(EXPORTS)}\n"
+    "Пример: <code>/export tasks 01.01.2026 31.01.2026 xlsx</code>"
+)
+
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, command: CommandObject, session: AsyncSession, config: Config) -> None:
+    parts = (command.args or "").split()
+    if len(parts) not in (3, 4) or parts[0] not in EXPORTS:
+        await message.answer(USAGE)
+        return
+
+    kind = parts[0]
+    start = parse_date(parts[1])
+    end = parse_date(parts[2])
+    fmt = parts[3].lower() if len(parts) == 4 else "csv"
+    if start is None or end is None or start > end or fmt not in EXPORT_FORMATS:
+        await message.answer(USAGE)
+        return
+
+    await message.answer("Готовлю выгрузку...")
+    try:
+        path, count = await export_to_file(session, kind, start, end, fmt, config.archive_dir)
+    except Exception:
+        logger.exception("Export failed: kind=%s start=%s end=%s fmt=%s", kind, start, end, fmt)
+        await message.answer("Не удалось сформировать выгрузку.")
+        return
+
+    try:
+        filename = f"{kind}_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}.{fmt}"
+        await message.answer_document(FSInputFile(path, filename=filename), caption=f"Строк: <b>{count}</b>")
+    finally:
+        os.remove(path)
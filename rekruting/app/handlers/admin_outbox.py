@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import html
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..enums import DeliveryStatus
+from ..repositories import outbox_stats, list_outbox
+from ..middlewares import AdminGuardMiddleware
+
+router = Router()
+router.message.middleware(AdminGuardMiddleware())
+router.callback_query.middleware(AdminGuardMiddleware())
+
+
+@router.message(Command("outbox"))
+async def cmd_outbox(message: Message, session: AsyncSession) -> None:
+    counts, oldest = await outbox_stats(session)
+    lines = [
+        "<b>Очередь уведомлений</b>",
+        f"В очереди: <b>{counts.get(DeliveryStatus.PENDING, 0)}</b>",
+        f"Доставлено: <b>{counts.get(DeliveryStatus.SENT, 0)}</b>",
+        f"Ошибок: <b>{counts.get(DeliveryStatus.FAILED, 0)}</b>",
+    ]
+    if oldest is not None:
+        lines.append(f"Самое старое в очереди: {oldest.strftime('%d.%m.%Y %H:%M')} UTC")
+
+    failed = await list_outbox(session, DeliveryStatus.FAILED, limit=5)
+    if failed:
+        lines.append("\n<b>Последние ошибки:</b>")
+        for n in failed:
+            lines.append(f"#{n.id} → {n.chat_id} ({n.kind}, попыток: {n.attempts}): {html.escape(n.error or '-')}")
+    await message.answer("\n".join(lines))
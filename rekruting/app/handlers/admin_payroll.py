@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+from datetime import date
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, FSInputFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import Config
+from ..repositories import (
+    get_setting_text,
+    list_pay_rates,
+    set_pay_rate,
+    set_hourly_rate,
+    get_work_type_by_name,
+)
+from ..payroll import compute_month_payroll, fmt_money, parse_money, payroll_rows, PAYROLL_HEADER
+from ..exports import rows_to_file, EXPORT_FORMATS
+from ..utils import parse_month
+from ..middlewares import AdminGuardMiddleware
+
+router = Router()
+router.message.middleware(AdminGuardMiddleware())
+router.callback_query.middleware(AdminGuardMiddleware())
+
+HOURLY_KEYS = {"час", "hour", "hourly"}
+
+
+def _month_arg(args: str | None) -> tuple[int, int] | None:
+    if not args or not args.strip():
+        today = date.today()
+        return today.year, today.month
+    return parse_month(args.split()[0])
+
+
+@router.message(Command("rates"))
+async def cmd_rates(message: Message, session: AsyncSession) -> None:
+    rates = await list_pay_rates(session)
+    hourly = int(await get_setting_text(session, "hourly_rate_cents") or 0)
+    lines = ["<b>Ставки</b>\n", f"• час: <b>{fmt_money(hourly)}</b>"]
+    for wt, rate in rates:
+        lines.append(f"• {wt.name}: <b>{fmt_money(rate or 0)}</b>")
+    lines.append("\nИзменить: <code>/rate &lt;тип работ|час&gt; &lt;сумма&gt;</code>")
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("rate"))
+async def cmd_rate(message: Message, command: CommandObject, session: AsyncSession) -> None:
+    args = (command.args or "").strip()
+    name, _, amount = args.rpartition(" ")
+    rate_cents = parse_money(amount) if name else None
+    if rate_cents is None:
+        await message.answer("Использование: <code>/rate &lt;тип работ|час&gt; &lt;сумма&gt;</code>, например <code>/rate деплой 2,50</code>")
+        return
+
+    if name.strip().lower() in HOURLY_KEYS:
+        await set_hourly_rate(session, rate_cents)
+        await message.answer(f"Почасовая ставка: <b>{fmt_money(rate_cents)}</b>")
+        return
+
+    wt = await get_work_type_by_name(session, name)
+    if wt is None:
+        await message.answer(f"Тип работ «{name.strip()}» не найден. Список: /rates")
+        return
+
+    await set_pay_rate(session, wt.id, rate_cents)
+    await message.answer(f"Ставка «{wt.name}»: <b>{fmt_money(rate_cents)}</b>")
+
+
+@router.message(Command("payroll"))
+async def cmd_payroll(message: Message, command: CommandObject, session: AsyncSession, config: Config) -> None:
+    ym = _month_arg(command.args)
+    if ym is None:
+        await message.answer("Использование: <code>/payroll [ММ.ГГГГ]</code>")
+        return
+
+    payroll = await compute_month_payroll(session, *ym, config.archive_dir)
+    if not payroll.rows:
+        await message.answer(f"За {ym[1]:02d}.{ym[0]} нет принятых рапортов и смен.")
+        return
+
+    lines = [f"<b>Выплаты за {ym[1]:02d}.{ym[0]}</b>\n"]
+    for r in payroll.rows[:50]:
+        lines.append(
+            f"• {r.name} ({r.city or '-'}): задач {r.tasks_qty} = {fmt_money(r.piece_cents)}, "
+            f"часов {r.hours:.2f} = {fmt_money(r.hourly_cents)} | <b>{fmt_money(r.total_cents)}</b>"
+        )
+    if len(payroll.rows) > 50:
+        lines.append(f"... и ещё {len(payroll.rows) - 50}, полный список: /payroll_export")
+    lines.append(f"\nИтого: <b>{fmt_money(payroll.total_cents)}</b>")
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("payroll_export"))
+async def cmd_payroll_export(message: Message, command: CommandObject, session: AsyncSession, config: Config) -> None:
+    parts = (command.args or "").split()
+    fmt = parts[-1].lower() if parts and parts[-1].lower() in EXPORT_FORMATS else "csv"
+    if parts and parts[-1].lower() in EXPORT_FORMATS:
+        parts = parts[:-1]
+    ym = _month_arg(" ".join(parts))
+    if ym is None:
+        await message.answer("Использование: <code>/payroll_export [ММ.ГГГГ] [csv|xlsx]</code>")
+        return
+
+    payroll = await compute_month_payroll(session, *ym, config.archive_dir)
+    path = await rows_to_file("payroll", PAYROLL_HEADER, payroll_rows(payroll), fmt)
+    try:
+        await message.answer_document(
+            FSInputFile(path, filename=f"payroll_{ym[0]}{ym[1]:02d}.{fmt}"),
+            caption=f"Итого: <b>{fmt_money(payroll.total_cents)}</b>",
+        )
+    finally:
+        os.remove(path)
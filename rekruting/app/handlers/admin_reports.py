@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import asyncio
+from datetime import datetime
+from functools import partial
+
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
@@ -9,19 +13,30 @@ from ..repositories import (
     get_or_create_user,
     list_pending_reports,
     set_report_status,
+    set_reports_status_bulk,
     get_report_with_user_and_tasks,
-    list_admins,
     list_recent_reports,
     list_recent_report_edits,
+    report_edit_diff,
     list_recent_problems,
     now_local,
 )
-from ..states import AdminReject
+from ..states import AdminReject, AdminBulkReview
 from ..enums import ReportStatus
-from ..keyboards import admin_menu_inline
+from ..keyboards import admin_menu_inline, pending_bulk_inline
+from ..texts import fmt_date
 from ..config import Config
+from ..db import after_commit
+from ..payroll import invalidate_payroll_cache
+from ..outbox import enqueue, message_item
+from ..middlewares import AdminGuardMiddleware
+from ..admins import get_admin_ids
+from ..callbacks import CallbackPrefix, AdminCb, AdminHistoryCb, ReviewCb, BulkCb, BulkPickCb
 
 router = Router()
+router.callback_query.filter(CallbackPrefix(AdminCb, ReviewCb, BulkCb, BulkPickCb))
+router.message.middleware(AdminGuardMiddleware())
+router.callback_query.middleware(AdminGuardMiddleware())
 
 
 def _admin_display_name(admin) -> str:
@@ -29,13 +44,81 @@ def _admin_display_name(admin) -> str:
     return full or str(admin.tg_id)
 
 
-@router.callback_query(F.data == "admin:history:reports")
+def _report_sheet_payload(report) -> dict:
+    return {
+        "event": "report_created",
+        "created_at_utc": report.created_at.isoformat(),
+        "report_id": report.id,
+        "tg_id": report.user.tg_id,
+        "first_name": report.user.first_name,
+        "last_name": report.user.last_name,
+        "position": report.user.position,
+        "city": report.user.city,
+        "partner_name": report.partner_name,
+        "report_date": report.report_date.isoformat(),
+        "start_time": report.start_time.strftime("%H:%M"),
+        "end_time": report.end_time.strftime("%H:%M"),
+        "tasks": [{"type": t.work_type.name, "quantity": t.quantity} for t in report.tasks],
+        "comment": report.comment,
+        "media": [{"file_id": m.file_id, "media_type": m.media_type.value} for m in report.media],
+        "status": report.status.value,
+        "edit_count": report.edit_count,
+        "edited_at_utc": report.edited_at.isoformat() if report.edited_at else None,
+        "edited_by_tg_id": None,
+    }
+
+
+def _status_sheet_payload(report_id: int, status: ReportStatus, admin_tg_id: int, admin_comment: str | None) -> dict:
+    return {
+        "event": "report_status",
+        "changed_at_utc": datetime.utcnow().isoformat(),
+        "report_id": report_id,
+        "status": status.value,
+        "admin_tg_id": admin_tg_id,
+        "admin_comment": admin_comment,
+    }
+
+
+def _ids_text(ids: list[int]) -> str:
+    return ", ".join(f"<b>#{i}</b>" for i in ids)
+
+
+async def _notify_employees(session: AsyncSession, reports, status: ReportStatus, comment: str | None) -> None:
+    by_user: dict[int, list[int]] = {}
+    for r in reports:
+        by_user.setdefault(r.user.tg_id, []).append(r.id)
+
+    items = []
+    for tg_id, ids in by_user.items():
+        if status == ReportStatus.ACCEPTED:
+            if len(ids) == 1:
+                text = f"Ваш рапорт <b>#{ids[0]}</b> принят ✅"
+            else:
+                text = f"Ваши рапорты {_ids_text(ids)} приняты ✅"
+        else:
+            if len(ids) == 1:
+                text = f"Ваш рапорт <b>#{ids[0]}</b> отклонён ❌\nКомментарий: {comment}"
+            else:
+                text = f"Ваши рапорты {_ids_text(ids)} отклонены ❌\nКомментарий: {comment}"
+        items.append(message_item(tg_id, text))
+    await enqueue(session, items)
+
+
+async def _notify_admins(session: AsyncSession, config: Config, admin, ids: list[int], status: ReportStatus) -> None:
+    admin_ids = await get_admin_ids(session, config) - {admin.tg_id}
+    who = _admin_display_name(admin)
+    when = now_local().strftime("%d.%m.%Y %H:%M")
+    verb = "принят" if status == ReportStatus.ACCEPTED else "отклонён"
+    if len(ids) == 1:
+        note = f"Рапорт <b>#{ids[0]}</b> {verb} админом: {who}\nВремя: {when}"
+    else:
+        verb = "приняты" if status == ReportStatus.ACCEPTED else "отклонены"
+        note = f"Рапорты {_ids_text(ids)} {verb} админом: {who}\nВремя: {when}"
+    await enqueue(session, [message_item(aid, note) for aid in admin_ids])
+
+
+@router.callback_query(AdminHistoryCb.filter(F.kind == "reports"))
 async def admin_reports_history(cb: CallbackQuery, session: AsyncSession) -> None:
-    user = await get_or_create_user(session, cb.from_user.id)
-    if not user.is_admin:
-        await cb.answer("Нет доступа.", show_alert=True)
-        return
-
     rows = await list_recent_reports(session, limit=20)
     if not rows:
         await cb.message.answer("История рапортов пуста.", reply_markup=admin_menu_inline())
@@ -54,13 +137,19 @@ async def admin_reports_history(cb: CallbackQuery, session: AsyncSession) -> Non
     await cb.answer()
 
 
-@router.callback_query(F.data == "admin:history:edits")
-async def admin_edits_history(cb: CallbackQuery, session: AsyncSession) -> None:
-    user = await get_or_create_user(session, cb.from_user.id)
-    if not user.is_admin:
-        await cb.answer("Нет доступа.", show_alert=True)
-        return
+_EDIT_FIELD_NAMES = {
+    "report_date": "дата",
+    "start_time": "начало",
+    "end_time": "конец",
+    "partner_name": "напарник",
+    "comment": "комментарий",
+    "tasks": "работы",
+    "media": "вложение",
+}
 
+
+@router.callback_query(AdminHistoryCb.filter(F.kind == "edits"))
+async def admin_edits_history(cb: CallbackQuery, session: AsyncSession) -> None:
     rows = await list_recent_report_edits(session, limit=20)
     if not rows:
         await cb.message.answer("История изменений пуста.", reply_markup=admin_menu_inline())
@@ -71,20 +160,16 @@ async def admin_edits_history(cb: CallbackQuery, session: AsyncSession) -> None:
     for log, editor in rows:
         ename = f"{editor.first_name or ''} {editor.last_name or ''}".strip() or str(editor.tg_id)
         when = log.edited_at.strftime('%d.%m.%Y %H:%M')
-        lines.append(f"#{log.report_id} | {when} | {ename}")
+        fields = ", ".join(_EDIT_FIELD_NAMES.get(f, f) for f in report_edit_diff(log)) or "-"
+        lines.append(f"#{log.report_id} | {when} | {ename} | {fields}")
 
     text = "История изменений (последние 20):\n" + "\n".join(lines)
     await cb.message.answer(text, reply_markup=admin_menu_inline())
     await cb.answer()
 
 
-@router.callback_query(F.data == "admin:history:problems")
+@router.callback_query(AdminHistoryCb.filter(F.kind == "problems"))
 async def admin_problems_history(cb: CallbackQuery, session: AsyncSession) -> None:
-    user = await get_or_create_user(session, cb.from_user.id)
-    if not user.is_admin:
-        await cb.answer("Нет доступа.", show_alert=True)
-        return
-
     rows = await list_recent_problems(session, limit=20)
     if not rows:
         await cb.message.answer("История проблем пуста.", reply_markup=admin_menu_inline())
@@ -102,103 +187,139 @@ async def admin_problems_history(cb: CallbackQuery, session: AsyncSession) -> No
     await cb.answer()
 
 
-@router.callback_query(F.data == "admin:pending")
-async def pending_reports(cb: CallbackQuery, session: AsyncSession) -> None:
-    user = await get_or_create_user(session, cb.from_user.id)
-    if not user.is_admin:
-        await cb.answer("Нет доступа.", show_alert=True)
-        return
+def _pending_label(r) -> str:
+    uname = f"{r.user.first_name or ''} {r.user.last_name or ''}".strip() or str(r.user.tg_id)
+    return f"#{r.id} | {fmt_date(r.report_date)} | {uname}"
+
 
-    rows = await list_pending_reports(session, limit=15)
+@router.callback_query(AdminCb.filter(F.action == "pending"))
+async def pending_reports(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
+    rows = await list_pending_reports(session, limit=30)
     if not rows:
         await cb.message.answer("Нет рапортов на проверке.", reply_markup=admin_menu_inline())
         await cb.answer()
         return
 
-    ids = ", ".join([f"#{r.id}" for r in rows])
+    items = [(r.id, _pending_label(r)) for r in rows]
+    await state.set_state(AdminBulkReview.select)
+    await state.update_data(bulk_items=items, bulk_selected=[])
     await cb.message.answer(
-        "Рапорты на проверке (последние 15):\n"
-        f"{ids}\n\n"
-        "Открывайте рапорт через уведомление о новом рапорте (там есть кнопки ✅/❌).",
-        reply_markup=admin_menu_inline(),
+        "Рапорты на проверке (последние 30).\n"
+        "Отметьте нужные и примите/отклоните их одним действием:",
+        reply_markup=pending_bulk_inline(items, set()),
     )
     await cb.answer()
 
 
-@router.callback_query(F.data.startswith("r:accept:"))
-async def accept_report(cb: CallbackQuery, session: AsyncSession, sheets, config: Config) -> None:
+async def _bulk_redraw(cb: CallbackQuery, state: FSMContext, selected: set[int]) -> None:
+    data = await state.get_data()
+    items = [tuple(i) for i in data.get("bulk_items", [])]
+    await state.update_data(bulk_selected=sorted(selected))
+    try:
+        await cb.message.edit_reply_markup(reply_markup=pending_bulk_inline(items, selected))
+    except Exception:
+        pass
+    await cb.answer()
+
+
+@router.callback_query(AdminBulkReview.select, BulkPickCb.filter(F.action == "toggle"))
+async def bulk_toggle(cb: CallbackQuery, callback_data: BulkPickCb, state: FSMContext) -> None:
+    report_id = callback_data.report_id
+    data = await state.get_data()
+    selected = set(data.get("bulk_selected") or [])
+    selected ^= {report_id}
+    await _bulk_redraw(cb, state, selected)
+
+
+@router.callback_query(AdminBulkReview.select, BulkCb.filter(F.action == "all"))
+async def bulk_select_all(cb: CallbackQuery, state: FSMContext) -> None:
+    data = await state.get_data()
+    await _bulk_redraw(cb, state, {i[0] for i in data.get("bulk_items", [])})
+
+
+@router.callback_query(AdminBulkReview.select, BulkCb.filter(F.action == "none"))
+async def bulk_select_none(cb: CallbackQuery, state: FSMContext) -> None:
+    await _bulk_redraw(cb, state, set())
+
+
+@router.callback_query(AdminBulkReview.select, BulkCb.filter(F.action == "accept"), flags={"idempotent": True})
+async def bulk_accept(cb: CallbackQuery, state: FSMContext, session: AsyncSession, sheets, config: Config, idempotency_commit) -> None:
     admin = await get_or_create_user(session, cb.from_user.id)
-    if not admin.is_admin:
-        await cb.answer("Нет доступа.", show_alert=True)
-        return
 
-    report_id = int(cb.data.split(":")[-1])
-    report = await set_report_status(session, report_id, ReportStatus.ACCEPTED, admin_comment=None)
-    if report is None:
-        await cb.answer("Рапорт не найден.", show_alert=True)
+    data = await state.get_data()
+    selected = sorted(set(data.get("bulk_selected") or []))
+    if not selected:
+        await cb.answer("Ничего не выбрано.", show_alert=True)
         return
 
-    try:
-        await cb.bot.send_message(report.user.tg_id, f"Ваш рапорт <b>#{report.id}</b> принят ✅")
-    except Exception:
-        pass
+    reports = await set_reports_status_bulk(session, selected, ReportStatus.ACCEPTED, admin_comment=None)
+    idempotency_commit()
+    after_commit(session, invalidate_payroll_cache)
+    await state.clear()
+    ids = [r.id for r in reports]
+    if reports:
+        await _notify_employees(session, reports, ReportStatus.ACCEPTED, None)
+        await _notify_admins(session, config, admin, ids, ReportStatus.ACCEPTED)
+        if sheets is not None:
+            after_commit(session, partial(
+                asyncio.to_thread, sheets.append_report_statuses,
+                [_status_sheet_payload(r.id, ReportStatus.ACCEPTED, admin.tg_id, None) for r in reports],
+            ))
+            after_commit(session, partial(asyncio.to_thread, sheets.append_reports, [_report_sheet_payload(r) for r in reports]))
 
     try:
-        admins = await list_admins(session)
-        admin_ids = {a.tg_id for a in admins} | set(config.admin_ids)
-        admin_ids.discard(admin.tg_id)
-        who = _admin_display_name(admin)
-        when = now_local().strftime("%d.%m.%Y %H:%M")
-        note = f"Рапорт <b>#{report.id}</b> принят админом: {who}\nВремя: {when}"
-        for aid in admin_ids:
-            try:
-                await cb.bot.send_message(aid, note)
-            except Exception:
-                pass
+        await cb.message.edit_reply_markup(reply_markup=None)
     except Exception:
         pass
 
-    if sheets is not None:
-        try:
-            sheets.append_report_status({
-                "event": "report_status",
-                "changed_at_utc": __import__("datetime").datetime.utcnow().isoformat(),
-                "report_id": report.id,
-                "status": "accepted",
-                "admin_tg_id": admin.tg_id,
-                "admin_comment": None,
-            })
-        except Exception:
-            pass
+    if not reports:
+        await cb.message.answer("Выбранные рапорты уже обработаны.", reply_markup=admin_menu_inline())
+        await cb.answer()
+        return
+
+    await cb.message.answer(f"Принято рапортов: <b>{len(ids)}</b>\n{_ids_text(ids)}", reply_markup=admin_menu_inline())
+    await cb.answer("Принято.")
+
+
+@router.callback_query(AdminBulkReview.select, BulkCb.filter(F.action == "reject"))
+async def bulk_reject(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
+    data = await state.get_data()
+    selected = sorted(set(data.get("bulk_selected") or []))
+    if not selected:
+        await cb.answer("Ничего не выбрано.", show_alert=True)
+        return
+
+    await state.clear()
+    await state.set_state(AdminReject.comment)
+    await state.update_data(report_ids=selected)
+    await cb.message.answer(f"Введите комментарий для отклонения рапортов {_ids_text(selected)} (обязательно):")
+    await cb.answer()
+
+
+@router.callback_query(ReviewCb.filter(F.action == "accept"), flags={"idempotent": True})
+async def accept_report(
+    cb: CallbackQuery, callback_data: ReviewCb, session: AsyncSession, sheets, config: Config, idempotency_commit
+) -> None:
+    admin = await get_or_create_user(session, cb.from_user.id)
+
+    report_id = callback_data.report_id
+    report = await set_report_status(session, report_id, ReportStatus.ACCEPTED, admin_comment=None)
+    if report is None:
+        await cb.answer("Рапорт не найден.", show_alert=True)
+        return
+    idempotency_commit()
+    after_commit(session, invalidate_payroll_cache)
+
+    await _notify_employees(session, [report], ReportStatus.ACCEPTED, None)
+    await _notify_admins(session, config, admin, [report.id], ReportStatus.ACCEPTED)
 
     if sheets is not None:
-        try:
-            full = await get_report_with_user_and_tasks(session, report.id)
-            if full is not None:
-                payload = {
-                    "event": "report_created",
-                    "created_at_utc": full.created_at.isoformat(),
-                    "report_id": full.id,
-                    "tg_id": full.user.tg_id,
-                    "first_name": full.user.first_name,
-                    "last_name": full.user.last_name,
-                    "position": full.user.position,
-                    "city": full.user.city,
-                    "partner_name": full.partner_name,
-                    "report_date": full.report_date.isoformat(),
-                    "start_time": full.start_time.strftime("%H:%M"),
-                    "end_time": full.end_time.strftime("%H:%M"),
-                    "tasks": [{"type": t.work_type.name, "quantity": t.quantity} for t in full.tasks],
-                    "comment": full.comment,
-                    "media": [{"file_id": m.file_id, "media_type": m.media_type.value} for m in full.media],
-                    "status": full.status.value,
-                    "edit_count": full.edit_count,
-                    "edited_at_utc": full.edited_at.isoformat() if full.edited_at else None,
-                    "edited_by_tg_id": None,
-                }
-                sheets.append_report(payload)
-        except Exception:
-            pass
+        after_commit(session, partial(
+            asyncio.to_thread, sheets.append_report_status, _status_sheet_payload(report.id, ReportStatus.ACCEPTED, admin.tg_id, None)
+        ))
+        full = await get_report_with_user_and_tasks(session, report.id)
+        if full is not None:
+            after_commit(session, partial(asyncio.to_thread, sheets.append_report, _report_sheet_payload(full)))
 
     try:
         await cb.message.edit_reply_markup(reply_markup=None)
@@ -208,58 +329,51 @@ async def accept_report(cb: CallbackQuery, session: AsyncSession, sheets, config
     await cb.answer("Принято.")
 
 
-@router.callback_query(F.data.startswith("r:reject:"))
-async def reject_report(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
-    admin = await get_or_create_user(session, cb.from_user.id)
-    if not admin.is_admin:
-        await cb.answer("Нет доступа.", show_alert=True)
-        return
-
-    report_id = int(cb.data.split(":")[-1])
+@router.callback_query(ReviewCb.filter(F.action == "reject"))
+async def reject_report(cb: CallbackQuery, callback_data: ReviewCb, state: FSMContext, session: AsyncSession) -> None:
+    report_id = callback_data.report_id
     await state.set_state(AdminReject.comment)
-    await state.update_data(report_id=report_id)
+    await state.update_data(report_id=report_id, report_ids=None)
     await cb.message.answer(f"Введите комментарий для отклонения рапорта <b>#{report_id}</b> (обязательно):")
     await cb.answer()
 
 
 @router.message(AdminReject.comment, F.text)
 async def reject_comment(message, state: FSMContext, session: AsyncSession, sheets) -> None:
-    admin = await get_or_create_user(session, message.from_user.id)
-    if not admin.is_admin:
-        await state.clear()
-        await message.answer("Нет доступа.")
-        return
-
     data = await state.get_data()
-    report_id = int(data["report_id"])
     comment = message.text.strip()
     if len(comment) < 2:
         await message.answer("Комментарий слишком короткий. Введите ещё раз:")
         return
 
-    report = await set_report_status(session, report_id, ReportStatus.REJECTED, admin_comment=comment)
-    if report is None:
-        await message.answer("Рапорт не найден.")
+    if data.get("report_ids"):
+        reports = await set_reports_status_bulk(
+            session, [int(i) for i in data["report_ids"]], ReportStatus.REJECTED, admin_comment=comment
+        )
         await state.clear()
-        return
-
-    try:
-        await message.bot.send_message(report.user.tg_id, f"Ваш рапорт <b>#{report.id}</b> отклонён ❌\nКомментарий: {comment}")
-    except Exception:
-        pass
+        if not reports:
+            await message.answer("Выбранные рапорты уже обработаны.", reply_markup=admin_menu_inline())
+            return
+    else:
+        report = await set_report_status(session, int(data["report_id"]), ReportStatus.REJECTED, admin_comment=comment)
+        if report is None:
+            await message.answer("Рапорт не найден.")
+            await state.clear()
+            return
+        reports = [report]
+
+    await _notify_employees(session, reports, ReportStatus.REJECTED, comment)
 
     if sheets is not None:
-        try:
-            sheets.append_report_status({
-                "event": "report_status",
-                "changed_at_utc": __import__("datetime").datetime.utcnow().isoformat(),
-                "report_id": report.id,
-                "status": "rejected",
-                "admin_tg_id": admin.tg_id,
-                "admin_comment": comment,
-            })
-        except Exception:
-            pass
-
-    await message.answer(f"Готово. Рапорт <b>#{report.id}</b> отклонён.")
+        after_commit(session, partial(
+            asyncio.to_thread, sheets.append_report_statuses,
+            [_status_sheet_payload(r.id, ReportStatus.REJECTED, message.from_user.id, comment) for r in reports],
+        ))
+
+    after_commit(session, invalidate_payroll_cache)
+    ids = [r.id for r in reports]
+    if len(ids) == 1:
+        await message.answer(f"Готово. Рапорт <b>#{ids[0]}</b> отклонён.")
+    else:
+        await message.answer(f"Готово. Рапорты {_ids_text(ids)} отклонены.", reply_markup=admin_menu_inline())
     await state.clear()
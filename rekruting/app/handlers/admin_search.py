@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import html
+
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..repositories import search, SEARCH_PAGE_SIZE, SEARCH_WINDOW
+from ..keyboards import search_nav_inline
+from ..texts import fmt_date, human_report_status, human_urgency
+from ..middlewares import AdminGuardMiddleware
+from ..callbacks import CallbackPrefix, SearchCb
+
+router = Router()
+router.callback_query.filter(CallbackPrefix(SearchCb))
+router.message.middleware(AdminGuardMiddleware())
+router.callback_query.middleware(AdminGuardMiddleware())
+
+USAGE = (
+    "Использование: <code>/search &lt;текст&gt;</code>\n"
+    "Ищет по описанию, адресу и номеру самоката в проблемах и по комментариям в рапортах."
+)
+TITLES = {"problems": "проблемы", "reports": "рапорты"}
+WINDOW_NOTE = f"Показаны {SEARCH_WINDOW} последних совпадений, более старые не ранжируются — уточните запрос."
+
+
+def _line(kind: str, obj, snippet: str) -> str:
+    u = obj.user
+    who = f"{u.first_name or ''} {u.last_name or ''}".strip() or str(u.tg_id)
+    if kind == "problems":
+        head = f"<b>#{obj.id}</b> {fmt_date(obj.created_at.date())} | {who} | {human_urgency(obj.urgency)}"
+        tail = f"Самокат: {obj.scooter_number}" if obj.scooter_number else ""
+    else:
+        head = f"<b>#{obj.id}</b> {fmt_date(obj.report_date)} | {who} | {human_report_status(obj.status)}"
+        tail = ""
+    return "\n".join(part for part in (head, snippet, tail) if part)
+
+
+async def _render(session: AsyncSession, kind: str, query: str, page: int) -> tuple[str, object]:
+    rows, has_next = await search(session, kind, query, page)
+    title = f"Поиск «{html.escape(query)}» — {TITLES[kind]}, стр. {page + 1}"
+    start = page * SEARCH_PAGE_SIZE
+    note = f"\n\n{WINDOW_NOTE}" if not has_next and start + len(rows) >= SEARCH_WINDOW else ""
+    if not rows:
+        return f"{title}\n\nНичего не найдено.{note}", search_nav_inline(kind, page, False)
+    body = "\n\n".join(f"{start + i + 1}. {_line(kind, obj, snip)}" for i, (obj, snip) in enumerate(rows))
+    return f"{title}\n\n{body}{note}", search_nav_inline(kind, page, has_next)
+
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, state: FSMContext, session: AsyncSession) -> None:
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer(USAGE)
+        return
+
+    await state.update_data(search_query=query)
+    text, markup = await _render(session, "problems", query, 0)
+    await message.answer(text, reply_markup=markup)
+
+
+@router.callback_query(SearchCb.filter())
+async def search_page(cb: CallbackQuery, callback_data: SearchCb, state: FSMContext, session: AsyncSession) -> None:
+    kind, page = callback_data.kind, callback_data.page
+    query = (await state.get_data()).get("search_query")
+    if kind not in TITLES or page < 0 or not query:
+        await cb.answer("Поиск устарел, повторите /search.", show_alert=True)
+        return
+
+    text, markup = await _render(session, kind, query, page)
+    await cb.message.edit_text(text, reply_markup=markup)
+    await cb.answer()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import Config
+from ..analytics import compute_stats, default_window, GroupStats
+from ..texts import fmt_date
+from ..utils import parse_date
+from ..middlewares import AdminGuardMiddleware
+
+router = Router()
+router.message.middleware(AdminGuardMiddleware())
+router.callback_query.middleware(AdminGuardMiddleware())
+
+USAGE = (
+    "Использование:\n"
+    "<code>/stats</code> - последние 7 дней\n"
+    "<code>/stats 30</code> - последние N дней\n"
+    "<code>/stats 01.01.2026 31.01.2026</code> - период"
+)
+
+
+def _line(g: GroupStats) -> str:
+    return f"• {g.name}: <b>{g.tasks}</b> задач, {g.hours:.1f} ч, <b>{g.per_hour:.2f}</b>/ч"
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message, command: CommandObject, session: AsyncSession, config: Config) -> None:
+    parts = (command.args or "").split()
+    if not parts:
+        start, end = default_window()
+    elif len(parts) == 1 and parts[0].isdigit() and 0 < int(parts[0]) <= 366:
+        start, end = default_window(int(parts[0]))
+    elif len(parts) == 2 and parse_date(parts[0]) and parse_date(parts[1]):
+        start, end = parse_date(parts[0]), parse_date(parts[1])
+    else:
+        await message.answer(USAGE)
+        return
+
+    stats = await compute_stats(session, start, end, config.archive_dir)
+    if not stats.total_tasks and not stats.total_hours:
+        await message.answer(f"За {fmt_date(start)}–{fmt_date(end)} данных нет.")
+        return
+
+    lines = [
+        f"<b>Статистика {fmt_date(start)}–{fmt_date(end)}</b>",
+        f"Задач: <b>{stats.total_tasks}</b>, часов: <b>{stats.total_hours:.1f}</b>",
+    ]
+    if stats.per_hour_percentiles:
+        p = stats.per_hour_percentiles
+        lines.append(f"Задач/ч на сотрудника: p50 {p[50]:.2f}, p90 {p[90]:.2f}, p99 {p[99]:.2f}")
+
+    lines.append("\n<b>Города</b>")
+    for g in stats.cities[:10]:
+        lines.append(_line(g))
+        for wt in stats.city_work_types.get(g.name, [])[:5]:
+            lines.append(f"   – {wt.name}: {wt.tasks}, {wt.per_hour:.2f}/ч")
+
+    lines.append("\n<b>Лидеры</b>")
+    lines.extend(_line(g) for g in stats.leaders[:10])
+
+    lines.append("\n<b>Типы работ</b>")
+    lines.extend(f"• {g.name}: <b>{g.tasks}</b>" for g in stats.work_types)
+
+    lines.append("\n<b>Сотрудники (топ 15)</b>")
+    lines.extend(_line(g) for g in stats.workers[:15])
+
+    await message.answer("\n".join(lines))
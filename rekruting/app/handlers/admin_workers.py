@@ -5,21 +5,22 @@ from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..repositories import get_or_create_user, list_workers
+from ..repositories import list_workers
 from ..states import AdminSendMessage
 from ..keyboards import workers_inline, admin_menu_inline
 from ..texts import fmt_time
+from ..outbox import enqueue, message_item
+from ..middlewares import AdminGuardMiddleware
+from ..callbacks import CallbackPrefix, AdminCb, WorkerMsgCb
 
 router = Router()
+router.callback_query.filter(CallbackPrefix(AdminCb, WorkerMsgCb))
+router.message.middleware(AdminGuardMiddleware())
+router.callback_query.middleware(AdminGuardMiddleware())
 
 
-@router.callback_query(F.data == "admin:workers")
+@router.callback_query(AdminCb.filter(F.action == "workers"))
 async def workers_list(cb: CallbackQuery, session: AsyncSession) -> None:
-    admin = await get_or_create_user(session, cb.from_user.id)
-    if not admin.is_admin:
-        await cb.answer("Нет доступа.", show_alert=True)
-        return
-
     users = await list_workers(session, limit=30)
     lines = ["<b>Сотрудники</b> (до 30):\n"]
     btn_users = []
@@ -40,20 +41,15 @@ async def workers_list(cb: CallbackQuery, session: AsyncSession) -> None:
     await cb.answer()
 
 
-@router.callback_query(F.data == "admin:back")
+@router.callback_query(AdminCb.filter(F.action == "back"))
 async def back(cb: CallbackQuery) -> None:
     await cb.message.answer("Админ-панель:", reply_markup=admin_menu_inline())
     await cb.answer()
 
 
-@router.callback_query(F.data.startswith("admin:msg:"))
-async def msg_pick(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
-    admin = await get_or_create_user(session, cb.from_user.id)
-    if not admin.is_admin:
-        await cb.answer("Нет доступа.", show_alert=True)
-        return
-
-    target_tg_id = int(cb.data.split(":")[-1])
+@router.callback_query(WorkerMsgCb.filter(F.action == "msg"))
+async def msg_pick(cb: CallbackQuery, callback_data: WorkerMsgCb, state: FSMContext, session: AsyncSession) -> None:
+    target_tg_id = callback_data.tg_id
     await state.set_state(AdminSendMessage.text)
     await state.update_data(target_tg_id=target_tg_id)
     await cb.message.answer("Введите сообщение сотруднику:")
@@ -62,23 +58,14 @@ async def msg_pick(cb: CallbackQuery, state: FSMContext, session: AsyncSession)
 
 @router.message(AdminSendMessage.text, F.text)
 async def msg_send(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    admin = await get_or_create_user(session, message.from_user.id)
-    if not admin.is_admin:
-        await state.clear()
-        await message.answer("Нет доступа.")
-        return
-
     data = await state.get_data()
     target_tg_id = int(data["target_tg_id"])
     text = message.text
 
-    try:
-        await message.bot.send_message(target_tg_id, f"Сообщение от администратора:\n\n{text}")
-        await message.answer("Отправлено.", reply_markup=admin_menu_inline())
-    except Exception:
-        await message.answer(
-            "Не удалось отправить (возможно пользователь не писал боту).",
-            reply_markup=admin_menu_inline(),
-        )
+    ids = await enqueue(session, [message_item(target_tg_id, f"Сообщение от администратора:\n\n{text}")])
+    await message.answer(
+        f"Сообщение поставлено в очередь отправки (<b>#{ids[0]}</b>).",
+        reply_markup=admin_menu_inline(),
+    )
 
     await state.clear()
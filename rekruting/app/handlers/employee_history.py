@@ -11,11 +11,13 @@ from ..repositories import get_or_create_user, list_user_reports, sum_user_tasks
 from ..texts import fmt_date, human_report_status
 from ..keyboards import main_menu_inline, my_reports_inline
 from ..handlers.employee_reports import _start_report  
+from ..callbacks import CallbackPrefix, MenuCb, HistoryCb
 
 router = Router()
+router.callback_query.filter(CallbackPrefix(MenuCb, HistoryCb))
 
 
-@router.callback_query(F.data == "menu:history")
+@router.callback_query(MenuCb.filter(F.action == "history"))
 async def my_reports_cb(cb: CallbackQuery, session: AsyncSession) -> None:
     await _show(cb.message, cb.from_user.id, session)
     await cb.answer()
@@ -50,8 +52,8 @@ async def _show(message_obj, tg_id: int, session: AsyncSession) -> None:
     await message_obj.answer("\n".join(lines), reply_markup=my_reports_inline(ids))
 
 
-@router.callback_query(F.data.startswith("my:edit:"))
-async def edit_report(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
-    report_id = int(cb.data.split(":")[-1])
+@router.callback_query(HistoryCb.filter(F.action == "edit"))
+async def edit_report(cb: CallbackQuery, callback_data: HistoryCb, state: FSMContext, session: AsyncSession) -> None:
+    report_id = callback_data.report_id
     await _start_report(cb.message, cb.from_user.id, state, session, editing_report_id=report_id)
     await cb.answer()
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import asyncio
+from functools import partial
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
@@ -11,17 +14,24 @@ from ..repositories import (
     is_user_registered,
     get_setting_bool,
     create_problem,
-    list_admins,
+    get_media_fingerprints,
+    mark_media_sent_to_admins,
+    escalates_incident,
 )
 from ..states import ProblemCreate
-from ..keyboards import main_menu_inline, problem_type_inline, skip_inline, done_inline, urgency_inline, confirm_inline, back_to_menu_inline
-from ..utils import detect_media, format_problem_preview
+from ..keyboards import PROBLEM_TYPES, main_menu_inline, problem_type_inline, skip_inline, done_inline, urgency_inline, confirm_inline, back_to_menu_inline
+from ..utils import detect_media, format_problem_preview, format_media_reuse
 from ..enums import MediaType, ProblemUrgency
+from ..outbox import enqueue, message_item, media_item
+from ..admins import get_admin_ids
+from ..db import after_commit
+from ..callbacks import CallbackPrefix, MenuCb, ProblemCb, ProblemTypeCb, UrgencyCb
 
 router = Router()
+router.callback_query.filter(CallbackPrefix(MenuCb, ProblemCb, ProblemTypeCb, UrgencyCb))
 
 
-@router.callback_query(F.data == "menu:problem")
+@router.callback_query(MenuCb.filter(F.action == "problem"))
 async def problem_start_cb(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     await _start(cb.message, cb.from_user.id, state, session)
     await cb.answer()
@@ -43,10 +53,12 @@ async def _start(message_obj, tg_id: int, state: FSMContext, session: AsyncSessi
     await state.set_state(ProblemCreate.ptype)
 
 
-@router.callback_query(ProblemCreate.ptype, F.data.startswith("p:type:"))
-async def problem_type(cb: CallbackQuery, state: FSMContext) -> None:
-    parts = cb.data.split(":", 3)
-    ptype = parts[-1]
+@router.callback_query(ProblemCreate.ptype, ProblemTypeCb.filter())
+async def problem_type(cb: CallbackQuery, callback_data: ProblemTypeCb, state: FSMContext) -> None:
+    if not 0 <= callback_data.index < len(PROBLEM_TYPES):
+        await cb.answer()
+        return
+    ptype = PROBLEM_TYPES[callback_data.index]
     await state.update_data(problem_type=ptype)
     await cb.message.answer("Кратко опишите проблему текстом:", reply_markup=back_to_menu_inline())
     await state.set_state(ProblemCreate.description)
@@ -71,11 +83,11 @@ async def problem_address(message: Message, state: FSMContext) -> None:
         await message.answer("Укажите адрес/объект (минимум 3 символа):")
         return
     await state.update_data(address=addr)
-    await message.answer("Номер самоката (если есть, можно пропустить):", reply_markup=skip_inline("p:skip_scooter"))
+    await message.answer("Номер самоката (если есть, можно пропустить):", reply_markup=skip_inline(ProblemCb, "skip_scooter"))
     await state.set_state(ProblemCreate.scooter_number)
 
 
-@router.callback_query(ProblemCreate.scooter_number, F.data == "p:skip_scooter")
+@router.callback_query(ProblemCreate.scooter_number, ProblemCb.filter(F.action == "skip_scooter"))
 async def problem_skip_scooter(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     await state.update_data(scooter_number=None, media=[])
     await _ask_problem_media(cb.message, state, session)
@@ -94,11 +106,11 @@ async def _ask_problem_media(message: Message, state: FSMContext, session: Async
         await message.answer("Прикрепите 1–5 фото/видео (обязательно по настройкам). Отправляйте файлами.")
     else:
         await message.answer("Прикрепите 0–5 фото/видео. Отправляйте файлами или нажмите «Пропустить».",
-                             reply_markup=skip_inline("p:skip_media"))
+                             reply_markup=skip_inline(ProblemCb, "skip_media"))
     await state.set_state(ProblemCreate.media)
 
 
-@router.callback_query(ProblemCreate.media, F.data == "p:skip_media")
+@router.callback_query(ProblemCreate.media, ProblemCb.filter(F.action == "skip_media"))
 async def problem_skip_media(cb: CallbackQuery, state: FSMContext) -> None:
     await state.update_data(media=[])
     await cb.message.answer("Выберите срочность:", reply_markup=urgency_inline())
@@ -106,49 +118,60 @@ async def problem_skip_media(cb: CallbackQuery, state: FSMContext) -> None:
     await cb.answer()
 
 
-@router.callback_query(ProblemCreate.media, F.data == "p:media_done")
+@router.callback_query(ProblemCreate.media, ProblemCb.filter(F.action == "media_done"))
 async def problem_media_done(cb: CallbackQuery, state: FSMContext) -> None:
     await cb.message.answer("Выберите срочность:", reply_markup=urgency_inline())
     await state.set_state(ProblemCreate.urgency)
     await cb.answer()
 
 
-@router.message(ProblemCreate.media)
-async def problem_media_collect(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    media_item = detect_media(message)
+@router.message(ProblemCreate.media, flags={"album": True})
+async def problem_media_collect(
+    message: Message,
+    state: FSMContext,
+    session: AsyncSession,
+    album: list[Message] | None = None,
+) -> None:
+    items = [m for m in (detect_media(msg) for msg in (album or [message])) if m is not None]
     data = await state.get_data()
-    media_list: list[tuple[str, str]] = data.get("media", [])
+    media_list: list[tuple[str, str, str]] = data.get("media", [])
 
     required = await get_setting_bool(session, "photo_required_problems")
 
-    if media_item is None:
+    if not items:
         if required and not media_list:
             await message.answer("Нужно отправить хотя бы 1 фото или видео.")
         else:
             await message.answer(
                 "Отправьте фото/видео, или нажмите «Готово».",
-                reply_markup=done_inline("p:media_done", "p:skip_media" if not required and not media_list else None),
+                reply_markup=done_inline(ProblemCb, "media_done", "skip_media" if not required and not media_list else None),
             )
         return
 
     if len(media_list) >= 5:
-        await message.answer("Максимум 5 файлов. Нажмите «Готово».", reply_markup=done_inline("p:media_done"))
+        await message.answer("Максимум 5 файлов. Нажмите «Готово».", reply_markup=done_inline(ProblemCb, "media_done"))
         return
 
-    file_id, mtype = media_item
-    media_list.append((file_id, mtype.value))
+    free = 5 - len(media_list)
+    media_list.extend((file_id, mtype.value, file_unique_id) for file_id, mtype, file_unique_id in items[:free])
     await state.update_data(media=media_list)
 
-    if len(media_list) >= 5:
-        await message.answer("Добавлено 5/5. Нажмите «Готово».", reply_markup=done_inline("p:media_done"))
+    dropped = len(items) - free
+    if dropped > 0:
+        await message.answer(
+            f"Добавлено 5/5, лишние файлы ({dropped}) не сохранены. Нажмите «Готово».",
+            reply_markup=done_inline(ProblemCb, "media_done"),
+        )
+    elif len(media_list) >= 5:
+        await message.answer("Добавлено 5/5. Нажмите «Готово».", reply_markup=done_inline(ProblemCb, "media_done"))
     else:
         await message.answer(f"Добавлено {len(media_list)}/5. Отправьте ещё файл или нажмите «Готово».",
-                             reply_markup=done_inline("p:media_done"))
+                             reply_markup=done_inline(ProblemCb, "media_done"))
 
 
-@router.callback_query(ProblemCreate.urgency, F.data.startswith("p:urgency:"))
-async def problem_urgency(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
-    code = cb.data.split(":")[-1]
+@router.callback_query(ProblemCreate.urgency, UrgencyCb.filter(F.action == "urgency"))
+async def problem_urgency(cb: CallbackQuery, callback_data: UrgencyCb, state: FSMContext, session: AsyncSession) -> None:
+    code = callback_data.level
     urgency = {
         "urgent": ProblemUrgency.URGENT,
         "medium": ProblemUrgency.MEDIUM,
@@ -172,12 +195,12 @@ async def problem_urgency(cb: CallbackQuery, state: FSMContext, session: AsyncSe
         urgency=urgency,
         media_count=len(data.get("media", [])),
     )
-    await cb.message.answer(preview, reply_markup=confirm_inline("p:confirm", "p:cancel"))
+    await cb.message.answer(preview, reply_markup=confirm_inline(ProblemCb, "confirm", "cancel"))
     await state.set_state(ProblemCreate.confirm)
     await cb.answer()
 
 
-@router.callback_query(ProblemCreate.confirm, F.data == "p:cancel")
+@router.callback_query(ProblemCreate.confirm, ProblemCb.filter(F.action == "cancel"))
 async def problem_cancel(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     user = await get_or_create_user(session, cb.from_user.id)
     await state.clear()
@@ -185,13 +208,16 @@ async def problem_cancel(cb: CallbackQuery, state: FSMContext, session: AsyncSes
     await cb.answer()
 
 
-@router.callback_query(ProblemCreate.confirm, F.data == "p:confirm")
-async def problem_confirm(cb: CallbackQuery, state: FSMContext, session: AsyncSession, config: Config, sheets) -> None:
+@router.callback_query(ProblemCreate.confirm, ProblemCb.filter(F.action == "confirm"), flags={"idempotent": True})
+async def problem_confirm(
+    cb: CallbackQuery, state: FSMContext, session: AsyncSession, config: Config, sheets, idempotency_commit
+) -> None:
     data = await state.get_data()
     user = await get_or_create_user(session, cb.from_user.id, mark_admin=(cb.from_user.id in config.admin_ids))
 
-    media_list_raw: list[tuple[str, str]] = data.get("media", [])
-    media_list = [(fid, MediaType(mtype)) for fid, mtype in media_list_raw]
+    media_list_raw: list[tuple[str, str, str]] = data.get("media", [])
+    media_list = [(fid, MediaType(mtype), uid) for fid, mtype, uid in media_list_raw]
+    seen_before = await get_media_fingerprints(session, [uid for _, _, uid in media_list])
 
     problem = await create_problem(
         session=session,
@@ -202,38 +228,45 @@ async def problem_confirm(cb: CallbackQuery, state: FSMContext, session: AsyncSe
         scooter_number=data.get("scooter_number"),
         urgency=data["urgency"],
         media=media_list,
+        incident_window_hours=config.incident_window_hours,
     )
+    idempotency_commit()
+    incident = problem.incident
+    attached = incident is not None and incident.first_problem_id != problem.id
 
     await state.clear()
-    await cb.message.answer(f"Сообщение отправлено. Номер: <b>#{problem.id}</b>", reply_markup=main_menu_inline(is_working=user.is_working))
+    if sheets is not None:
+        payload = {
+            "event": "problem_created",
+            "created_at_utc": problem.created_at.isoformat(),
+            "problem_id": problem.id,
+            "tg_id": user.tg_id,
+            "tg_username": cb.from_user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "position": user.position,
+            "city": user.city,
+            "problem_type": problem.problem_type,
+            "description": problem.description,
+            "address": problem.address,
+            "scooter_number": problem.scooter_number,
+            "urgency": data["urgency"].value,
+            "media": [{"file_id": fid, "media_type": mt.value} for fid, mt, _ in media_list],
+        }
+        after_commit(session, partial(asyncio.to_thread, sheets.append_problem, payload))
+
+    if not attached or await escalates_incident(session, problem):
+        await _notify_admins(session, config, cb, user, problem, media_list, seen_before)
+
+    reply = f"Сообщение отправлено. Номер: <b>#{problem.id}</b>"
+    if attached:
+        reply += f"\nПохожая проблема уже зарегистрирована — добавлено к инциденту <b>#{incident.id}</b>."
+    await cb.message.answer(reply, reply_markup=main_menu_inline(is_working=user.is_working))
     await cb.answer()
 
-    if sheets is not None:
-        try:
-            uname = cb.from_user.username
-            payload = {
-                "event": "problem_created",
-                "created_at_utc": problem.created_at.isoformat(),
-                "problem_id": problem.id,
-                "tg_id": user.tg_id,
-                "tg_username": uname,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "position": user.position,
-                "city": user.city,
-                "problem_type": problem.problem_type,
-                "description": problem.description,
-                "address": problem.address,
-                "scooter_number": problem.scooter_number,
-                "urgency": data["urgency"].value,
-                "media": [{"file_id": fid, "media_type": mt.value} for fid, mt in media_list],
-            }
-            sheets.append_problem(payload)
-        except Exception:
-            pass
-
-    admins = await list_admins(session)
-    admin_ids = {a.tg_id for a in admins} | set(config.admin_ids)
+
+async def _notify_admins(session: AsyncSession, config: Config, cb: CallbackQuery, user, problem, media_list, seen_before) -> None:
+    admin_ids = await get_admin_ids(session, config)
     display_name = f"{user.first_name or ''} {user.last_name or ''}".strip() or str(user.tg_id)
     name_link = f"<a href=\"tg://user?id={user.tg_id}\">{display_name}</a>"
     uname = cb.from_user.username
@@ -246,17 +279,25 @@ async def problem_confirm(cb: CallbackQuery, state: FSMContext, session: AsyncSe
         f"Описание: {problem.description}\n"
         f"Адрес/объект: {problem.address}\n"
         f"Номер самоката: {problem.scooter_number if problem.scooter_number else '-'}\n"
-        f"Срочность: <b>{data['urgency'].value}</b>\n"
+        f"Срочность: <b>{problem.urgency.value}</b>\n"
         f"Вложений: <b>{len(media_list)}</b>"
     )
-
-    for admin_id in admin_ids:
-        try:
-            await cb.bot.send_message(admin_id, text)
-            for fid, mtype in media_list:
-                if mtype == MediaType.PHOTO:
-                    await cb.bot.send_photo(admin_id, photo=fid)
-                else:
-                    await cb.bot.send_video(admin_id, video=fid)
-        except Exception:
-            pass
+    if problem.incident is not None and problem.incident.first_problem_id != problem.id:
+        reason = "срочное дополнение" if problem.urgency == ProblemUrgency.URGENT else "срочность выше прежних сообщений"
+        text += f"\nИнцидент: <b>#{problem.incident.id}</b> ({reason} — отправлено без ожидания сводки)"
+    elif problem.incident is not None:
+        text += f"\nИнцидент: <b>#{problem.incident.id}</b> (повторные сообщения придут сводкой)"
+    if seen_before:
+        text += "\n\n" + format_media_reuse(seen_before.values())
+
+    to_send = [
+        (fid, mtype, uid) for fid, mtype, uid in media_list
+        if uid not in seen_before or seen_before[uid].admins_notified_at is None
+    ]
+    await enqueue(session, [
+        item
+        for admin_id in admin_ids
+        for item in [message_item(admin_id, text)] + [media_item(admin_id, mtype, fid) for fid, mtype, _ in to_send]
+    ])
+    if admin_ids:
+        await mark_media_sent_to_admins(session, [uid for _, _, uid in to_send])
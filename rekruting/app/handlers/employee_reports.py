@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import asyncio
+from functools import partial
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
@@ -12,11 +15,11 @@ from ..repositories import (
     list_active_work_types,
     get_setting_bool,
     create_report,
-    list_admins,
-    get_report_with_user_and_tasks,
     get_last_closed_session_for_date,
     link_session_to_report,
     update_report_with_log,
+    get_media_fingerprints,
+    mark_media_sent_to_admins,
 )
 from ..states import ReportCreate
 from ..keyboards import (
@@ -27,11 +30,16 @@ from ..keyboards import (
     report_review_inline,
     back_to_menu_inline,
 )
-from ..utils import parse_date, parse_time, detect_media, format_report_preview, format_admin_report
+from ..utils import parse_date, parse_time, detect_media, format_report_preview, format_admin_report, format_media_reuse
 from ..texts import fmt_time
-from ..enums import MediaType
+from ..outbox import enqueue, message_item, media_item
+from ..admins import get_admin_ids
+from ..db import after_commit
+from ..payroll import invalidate_payroll_cache
+from ..callbacks import CallbackPrefix, MenuCb, ReportCb, WorkTypeCb, WorkTypeToggleCb
 
 router = Router()
+router.callback_query.filter(CallbackPrefix(MenuCb, ReportCb, WorkTypeCb, WorkTypeToggleCb))
 
 
 async def _ask_work_types(message, state: FSMContext, session: AsyncSession) -> None:
@@ -45,7 +53,7 @@ async def _ask_work_types(message, state: FSMContext, session: AsyncSession) ->
     await state.set_state(ReportCreate.work_types)
 
 
-@router.callback_query(F.data == "menu:report")
+@router.callback_query(MenuCb.filter(F.action == "report"))
 async def report_start_cb(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     await _start_report(cb.message, cb.from_user.id, state, session, editing_report_id=None)
     await cb.answer()
@@ -79,11 +87,11 @@ async def report_date(message: Message, state: FSMContext, session: AsyncSession
 
     await state.update_data(report_date=d)
 
-    await message.answer("Введите имя напарника (можно пропустить):", reply_markup=skip_inline("r:skip_partner"))
+    await message.answer("Введите имя напарника (можно пропустить):", reply_markup=skip_inline(ReportCb, "skip_partner"))
     await state.set_state(ReportCreate.partner_name)
 
 
-@router.callback_query(ReportCreate.partner_name, F.data == "r:skip_partner")
+@router.callback_query(ReportCreate.partner_name, ReportCb.filter(F.action == "skip_partner"))
 async def report_skip_partner(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     await state.update_data(partner_name=None)
     await _ask_work_types(cb.message, state, session)
@@ -97,9 +105,9 @@ async def report_partner_name(message: Message, state: FSMContext, session: Asyn
     await _ask_work_types(message, state, session)
 
 
-@router.callback_query(ReportCreate.work_types, F.data.startswith("wt:toggle:"))
-async def report_wt_toggle(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
-    wt_id = int(cb.data.split(":")[-1])
+@router.callback_query(ReportCreate.work_types, WorkTypeToggleCb.filter(F.action == "toggle"))
+async def report_wt_toggle(cb: CallbackQuery, callback_data: WorkTypeToggleCb, state: FSMContext, session: AsyncSession) -> None:
+    wt_id = callback_data.work_type_id
     data = await state.get_data()
     selected: set[int] = set(data.get("selected_wt_ids") or set())
     if wt_id in selected:
@@ -115,7 +123,7 @@ async def report_wt_toggle(cb: CallbackQuery, state: FSMContext, session: AsyncS
     await cb.answer()
 
 
-@router.callback_query(ReportCreate.work_types, F.data == "wt:next")
+@router.callback_query(ReportCreate.work_types, WorkTypeCb.filter(F.action == "next"))
 async def report_wt_next(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     data = await state.get_data()
     selected: set[int] = set(data.get("selected_wt_ids") or set())
@@ -174,7 +182,7 @@ async def report_quantity(message: Message, state: FSMContext, session: AsyncSes
             await message.answer(
                 f"Время подставлено автоматически: <b>{fmt_time(ws.started_at.time())}</b>–<b>{fmt_time(ws.ended_at.time())}</b>\n"
                 "Комментарий (можно пропустить):",
-                reply_markup=skip_inline("r:skip_comment"),
+                reply_markup=skip_inline(ReportCb, "skip_comment"),
             )
             await state.set_state(ReportCreate.comment)
             return
@@ -206,18 +214,18 @@ async def report_end_time(message: Message, state: FSMContext) -> None:
         await message.answer("Неверный формат. Пример: 18:10. Введите ещё раз:")
         return
     await state.update_data(end_time=t)
-    await message.answer("Комментарий (можно пропустить):", reply_markup=skip_inline("r:skip_comment"))
+    await message.answer("Комментарий (можно пропустить):", reply_markup=skip_inline(ReportCb, "skip_comment"))
     await state.set_state(ReportCreate.comment)
 
 
-@router.callback_query(ReportCreate.comment, F.data == "r:skip_comment")
+@router.callback_query(ReportCreate.comment, ReportCb.filter(F.action == "skip_comment"))
 async def report_skip_comment(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     await state.update_data(comment=None)
     photo_required = await get_setting_bool(session, "photo_required_reports")
     if photo_required:
         await cb.message.answer("Прикрепите фото/видео (обязательно по настройкам).")
     else:
-        await cb.message.answer("Прикрепите фото/видео (можно пропустить):", reply_markup=skip_inline("r:skip_media"))
+        await cb.message.answer("Прикрепите фото/видео (можно пропустить):", reply_markup=skip_inline(ReportCb, "skip_media"))
     await state.set_state(ReportCreate.media)
     await cb.answer()
 
@@ -229,11 +237,11 @@ async def report_comment(message: Message, state: FSMContext, session: AsyncSess
     if photo_required:
         await message.answer("Прикрепите фото/видео (обязательно по настройкам).")
     else:
-        await message.answer("Прикрепите фото/видео (можно пропустить):", reply_markup=skip_inline("r:skip_media"))
+        await message.answer("Прикрепите фото/видео (можно пропустить):", reply_markup=skip_inline(ReportCb, "skip_media"))
     await state.set_state(ReportCreate.media)
 
 
-@router.callback_query(ReportCreate.media, F.data == "r:skip_media")
+@router.callback_query(ReportCreate.media, ReportCb.filter(F.action == "skip_media"))
 async def report_skip_media(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     await state.update_data(media=None)
     await _send_report_preview(cb.message, cb.from_user.id, state, session)
@@ -248,7 +256,7 @@ async def report_media(message: Message, state: FSMContext, session: AsyncSessio
         if photo_required:
             await message.answer("Нужно отправить фото или видео.")
         else:
-            await message.answer("Отправьте фото/видео или нажмите «Пропустить».", reply_markup=skip_inline("r:skip_media"))
+            await message.answer("Отправьте фото/видео или нажмите «Пропустить».", reply_markup=skip_inline(ReportCb, "skip_media"))
         return
 
     await state.update_data(media=media)
@@ -271,13 +279,13 @@ async def _send_report_preview(message, tg_id: int, state: FSMContext, session:
     text = format_report_preview(user, report_date, start_time, end_time, tasks_named, partner_name, comment)
 
     if data.get("editing_report_id"):
-        await message.answer(text, reply_markup=confirm_inline("r:confirm_edit", "r:cancel"))
+        await message.answer(text, reply_markup=confirm_inline(ReportCb, "confirm_edit", "cancel"))
     else:
-        await message.answer(text, reply_markup=confirm_inline("r:confirm", "r:cancel"))
+        await message.answer(text, reply_markup=confirm_inline(ReportCb, "confirm", "cancel"))
     await state.set_state(ReportCreate.confirm)
 
 
-@router.callback_query(ReportCreate.confirm, F.data == "r:cancel")
+@router.callback_query(ReportCreate.confirm, ReportCb.filter(F.action == "cancel"))
 async def report_cancel(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
     user = await get_or_create_user(session, cb.from_user.id)
     await state.clear()
@@ -285,11 +293,16 @@ async def report_cancel(cb: CallbackQuery, state: FSMContext, session: AsyncSess
     await cb.answer()
 
 
-@router.callback_query(ReportCreate.confirm, F.data == "r:confirm")
-async def report_confirm(cb: CallbackQuery, state: FSMContext, session: AsyncSession, config: Config, sheets) -> None:
+@router.callback_query(ReportCreate.confirm, ReportCb.filter(F.action == "confirm"), flags={"idempotent": True})
+async def report_confirm(
+    cb: CallbackQuery, state: FSMContext, session: AsyncSession, config: Config, sheets, idempotency_commit
+) -> None:
     data = await state.get_data()
     user = await get_or_create_user(session, cb.from_user.id, mark_admin=(cb.from_user.id in config.admin_ids))
 
+    media = data.get("media")
+    seen_before = await get_media_fingerprints(session, [media[2]] if media else [])
+
     report = await create_report(
         session=session,
         user_id=user.id,
@@ -299,68 +312,67 @@ async def report_confirm(cb: CallbackQuery, state: FSMContext, session: AsyncSes
         partner_name=data.get("partner_name"),
         comment=data.get("comment"),
         tasks=data["tasks"],
-        media=data.get("media"),
+        media=media,
     )
+    idempotency_commit()
 
     ws_id = data.get("work_session_id")
     if ws_id:
         await link_session_to_report(session, int(ws_id), report.id)
 
     await state.clear()
-    await cb.message.answer(f"Рапорт отправлен. Номер: <b>#{report.id}</b>", reply_markup=main_menu_inline(is_working=user.is_working))
-    await cb.answer()
 
     if sheets is not None:
-        try:
-            payload = {
-                "event": "report_created",
-                "created_at_utc": report.created_at.isoformat(),
-                "report_id": report.id,
-                "tg_id": user.tg_id,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "position": user.position,
-                "city": user.city,
-                "partner_name": report.partner_name,
-                "report_date": report.report_date.isoformat(),
-                "start_time": report.start_time.strftime("%H:%M"),
-                "end_time": report.end_time.strftime("%H:%M"),
-                "tasks": [{"type": t.work_type.name, "quantity": t.quantity} for t in report.tasks],
-                "comment": report.comment,
-                "media": [{"file_id": m.file_id, "media_type": m.media_type.value} for m in report.media],
-                "status": report.status.value,
-                "edit_count": report.edit_count,
-                "edited_at_utc": report.edited_at.isoformat() if report.edited_at else None,
-                "edited_by_tg_id": None,
-            }
-            sheets.append_report(payload)
-        except Exception:
-            pass
-
-    admins = await list_admins(session)
-    admin_ids = {a.tg_id for a in admins} | set(config.admin_ids)
-    report_full = await get_report_with_user_and_tasks(session, report.id)
-    if report_full is None:
-        return
-
-    tasks_lines = "\n".join([f"• {t.work_type.name}: <b>{t.quantity}</b>" for t in report_full.tasks]) or "-"
-    admin_text = format_admin_report(report_full, tasks_lines)
+        payload = {
+            "event": "report_created",
+            "created_at_utc": report.created_at.isoformat(),
+            "report_id": report.id,
+            "tg_id": user.tg_id,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "position": user.position,
+            "city": user.city,
+            "partner_name": report.partner_name,
+            "report_date": report.report_date.isoformat(),
+            "start_time": report.start_time.strftime("%H:%M"),
+            "end_time": report.end_time.strftime("%H:%M"),
+            "tasks": [{"type": t.work_type.name, "quantity": t.quantity} for t in report.tasks],
+            "comment": report.comment,
+            "media": [{"file_id": m.file_id, "media_type": m.media_type.value} for m in report.media],
+            "status": report.status.value,
+            "edit_count": report.edit_count,
+            "edited_at_utc": report.edited_at.isoformat() if report.edited_at else None,
+            "edited_by_tg_id": None,
+        }
+        after_commit(session, partial(asyncio.to_thread, sheets.append_report, payload))
+
+    admin_ids = await get_admin_ids(session, config)
+    tasks_lines = "\n".join([f"• {t.work_type.name}: <b>{t.quantity}</b>" for t in report.tasks]) or "-"
+    admin_text = format_admin_report(report, tasks_lines)
+    if seen_before:
+        admin_text += "\n\n" + format_media_reuse(seen_before.values())
+
+    to_send = [
+        m for m in report.media
+        if m.file_unique_id not in seen_before or seen_before[m.file_unique_id].admins_notified_at is None
+    ][:1]
+    await enqueue(session, [
+        item
+        for admin_id in admin_ids
+        for item in [message_item(admin_id, admin_text, report_review_inline(report.id))]
+        + [media_item(admin_id, m.media_type, m.file_id) for m in to_send]
+    ])
+    if admin_ids:
+        await mark_media_sent_to_admins(session, [m.file_unique_id for m in to_send])
 
-    for admin_id in admin_ids:
-        try:
-            await cb.bot.send_message(admin_id, admin_text, reply_markup=report_review_inline(report.id))
-            if report_full.media:
-                m = report_full.media[0]
-                if m.media_type == MediaType.PHOTO:
-                    await cb.bot.send_photo(admin_id, photo=m.file_id)
-                else:
-                    await cb.bot.send_video(admin_id, video=m.file_id)
-        except Exception:
-            pass
+    await cb.message.answer(f"Рапорт отправлен. Номер: <b>#{report.id}</b>", reply_markup=main_menu_inline(is_working=user.is_working))
+    await cb.answer()
 
 
-@router.callback_query(ReportCreate.confirm, F.data == "r:confirm_edit")
-async def report_confirm_edit(cb: CallbackQuery, state: FSMContext, session: AsyncSession, config: Config, sheets) -> None:
+@router.callback_query(ReportCreate.confirm, ReportCb.filter(F.action == "confirm_edit"), flags={"idempotent": True})
+async def report_confirm_edit(
+    cb: CallbackQuery, state: FSMContext, session: AsyncSession, config: Config, sheets, idempotency_commit
+) -> None:
     data = await state.get_data()
     user = await get_or_create_user(session, cb.from_user.id, mark_admin=(cb.from_user.id in config.admin_ids))
     report_id = int(data["editing_report_id"])
@@ -378,38 +390,32 @@ async def report_confirm_edit(cb: CallbackQuery, state: FSMContext, session: Asy
         media=data.get("media"),
     )
     await state.clear()
+    if updated is not None:
+        idempotency_commit()
+        await _publish_report_edit(session, config, sheets, user, updated)
+
     await cb.message.answer(f"Рапорт <b>#{report_id}</b> обновлён.", reply_markup=main_menu_inline(is_working=user.is_working))
     await cb.answer()
 
-    if updated is None:
-        return
+
+async def _publish_report_edit(session: AsyncSession, config: Config, sheets, user, updated) -> None:
+    after_commit(session, invalidate_payroll_cache)
 
     if sheets is not None:
-        try:
-            payload = {
-                "event": "report_edited",
-                "edited_at_utc": updated.edited_at.isoformat() if updated.edited_at else None,
-                "report_id": updated.id,
-                "editor_tg_id": user.tg_id,
-                "editor_name": f"{user.first_name} {user.last_name}",
-                "edit_count": updated.edit_count,
-            }
-            sheets.append_report_edit(payload)
-        except Exception:
-            pass
-
-    admins = await list_admins(session)
-    admin_ids = {a.tg_id for a in admins} | set(config.admin_ids)
-    try:
-        msg = (
-            f"✏️ Рапорт <b>#{updated.id}</b> отредактирован.\n"
-            f"Кто: {user.first_name} {user.last_name} ({user.city})\n"
-            f"Правок: <b>{updated.edit_count}</b>"
-        )
-        for admin_id in admin_ids:
-            try:
-                await cb.bot.send_message(admin_id, msg)
-            except Exception:
-                pass
-    except Exception:
-        pass
+        payload = {
+            "event": "report_edited",
+            "edited_at_utc": updated.edited_at.isoformat() if updated.edited_at else None,
+            "report_id": updated.id,
+            "editor_tg_id": user.tg_id,
+            "editor_name": f"{user.first_name} {user.last_name}",
+            "edit_count": updated.edit_count,
+        }
+        after_commit(session, partial(asyncio.to_thread, sheets.append_report_edit, payload))
+
+    admin_ids = await get_admin_ids(session, config)
+    msg = (
+        f"✏️ Рапорт <b>#{updated.id}</b> отредактирован.\n"
+        f"Кто: {user.first_name} {user.last_name} ({user.city})\n"
+        f"Правок: <b>{updated.edit_count}</b>"
+    )
+    await enqueue(session, [message_item(admin_id, msg) for admin_id in admin_ids])
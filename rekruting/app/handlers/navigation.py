@@ -6,11 +6,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..repositories import get_or_create_user, is_user_registered
 from ..keyboards import main_menu_inline
+from ..callbacks import CallbackPrefix, MenuCb
 
 router = Router()
+router.callback_query.filter(CallbackPrefix(MenuCb))
 
 
-@router.callback_query(F.data == "menu:main")
+@router.callback_query(MenuCb.filter(F.action == "main"))
 async def menu_main(cb: CallbackQuery, session: AsyncSession) -> None:
     user = await get_or_create_user(session, cb.from_user.id)
     if not await is_user_registered(user):
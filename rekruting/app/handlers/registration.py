@@ -5,38 +5,46 @@ from aiogram.types import CallbackQuery, Message, ReplyKeyboardRemove
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..config import Config
 from ..keyboards import city_pick_inline, contact_request_kb, main_menu_inline
-from ..repositories import get_or_create_user
+from ..repositories import save_user_profile
 from ..states import Registration
+from ..callbacks import CallbackPrefix, CityCb, CityPickCb
 
 router = Router()
+router.callback_query.filter(CallbackPrefix(CityCb, CityPickCb))
+
+PROFILE_FIELDS = ("first_name", "last_name", "position", "phone", "leader")
+
+
+async def _save_profile(tg_id: int, city: str, state: FSMContext, session: AsyncSession, config: Config):
+    data = await state.get_data()
+    profile = {k: data[k] for k in PROFILE_FIELDS if data.get(k)}
+    profile["city"] = city
+    user = await save_user_profile(session, tg_id, profile, mark_admin=(tg_id in config.admin_ids))
+    await state.clear()
+    return user
 
 
 @router.message(Registration.first_name, F.text)
-async def reg_first_name(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    user = await get_or_create_user(session, message.from_user.id)
-    user.first_name = message.text.strip()
-    await session.commit()
+async def reg_first_name(message: Message, state: FSMContext) -> None:
+    await state.update_data(first_name=message.text.strip())
 
     await message.answer("Введите <b>фамилию</b>:")
     await state.set_state(Registration.last_name)
 
 
 @router.message(Registration.last_name, F.text)
-async def reg_last_name(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    user = await get_or_create_user(session, message.from_user.id)
-    user.last_name = message.text.strip()
-    await session.commit()
+async def reg_last_name(message: Message, state: FSMContext) -> None:
+    await state.update_data(last_name=message.text.strip())
 
     await message.answer("Введите <b>должность</b>:")
     await state.set_state(Registration.position)
 
 
 @router.message(Registration.position, F.text)
-async def reg_position(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    user = await get_or_create_user(session, message.from_user.id)
-    user.position = message.text.strip()
-    await session.commit()
+async def reg_position(message: Message, state: FSMContext) -> None:
+    await state.update_data(position=message.text.strip())
 
     await message.answer(
         "Отправьте <b>номер телефона</b>, привязанный к Telegram, кнопкой ниже:",
@@ -46,7 +54,7 @@ async def reg_position(message: Message, state: FSMContext, session: AsyncSessio
 
 
 @router.message(Registration.phone, F.contact)
-async def reg_phone(message: Message, state: FSMContext, session: AsyncSession) -> None:
+async def reg_phone(message: Message, state: FSMContext) -> None:
     contact = message.contact
     if contact.user_id != message.from_user.id:
         await message.answer(
@@ -55,9 +63,7 @@ async def reg_phone(message: Message, state: FSMContext, session: AsyncSession)
         )
         return
 
-    user = await get_or_create_user(session, message.from_user.id)
-    user.phone = (contact.phone_number or "").strip()
-    await session.commit()
+    await state.update_data(phone=(contact.phone_number or "").strip())
 
     await message.answer("Укажите <b>лидера</b> (с кем контакт):", reply_markup=ReplyKeyboardRemove())
     await state.set_state(Registration.leader)
@@ -72,57 +78,47 @@ async def reg_phone_invalid(message: Message) -> None:
 
 
 @router.message(Registration.leader, F.text)
-async def reg_leader(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    user = await get_or_create_user(session, message.from_user.id)
-    user.leader = message.text.strip()
-    await session.commit()
+async def reg_leader(message: Message, state: FSMContext) -> None:
+    await state.update_data(leader=message.text.strip())
 
     await message.answer("Выберите <b>город</b> кнопкой или введите вручную:", reply_markup=city_pick_inline())
     await state.set_state(Registration.city)
 
 
-@router.callback_query(Registration.city, F.data.startswith("city:set:"))
-async def reg_city_set(cb: CallbackQuery, state: FSMContext, session: AsyncSession) -> None:
-    city = cb.data.split(":", 2)[-1].strip()
-    user = await get_or_create_user(session, cb.from_user.id)
-    user.city = city
-    await session.commit()
+@router.callback_query(Registration.city, CityPickCb.filter(F.action == "set"))
+async def reg_city_set(
+    cb: CallbackQuery, callback_data: CityPickCb, state: FSMContext, session: AsyncSession, config: Config
+) -> None:
+    user = await _save_profile(cb.from_user.id, callback_data.city.strip(), state, session, config)
 
-    await state.clear()
     await cb.message.answer("Профиль сохранен. Выберите действие:", reply_markup=main_menu_inline(is_working=user.is_working))
     await cb.answer()
 
 
-@router.callback_query(Registration.city, F.data == "city:manual")
+@router.callback_query(Registration.city, CityCb.filter(F.action == "manual"))
 async def reg_city_manual(cb: CallbackQuery) -> None:
     await cb.message.answer("Введите <b>город</b> текстом:")
     await cb.answer()
 
 
-@router.callback_query(Registration.city, F.data == "city:location")
+@router.callback_query(Registration.city, CityCb.filter(F.action == "location"))
 async def reg_city_location(cb: CallbackQuery) -> None:
     await cb.message.answer("Отправьте геолокацию сообщением: 📎 (скрепка) -> Геопозиция.")
     await cb.answer()
 
 
 @router.message(Registration.city, F.location)
-async def reg_city_location_msg(message: Message, state: FSMContext, session: AsyncSession) -> None:
+async def reg_city_location_msg(message: Message, state: FSMContext, session: AsyncSession, config: Config) -> None:
     loc = message.location
     city = f"GPS {loc.latitude:.5f},{loc.longitude:.5f}"
 
-    user = await get_or_create_user(session, message.from_user.id)
-    user.city = city
-    await session.commit()
+    user = await _save_profile(message.from_user.id, city, state, session, config)
 
-    await state.clear()
     await message.answer("Профиль сохранен. Выберите действие:", reply_markup=main_menu_inline(is_working=user.is_working))
 
 
 @router.message(Registration.city, F.text)
-async def reg_city(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    user = await get_or_create_user(session, message.from_user.id)
-    user.city = message.text.strip()
-    await session.commit()
+async def reg_city(message: Message, state: FSMContext, session: AsyncSession, config: Config) -> None:
+    user = await _save_profile(message.from_user.id, message.text.strip(), state, session, config)
 
-    await state.clear()
     await message.answer("Профиль сохранен. Выберите действие:", reply_markup=main_menu_inline(is_working=user.is_working))
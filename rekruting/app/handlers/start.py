@@ -8,8 +8,9 @@ from aiogram.types import Message, FSInputFile
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..admins import is_admin
 from ..config import Config
-from ..repositories import get_or_create_user, is_user_registered
+from ..repositories import get_or_create_user, get_user, is_user_registered
 from ..states import Registration
 from ..keyboards import main_menu_inline, admin_menu_inline
 from ..texts import WELCOME_TEXT
@@ -20,11 +21,14 @@ router = Router()
 @router.message(CommandStart())
 async def cmd_start(message: Message, state: FSMContext, session: AsyncSession, config: Config) -> None:
     tg_id = message.from_user.id
-    user = await get_or_create_user(session, tg_id, mark_admin=(tg_id in config.admin_ids))
+    if tg_id in config.admin_ids:
+        user = await get_or_create_user(session, tg_id, mark_admin=True)
+    else:
+        user = await get_user(session, tg_id)
 
     await state.clear()
 
-    if not await is_user_registered(user):
+    if user is None or not await is_user_registered(user):
         await message.answer("Для работы нужно заполнить профиль.\n\nВведите <b>имя</b>:")
         await state.set_state(Registration.first_name)
         return
@@ -34,8 +38,7 @@ async def cmd_start(message: Message, state: FSMContext, session: AsyncSession,
 
 @router.message(Command("admin"))
 async def cmd_admin(message: Message, session: AsyncSession, config: Config) -> None:
-    user = await get_or_create_user(session, message.from_user.id, mark_admin=(message.from_user.id in config.admin_ids))
-    if not user.is_admin:
+    if not await is_admin(session, config, message.from_user.id):
         await message.answer("Нет доступа.")
         return
     await message.answer("Админ-панель:", reply_markup=admin_menu_inline())
@@ -7,11 +7,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..repositories import get_or_create_user, is_user_registered, start_work, stop_work, get_setting_text
 from ..keyboards import main_menu_inline
 from ..texts import fmt_time
+from ..db import after_commit
+from ..payroll import invalidate_payroll_cache
+from ..callbacks import CallbackPrefix, WorkCb
 
 router = Router()
+router.callback_query.filter(CallbackPrefix(WorkCb))
 
 
-@router.callback_query(F.data == "work:start")
+@router.callback_query(WorkCb.filter(F.action == "start"))
 async def work_start(cb: CallbackQuery, session: AsyncSession) -> None:
     user = await get_or_create_user(session, cb.from_user.id)
     if not await is_user_registered(user):
@@ -30,7 +34,7 @@ async def work_start(cb: CallbackQuery, session: AsyncSession) -> None:
     await cb.answer()
 
 
-@router.callback_query(F.data == "work:stop")
+@router.callback_query(WorkCb.filter(F.action == "stop"))
 async def work_stop(cb: CallbackQuery, session: AsyncSession) -> None:
     user = await get_or_create_user(session, cb.from_user.id)
     if not await is_user_registered(user):
@@ -39,6 +43,7 @@ async def work_stop(cb: CallbackQuery, session: AsyncSession) -> None:
         return
 
     ws = await stop_work(session, user)
+    after_commit(session, invalidate_payroll_cache)
     if ws is None:
         await cb.message.answer("У вас не было активной смены. Главное меню:", reply_markup=main_menu_inline(is_working=False))
         await cb.answer()
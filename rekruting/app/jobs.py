@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .admins import get_admin_ids
+from .archive import archive_old_records
+from .backup import make_backup, sqlite_path
+from .config import Config
+from .db import after_commit, commit
+from .outbox import enqueue, message_item
+from .payroll import invalidate_payroll_cache
+from .repositories import (
+    close_stale_work_sessions,
+    list_incidents_for_digest,
+    mark_incidents_digested,
+    list_tg_ids_missing_report,
+    get_setting_text,
+    set_setting_text,
+    purge_outbox,
+    now_local,
+)
+from .scheduler import Scheduler
+from .utils import format_incident_digest
+
+AUTO_CLOSE_INTERVAL = 600.0
+REMINDER_INTERVAL = 900.0
+ARCHIVE_INTERVAL = 6 * 3600.0
+INCIDENT_DIGEST_INTERVAL = 900.0
+OUTBOX_PURGE_INTERVAL = 24 * 3600.0
+OUTBOX_KEEP_DAYS = 14
+
+AUTO_CLOSED_TEXT = (
+    "Ваша смена была автоматически закрыта: она длилась дольше {hours} ч.\n"
+    "Не забывайте нажимать «🔴 Закончить работу»."
+)
+REMINDER_TEXT = "Вы не сдали рапорт за сегодняшнюю смену. Пожалуйста, сдайте его через меню «Сдать рапорт»."
+
+
+async def auto_close_sessions(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    max_hours: int,
+) -> dict:
+    async with sessionmaker() as session:
+        tg_ids = await close_stale_work_sessions(session, max_hours)
+        text = AUTO_CLOSED_TEXT.format(hours=max_hours)
+        await enqueue(session, [message_item(tg_id, text) for tg_id in tg_ids])
+        if tg_ids:
+            after_commit(session, invalidate_payroll_cache)
+        await commit(session)
+    return {"closed": len(tg_ids)}
+
+
+async def report_reminders(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    reminder_hour: int,
+) -> dict:
+    now = now_local()
+    today = now.date().isoformat()
+    if now.hour < reminder_hour:
+        return {"skipped": "too early"}
+
+    async with sessionmaker() as session:
+        if await get_setting_text(session, "report_reminders_sent_on") == today:
+            return {"skipped": "already sent"}
+        tg_ids = await list_tg_ids_missing_report(session, now.date())
+        await enqueue(session, [message_item(tg_id, REMINDER_TEXT) for tg_id in tg_ids])
+        await set_setting_text(session, "report_reminders_sent_on", today)
+        await commit(session)
+    return {"reminded": len(tg_ids)}
+
+
+async def incident_digest(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    config: Config,
+) -> dict:
+    async with sessionmaker() as session:
+        items = await list_incidents_for_digest(session)
+        if not items:
+            return {"incidents": 0}
+        admin_ids = await get_admin_ids(session, config)
+        texts = [format_incident_digest(inc, problems) for inc, problems in items]
+        await enqueue(session, [message_item(admin_id, t) for t in texts for admin_id in admin_ids])
+        await mark_incidents_digested(session, [(inc.id, inc.undigested_count) for inc, _ in items])
+        await commit(session)
+    return {"incidents": len(items), "queued": len(texts) * len(admin_ids)}
+
+
+async def purge_sent_notifications(sessionmaker: async_sessionmaker[AsyncSession], keep_days: int) -> dict:
+    async with sessionmaker() as session:
+        purged = await purge_outbox(session, datetime.utcnow() - timedelta(days=keep_days))
+        await commit(session)
+    return {"purged": purged}
+
+
+async def archive_records(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    archive_dir: str,
+    after_days: int,
+) -> dict:
+    cutoff = (now_local().date() - timedelta(days=after_days)).replace(day=1)
+    async with sessionmaker() as session:
+        counts = await archive_old_records(session, archive_dir, cutoff, on_batch=invalidate_payroll_cache)
+    return {"cutoff": cutoff.isoformat(), **counts}
+
+
+async def backup_database(db_path: str, backup_dir: str, keep: int) -> dict:
+    info = await make_backup(db_path, backup_dir, keep)
+    return {"backup": info.name, "size": info.size}
+
+
+def register_jobs(
+    scheduler: Scheduler,
+    config: Config,
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> None:
+    scheduler.add_job(
+        "auto_close_sessions",
+        AUTO_CLOSE_INTERVAL,
+        lambda: auto_close_sessions(sessionmaker, config.work_session_max_hours),
+        first_delay=5.0,
+    )
+    scheduler.add_job(
+        "report_reminders",
+        REMINDER_INTERVAL,
+        lambda: report_reminders(sessionmaker, config.report_reminder_hour),
+        first_delay=30.0,
+    )
+    scheduler.add_job(
+        "purge_sent_notifications",
+        OUTBOX_PURGE_INTERVAL,
+        lambda: purge_sent_notifications(sessionmaker, OUTBOX_KEEP_DAYS),
+        first_delay=120.0,
+    )
+    if config.incident_window_hours > 0:
+        scheduler.add_job(
+            "incident_digest",
+            INCIDENT_DIGEST_INTERVAL,
+            lambda: incident_digest(sessionmaker, config),
+            first_delay=60.0,
+        )
+    if config.archive_after_days > 0:
+        scheduler.add_job(
+            "archive_records",
+            ARCHIVE_INTERVAL,
+            lambda: archive_records(sessionmaker, config.archive_dir, config.archive_after_days),
+            first_delay=300.0,
+        )
+    db_path = sqlite_path(config.database_url)
+    if db_path is not None and config.backup_interval_hours > 0:
+        scheduler.add_job(
+            "backup_database",
+            config.backup_interval_hours * 3600.0,
+            lambda: backup_database(db_path, config.backup_dir, config.backup_keep),
+            first_delay=60.0,
+        )
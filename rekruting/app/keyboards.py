@@ -1,62 +1,105 @@
 from __future__ import annotations
 
+from functools import cache
+
+from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-
+from .callbacks import (
+    MenuCb,
+    WorkCb,
+    WorkTypeCb,
+    WorkTypeToggleCb,
+    ProblemTypeCb,
+    UrgencyCb,
+    HistoryCb,
+    CityCb,
+    CityPickCb,
+    AdminCb,
+    AdminHistoryCb,
+    ReviewCb,
+    BulkCb,
+    BulkPickCb,
+    SettingsCb,
+    SettingToggleCb,
+    WorkerMsgCb,
+    BroadcastCb,
+    SearchCb,
+    BackupCb,
+    BackupRestoreCb,
+)
+
+PROBLEM_TYPES = (
+    "поломка техники",
+    "ошибка в задании",
+    "нету самоката",
+    "проблема с приложением",
+    "аварийная ситуация",
+    "другое",
+)
+
+
+@cache
 def main_menu_inline(*, is_working: bool) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     if not is_working:
-        kb.button(text="🟢 Начал работу", callback_data="work:start")
+        kb.button(text="🟢 Начал работу", callback_data=WorkCb(action="start"))
     else:
-        kb.button(text="🔴 Закончить работу", callback_data="work:stop")
+        kb.button(text="🔴 Закончить работу", callback_data=WorkCb(action="stop"))
 
-    kb.button(text="Сдать рапорт", callback_data="menu:report")
-    kb.button(text="Сообщить о проблеме", callback_data="menu:problem")
-    kb.button(text="Мои рапорты", callback_data="menu:history")
+    kb.button(text="Сдать рапорт", callback_data=MenuCb(action="report"))
+    kb.button(text="Сообщить о проблеме", callback_data=MenuCb(action="problem"))
+    kb.button(text="Мои рапорты", callback_data=MenuCb(action="history"))
     kb.adjust(1, 2, 1)
     return kb.as_markup()
 
 
+@cache
 def back_to_menu_inline() -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
-    kb.button(text="⬅️ В меню", callback_data="menu:main")
+    kb.button(text="⬅️ В меню", callback_data=MenuCb(action="main"))
     return kb.as_markup()
 
 
+@cache
 def admin_menu_inline() -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
-    kb.button(text="Рапорты на проверке", callback_data="admin:pending")
-    kb.button(text="История рапортов", callback_data="admin:history:reports")
-    kb.button(text="История изменений", callback_data="admin:history:edits")
-    kb.button(text="История проблем", callback_data="admin:history:problems")
-    kb.button(text="Настройки", callback_data="admin:settings")
-    kb.button(text="Сообщение дня", callback_data="admin:motd")
-    kb.button(text="Сотрудники", callback_data="admin:workers")
-    kb.button(text="⬅️ В меню", callback_data="menu:main")
+    kb.button(text="Рапорты на проверке", callback_data=AdminCb(action="pending"))
+    kb.button(text="История рапортов", callback_data=AdminHistoryCb(action="history", kind="reports"))
+    kb.button(text="История изменений", callback_data=AdminHistoryCb(action="history", kind="edits"))
+    kb.button(text="История проблем", callback_data=AdminHistoryCb(action="history", kind="problems"))
+    kb.button(text="Настройки", callback_data=AdminCb(action="settings"))
+    kb.button(text="Сообщение дня", callback_data=AdminCb(action="motd"))
+    kb.button(text="Сотрудники", callback_data=AdminCb(action="workers"))
+    kb.button(text="Рассылка", callback_data=AdminCb(action="broadcast"))
+    kb.button(text="⬅️ В меню", callback_data=MenuCb(action="main"))
     kb.adjust(1)
     return kb.as_markup()
 
 
-def skip_inline(action: str) -> InlineKeyboardMarkup:
+@cache
+def skip_inline(factory: type[CallbackData], action: str) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
-    kb.button(text="Пропустить", callback_data=action)
+    kb.button(text="Пропустить", callback_data=factory(action=action))
     return kb.as_markup()
 
 
-def done_inline(done_action: str, skip_action: str | None = None) -> InlineKeyboardMarkup:
+@cache
+def done_inline(factory: type[CallbackData], done_action: str, skip_action: str | None = None) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
-    kb.button(text="Готово", callback_data=done_action)
+    kb.button(text="Готово", callback_data=factory(action=done_action))
     if skip_action:
-        kb.button(text="Пропустить", callback_data=skip_action)
+        kb.button(text="Пропустить", callback_data=factory(action=skip_action))
     kb.adjust(2)
     return kb.as_markup()
 
 
-def confirm_inline(confirm: str, cancel: str) -> InlineKeyboardMarkup:
+@cache
+def confirm_inline(factory: type[CallbackData], confirm: str, cancel: str) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
-    kb.button(text="Подтвердить и отправить", callback_data=confirm)
-    kb.button(text="Отмена", callback_data=cancel)
+    kb.button(text="Подтвердить и отправить", callback_data=factory(action=confirm))
+    kb.button(text="Отмена", callback_data=factory(action=cancel))
     kb.adjust(1, 1)
     return kb.as_markup()
 
@@ -65,56 +108,64 @@ def work_types_select_inline(items: list[tuple[int, str]], selected: set[int]) -
     kb = InlineKeyboardBuilder()
     for wt_id, name in items:
         mark = "✅ " if wt_id in selected else "☑️ "
-        kb.button(text=f"{mark}{name}", callback_data=f"wt:toggle:{wt_id}")
-    kb.button(text="Далее", callback_data="wt:next")
+        kb.button(text=f"{mark}{name}", callback_data=WorkTypeToggleCb(action="toggle", work_type_id=wt_id))
+    kb.button(text="Далее", callback_data=WorkTypeCb(action="next"))
     kb.adjust(1)
     return kb.as_markup()
 
 
 def report_review_inline(report_id: int) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
-    kb.button(text="✅ Принять", callback_data=f"r:accept:{report_id}")
-    kb.button(text="❌ Отклонить", callback_data=f"r:reject:{report_id}")
+    kb.button(text="✅ Принять", callback_data=ReviewCb(action="accept", report_id=report_id))
+    kb.button(text="❌ Отклонить", callback_data=ReviewCb(action="reject", report_id=report_id))
     kb.adjust(2)
     return kb.as_markup()
 
 
+def pending_bulk_inline(items: list[tuple[int, str]], selected: set[int]) -> InlineKeyboardMarkup:
+    kb = InlineKeyboardBuilder()
+    for report_id, label in items:
+        mark = "✅ " if report_id in selected else "☑️ "
+        kb.button(text=f"{mark}{label}", callback_data=BulkPickCb(action="toggle", report_id=report_id))
+    kb.button(text="Выбрать все", callback_data=BulkCb(action="all"))
+    kb.button(text="Снять выбор", callback_data=BulkCb(action="none"))
+    kb.button(text=f"✅ Принять ({len(selected)})", callback_data=BulkCb(action="accept"))
+    kb.button(text=f"❌ Отклонить ({len(selected)})", callback_data=BulkCb(action="reject"))
+    kb.button(text="⬅️ Назад", callback_data=AdminCb(action="back"))
+    kb.adjust(*([1] * len(items)), 2, 2, 1)
+    return kb.as_markup()
+
+
 def settings_inline(photo_reports: bool, photo_problems: bool) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     kb.button(
         text=f"Фото в рапорте: {'обяз.' if photo_reports else 'не обяз.'}",
-        callback_data="set:toggle:photo_required_reports",
+        callback_data=SettingToggleCb(action="toggle", key="photo_required_reports"),
     )
     kb.button(
         text=f"Фото в проблеме: {'обяз.' if photo_problems else 'не обяз.'}",
-        callback_data="set:toggle:photo_required_problems",
+        callback_data=SettingToggleCb(action="toggle", key="photo_required_problems"),
     )
-    kb.button(text="➕ Добавить тип работ", callback_data="set:add_work_type")
+    kb.button(text="➕ Добавить тип работ", callback_data=SettingsCb(action="add_work_type"))
     kb.adjust(1)
     return kb.as_markup()
 
 
+@cache
 def problem_type_inline() -> InlineKeyboardMarkup:
-    items = [
-        "поломка техники",
-        "ошибка в задании",
-        "нету самоката",
-        "проблема с приложением",
-        "аварийная ситуация",
-        "другое",
-    ]
-    kb = InlineKeyboardBuilder()
-    for i, name in enumerate(items):
-        kb.button(text=name, callback_data=f"p:type:{i}:{name}")
+    kb = InlineKeyboardBuilder()
+    for i, name in enumerate(PROBLEM_TYPES):
+        kb.button(text=name, callback_data=ProblemTypeCb(index=i))
     kb.adjust(1)
     return kb.as_markup()
 
 
+@cache
 def urgency_inline() -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
-    kb.button(text="🔴 срочно", callback_data="p:urgency:urgent")
-    kb.button(text="🟡 средне", callback_data="p:urgency:medium")
-    kb.button(text="🟢 не срочно", callback_data="p:urgency:low")
+    kb.button(text="🔴 срочно", callback_data=UrgencyCb(action="urgency", level="urgent"))
+    kb.button(text="🟡 средне", callback_data=UrgencyCb(action="urgency", level="medium"))
+    kb.button(text="🟢 не срочно", callback_data=UrgencyCb(action="urgency", level="low"))
     kb.adjust(1)
     return kb.as_markup()
 
@@ -122,8 +173,8 @@ def urgency_inline() -> InlineKeyboardMarkup:
 def my_reports_inline(report_ids: list[int]) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     for rid in report_ids:
-        kb.button(text=f"✏️ Редактировать #{rid}", callback_data=f"my:edit:{rid}")
-    kb.button(text="⬅️ В меню", callback_data="menu:main")
+        kb.button(text=f"✏️ Редактировать #{rid}", callback_data=HistoryCb(action="edit", report_id=rid))
+    kb.button(text="⬅️ В меню", callback_data=MenuCb(action="main"))
     kb.adjust(1)
     return kb.as_markup()
 
@@ -131,22 +182,67 @@ def my_reports_inline(report_ids: list[int]) -> InlineKeyboardMarkup:
 def workers_inline(users: list[tuple[int, str]]) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     for tg_id, label in users:
-        kb.button(text=f"✉️ {label}", callback_data=f"admin:msg:{tg_id}")
-    kb.button(text="⬅️ Назад", callback_data="admin:back")
+        kb.button(text=f"✉️ {label}", callback_data=WorkerMsgCb(action="msg", tg_id=tg_id))
+    kb.button(text="⬅️ Назад", callback_data=AdminCb(action="back"))
+    kb.adjust(1)
+    return kb.as_markup()
+
+
+@cache
+def broadcast_audience_inline() -> InlineKeyboardMarkup:
+    kb = InlineKeyboardBuilder()
+    kb.button(text="👥 Всем сотрудникам", callback_data=BroadcastCb(action="all"))
+    kb.button(text="📍 По городу", callback_data=BroadcastCb(action="city"))
+    kb.button(text="👤 По лидеру", callback_data=BroadcastCb(action="leader"))
+    kb.button(text="Отмена", callback_data=BroadcastCb(action="cancel"))
+    kb.adjust(1)
+    return kb.as_markup()
+
+
+@cache
+def motd_broadcast_inline() -> InlineKeyboardMarkup:
+    kb = InlineKeyboardBuilder()
+    kb.button(text="📣 Разослать всем сейчас", callback_data=BroadcastCb(action="motd"))
+    kb.button(text="⬅️ Назад", callback_data=AdminCb(action="back"))
     kb.adjust(1)
     return kb.as_markup()
 
 
+def search_nav_inline(kind: str, page: int, has_next: bool) -> InlineKeyboardMarkup:
+    kb = InlineKeyboardBuilder()
+    nav = 0
+    if page > 0:
+        kb.button(text="◀️", callback_data=SearchCb(kind=kind, page=page - 1))
+        nav += 1
+    if has_next:
+        kb.button(text="▶️", callback_data=SearchCb(kind=kind, page=page + 1))
+        nav += 1
+    other = "reports" if kind == "problems" else "problems"
+    kb.button(text="Искать в рапортах" if other == "reports" else "Искать в проблемах", callback_data=SearchCb(kind=other, page=0))
+    kb.adjust(*([nav] if nav else []), 1)
+    return kb.as_markup()
+
+
+def restore_confirm_inline(name: str) -> InlineKeyboardMarkup:
+    kb = InlineKeyboardBuilder()
+    kb.button(text="♻️ Восстановить", callback_data=BackupRestoreCb(action="restore", name=name))
+    kb.button(text="Отмена", callback_data=BackupCb(action="cancel"))
+    kb.adjust(2)
+    return kb.as_markup()
+
+
+@cache
 def city_pick_inline() -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
-    kb.button(text="📍 Варшава", callback_data="city:set:Варшава")
-    kb.button(text="📍 Вроцлав", callback_data="city:set:Вроцлав")
-    kb.button(text="✍️ Ввести вручную", callback_data="city:manual")
-    kb.button(text="📌 Отправить местоположение", callback_data="city:location")
+    kb.button(text="📍 Варшава", callback_data=CityPickCb(action="set", city="Варшава"))
+    kb.button(text="📍 Вроцлав", callback_data=CityPickCb(action="set", city="Вроцлав"))
+    kb.button(text="✍️ Ввести вручную", callback_data=CityCb(action="manual"))
+    kb.button(text="📌 Отправить местоположение", callback_data=CityCb(action="location"))
     kb.adjust(2, 2)
     return kb.as_markup()
 
 
+@cache
 def contact_request_kb() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[[KeyboardButton(text="Отправить номер телефона", request_contact=True)]],
@@ -7,11 +7,23 @@ from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
 
-from .config import load_config
-from .db import make_engine, make_sessionmaker, init_db
-from .middlewares import DbSessionMiddleware, ConfigMiddleware, SheetsMiddleware
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from .config import Config, load_config
+from .db import make_engine, make_sessionmaker, init_db, commit
+from .fsm_storage import PersistentStorage
+from .middlewares import (
+    CommitBeforeRequestMiddleware,
+    DbSessionMiddleware,
+    ConfigMiddleware,
+    SheetsMiddleware,
+    ThrottlingMiddleware,
+    IdempotencyMiddleware,
+    AlbumMiddleware,
+)
 from .repositories import seed_defaults
-from .google_sheets import GoogleSheetsClient, SheetsTarget
+from .states import Registration
+from .workers import Workers
 
 from .handlers import (
     start,
@@ -25,6 +37,13 @@ from .handlers import (
     admin_settings,
     admin_motd,
     admin_workers,
+    admin_export,
+    admin_payroll,
+    admin_stats,
+    admin_broadcast,
+    admin_backup,
+    admin_search,
+    admin_outbox,
     employee_menu,  
 )
 
@@ -35,49 +54,48 @@ async def on_startup(dispatcher: Dispatcher, bot: Bot) -> None:
     await init_db(engine)
     async with sessionmaker() as session:
         await seed_defaults(session)
+        await commit(session)
     logging.getLogger(__name__).info("DB initialized and defaults seeded.")
 
     sheets = dispatcher.get("sheets")
     if sheets is not None:
         try:
-            sheets.ensure_sheets_exist()
+            await asyncio.to_thread(sheets.ensure_sheets_exist)
             logging.getLogger(__name__).info("Google Sheets is ready.")
         except Exception:
             logging.getLogger(__name__).exception("Google Sheets init failed.")
 
+    workers = dispatcher["workers"]
+    await workers.start(bot)
+    dispatcher["sender"] = workers.sender
 
-async def main() -> None:
-    logging.basicConfig(level=logging.INFO)
 
-    config = load_config()
+async def on_shutdown(dispatcher: Dispatcher) -> None:
+    await dispatcher["workers"].stop()
 
-    engine = make_engine(config.database_url)
-    sessionmaker = make_sessionmaker(engine)
 
-    sheets = None
-    if config.google_sheets is not None:
-        target = SheetsTarget(
-            spreadsheet_id=config.google_sheets.spreadsheet_id,
-            sheet_reports=config.google_sheets.sheet_reports,
-            sheet_problems=config.google_sheets.sheet_problems,
-            sheet_edits=config.google_sheets.sheet_edits,
-            sheet_statuses=config.google_sheets.sheet_statuses,
-        )
-        sheets = GoogleSheetsClient(config.google_sheets.service_account_file, target)
+def setup_bot(bot: Bot) -> Bot:
+    bot.session.middleware(CommitBeforeRequestMiddleware())
+    return bot
 
-    bot = Bot(
-        token=config.bot_token,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
-    )
-    dp = Dispatcher()
 
+def build_dispatcher(config: Config, engine: AsyncEngine, sessionmaker: async_sessionmaker[AsyncSession], sheets) -> Dispatcher:
+    dp = Dispatcher(storage=PersistentStorage(sessionmaker, Registration))
+
+    dp["config"] = config
     dp["engine"] = engine
     dp["sessionmaker"] = sessionmaker
     dp["sheets"] = sheets
+    dp["workers"] = Workers(config, sessionmaker, dp.storage)
+    dp["scheduler"] = dp["workers"].scheduler
 
     dp.update.middleware(ConfigMiddleware(config))
-    dp.update.middleware(DbSessionMiddleware(sessionmaker))
+    dp["db_sessions"] = DbSessionMiddleware(sessionmaker)
+    dp.update.middleware(dp["db_sessions"])
     dp.update.middleware(SheetsMiddleware(sheets))
+    dp.callback_query.outer_middleware(ThrottlingMiddleware())
+    dp.callback_query.middleware(IdempotencyMiddleware())
+    dp.message.middleware(AlbumMiddleware())
 
     dp.include_router(start.router)
     dp.include_router(registration.router)
@@ -93,10 +111,47 @@ async def main() -> None:
     dp.include_router(admin_settings.router)
     dp.include_router(admin_motd.router)
     dp.include_router(admin_workers.router)
+    dp.include_router(admin_export.router)
+    dp.include_router(admin_payroll.router)
+    dp.include_router(admin_stats.router)
+    dp.include_router(admin_broadcast.router)
+    dp.include_router(admin_backup.router)
+    dp.include_router(admin_search.router)
+    dp.include_router(admin_outbox.router)
 
     dp.include_router(employee_menu.router)  
 
     dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return dp
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+
+    config = load_config()
+
+    engine = make_engine(config.database_url)
+    sessionmaker = make_sessionmaker(engine)
+
+    sheets = None
+    if config.google_sheets is not None:
+        from .google_sheets import GoogleSheetsClient, SheetsTarget
+
+        target = SheetsTarget(
+            spreadsheet_id=config.google_sheets.spreadsheet_id,
+            sheet_reports=config.google_sheets.sheet_reports,
+            sheet_problems=config.google_sheets.sheet_problems,
+            sheet_edits=config.google_sheets.sheet_edits,
+            sheet_statuses=config.google_sheets.sheet_statuses,
+        )
+        sheets = GoogleSheetsClient(config.google_sheets.service_account_file, target)
+
+    bot = setup_bot(Bot(
+        token=config.bot_token,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    ))
+    dp = build_dispatcher(config, engine, sessionmaker, sheets)
 
     await dp.start_polling(bot)
 
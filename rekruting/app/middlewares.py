@@ -1,16 +1,71 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from typing import Callable, Awaitable, Any
 from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 
+from .admins import is_admin
 from .config import Config
+from .db import LazySession, commit, commit_deferred, run_after_commit
+
+
+_unit_of_work: ContextVar[tuple[asyncio.Task | None, LazySession] | None] = ContextVar("unit_of_work", default=None)
+
+
+# Commits the update's unit of work before each Bot API call made by the task that owns it,
+# so the SQLite write lock is never held across network I/O. After-commit hooks stay queued
+# until DbSessionMiddleware finishes the update; a handler that fails after such a call
+# keeps whatever was committed before it and only the hooks covering that part run.
+class CommitBeforeRequestMiddleware(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):
+        current = _unit_of_work.get()
+        if current is not None:
+            task, session = current
+            if session.opened and task is asyncio.current_task():
+                await commit_deferred(session)
+        return await make_request(bot, method)
 
 
 class DbSessionMiddleware(BaseMiddleware):
     def __init__(self, sessionmaker: async_sessionmaker[AsyncSession]):
         super().__init__()
         self._sessionmaker = sessionmaker
+        self.updates = 0
+        self.sessions_opened = 0
+        self._active = 0
+        self._idle = asyncio.Condition()
+        self._open = asyncio.Event()
+        self._open.set()
+        self._exclusive = asyncio.Lock()
+
+    async def _leave(self) -> None:
+        async with self._idle:
+            self._active -= 1
+            self._idle.notify_all()
+
+    # Holds new updates back and waits for the in-flight ones to finish, so the caller is the
+    # only writer left. Meant to be entered from inside a handler, which stops counting itself.
+    @asynccontextmanager
+    async def exclusive(self):
+        await self._leave()
+        try:
+            async with self._exclusive:
+                self._open.clear()
+                try:
+                    async with self._idle:
+                        await self._idle.wait_for(lambda: self._active == 0)
+                    yield
+                finally:
+                    self._open.set()
+        finally:
+            self._active += 1
 
     async def __call__(
         self,
@@ -18,9 +73,29 @@ class DbSessionMiddleware(BaseMiddleware):
         event: Any,
         data: dict[str, Any],
     ) -> Any:
-        async with self._sessionmaker() as session:
-            data["session"] = session
-            return await handler(event, data)
+        while not self._open.is_set():
+            await self._open.wait()
+        self._active += 1
+        session = LazySession(self._sessionmaker)
+        data["session"] = session
+        token = _unit_of_work.set((asyncio.current_task(), session))
+        self.updates += 1
+        try:
+            try:
+                result = await handler(event, data)
+            except BaseException:
+                if session.opened:
+                    await run_after_commit(session, durable_only=True)
+                raise
+            if session.opened:
+                await commit(session)
+            return result
+        finally:
+            _unit_of_work.reset(token)
+            if session.opened:
+                self.sessions_opened += 1
+            await session.close()
+            await self._leave()
 
 
 class ConfigMiddleware(BaseMiddleware):
@@ -51,3 +126,140 @@ class SheetsMiddleware(BaseMiddleware):
     ) -> Any:
         data["sheets"] = self._sheets
         return await handler(event, data)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(self, window: float = 0.7, max_keys: int = 10_000):
+        super().__init__()
+        self._window = window
+        self._max_keys = max_keys
+        self._last: dict[tuple[int, str], float] = {}
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self._window
+        self._last = {k: t for k, t in self._last.items() if t > cutoff}
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: dict[str, Any],
+    ) -> Any:
+        key = (event.from_user.id, event.data or "")
+        now = time.monotonic()
+        last = self._last.get(key)
+        if last is not None and now - last < self._window:
+            self._last[key] = now
+            try:
+                await event.answer()
+            except Exception:
+                pass
+            return None
+
+        if len(self._last) >= self._max_keys:
+            self._prune(now)
+        self._last[key] = now
+        return await handler(event, data)
+
+
+class IdempotencyMiddleware(BaseMiddleware):
+    def __init__(self, ttl: float = 600.0, max_keys: int = 10_000):
+        super().__init__()
+        self._ttl = ttl
+        self._max_keys = max_keys
+        self._seen: dict[tuple[int, int, int, str], float] = {}
+
+    def _prune(self, now: float) -> None:
+        self._seen = {k: exp for k, exp in self._seen.items() if exp > now}
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: dict[str, Any],
+    ) -> Any:
+        if not get_flag(data, "idempotent"):
+            return await handler(event, data)
+
+        msg = event.message
+        key = (
+            event.from_user.id,
+            msg.chat.id if msg else 0,
+            msg.message_id if msg else 0,
+            event.data or "",
+        )
+        now = time.monotonic()
+        expires = self._seen.get(key)
+        if expires is not None and expires > now:
+            try:
+                await event.answer("Уже обработано.")
+            except Exception:
+                pass
+            return None
+
+        if len(self._seen) >= self._max_keys:
+            self._prune(now)
+        self._seen[key] = now + self._ttl
+        acted = False
+
+        def mark_done() -> None:
+            nonlocal acted
+            acted = True
+
+        data["idempotency_commit"] = mark_done
+        try:
+            return await handler(event, data)
+        finally:
+            if not acted:
+                self._seen.pop(key, None)
+
+
+class AlbumMiddleware(BaseMiddleware):
+    def __init__(self, latency: float = 0.6):
+        super().__init__()
+        self._latency = latency
+        self._albums: dict[tuple[int, str], list[Message]] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: dict[str, Any],
+    ) -> Any:
+        if not event.media_group_id or not get_flag(data, "album"):
+            return await handler(event, data)
+
+        key = (event.chat.id, event.media_group_id)
+        album = self._albums.get(key)
+        if album is not None:
+            album.append(event)
+            return None
+
+        album = self._albums[key] = [event]
+        try:
+            await asyncio.sleep(self._latency)
+        finally:
+            self._albums.pop(key, None)
+        album.sort(key=lambda m: m.message_id)
+        data["album"] = album
+        return await handler(album[0], data)
+
+
+class AdminGuardMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Message | CallbackQuery,
+        data: dict[str, Any],
+    ) -> Any:
+        if await is_admin(data["session"], data["config"], event.from_user.id):
+            return await handler(event, data)
+
+        if isinstance(event, CallbackQuery):
+            await event.answer("Нет доступа.", show_alert=True)
+            return None
+        state = data.get("state")
+        if state is not None:
+            await state.clear()
+        await event.answer("Нет доступа.")
+        return None
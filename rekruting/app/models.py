@@ -13,11 +13,14 @@ from sqlalchemy import (
     Text,
     Enum,
     UniqueConstraint,
+    Index,
+    LargeBinary,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .db import Base
-from .enums import ReportStatus, ProblemUrgency, MediaType
+from .enums import ReportStatus, ProblemUrgency, MediaType, BroadcastStatus, DeliveryStatus
 
 
 class User(Base):
@@ -53,6 +56,17 @@ class WorkType(Base):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
 
 
+class PayRate(Base):
+    __tablename__ = "pay_rates"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    work_type_id: Mapped[int] = mapped_column(ForeignKey("work_types.id", ondelete="CASCADE"), unique=True)
+    rate_cents: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    work_type: Mapped["WorkType"] = relationship()
+
+
 class Report(Base):
     __tablename__ = "reports"
 
@@ -105,6 +119,7 @@ class ReportMedia(Base):
     report_id: Mapped[int] = mapped_column(ForeignKey("reports.id", ondelete="CASCADE"), index=True)
 
     file_id: Mapped[str] = mapped_column(String(256), nullable=False)
+    file_unique_id: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
     media_type: Mapped[MediaType] = mapped_column(Enum(MediaType, name="media_type"), nullable=False)
 
     report: Mapped["Report"] = relationship(back_populates="media")
@@ -118,8 +133,9 @@ class ReportEditLog(Base):
     editor_user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
     edited_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
-    old_snapshot_json: Mapped[str] = mapped_column(Text, nullable=False)
-    new_snapshot_json: Mapped[str] = mapped_column(Text, nullable=False)
+    old_snapshot_json: Mapped[str] = mapped_column(Text, default="{}", nullable=False)
+    new_snapshot_json: Mapped[str] = mapped_column(Text, default="{}", nullable=False)
+    diff_z: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
 
     report: Mapped["Report"] = relationship(back_populates="edits")
 
@@ -137,6 +153,16 @@ class WorkSession(Base):
 
     user: Mapped["User"] = relationship(back_populates="work_sessions")
 
+    __table_args__ = (
+        Index(
+            "uq_work_sessions_open_user",
+            "user_id",
+            unique=True,
+            sqlite_where=text("ended_at IS NULL"),
+            postgresql_where=text("ended_at IS NULL"),
+        ),
+    )
+
 
 class Problem(Base):
     __tablename__ = "problems"
@@ -148,13 +174,46 @@ class Problem(Base):
     description: Mapped[str] = mapped_column(Text, nullable=False)
     address: Mapped[str] = mapped_column(Text, nullable=False)
     scooter_number: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    scooter_norm: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    address_norm: Mapped[str | None] = mapped_column(String(256), nullable=True)
 
     urgency: Mapped[ProblemUrgency] = mapped_column(Enum(ProblemUrgency, name="problem_urgency"), nullable=False)
 
+    incident_id: Mapped[int | None] = mapped_column(ForeignKey("incidents.id", ondelete="SET NULL"), nullable=True, index=True)
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
     user: Mapped["User"] = relationship(back_populates="problems")
     media: Mapped[list["ProblemMedia"]] = relationship(back_populates="problem", cascade="all, delete-orphan")
+    incident: Mapped["Incident | None"] = relationship(back_populates="problems")
+
+    __table_args__ = (
+        Index("ix_problems_scooter_norm_created", "scooter_norm", "created_at"),
+    )
+
+
+class Incident(Base):
+    __tablename__ = "incidents"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    scooter_norm: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    address_norm: Mapped[str | None] = mapped_column(String(256), nullable=True)
+    first_problem_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    problem_count: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    undigested_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    opened_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    last_problem_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    digest_sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    problems: Mapped[list["Problem"]] = relationship(back_populates="incident")
+
+    __table_args__ = (
+        Index("ix_incidents_scooter_last", "scooter_norm", "last_problem_at"),
+        Index("ix_incidents_address_last", "address_norm", "last_problem_at"),
+        Index("ix_incidents_undigested", "undigested_count"),
+    )
 
 
 class ProblemMedia(Base):
@@ -164,13 +223,112 @@ class ProblemMedia(Base):
     problem_id: Mapped[int] = mapped_column(ForeignKey("problems.id", ondelete="CASCADE"), index=True)
 
     file_id: Mapped[str] = mapped_column(String(256), nullable=False)
+    file_unique_id: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
     media_type: Mapped[MediaType] = mapped_column(Enum(MediaType, name="media_type"), nullable=False)
 
     problem: Mapped["Problem"] = relationship(back_populates="media")
 
 
+class MediaFingerprint(Base):
+    __tablename__ = "media_fingerprints"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    file_unique_id: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    media_type: Mapped[MediaType] = mapped_column(Enum(MediaType, name="media_type"), nullable=False)
+    file_id: Mapped[str] = mapped_column(String(256), nullable=False)
+
+    first_user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    first_report_id: Mapped[int | None] = mapped_column(ForeignKey("reports.id", ondelete="SET NULL"), nullable=True)
+    first_problem_id: Mapped[int | None] = mapped_column(ForeignKey("problems.id", ondelete="SET NULL"), nullable=True)
+
+    use_count: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    first_seen_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    last_seen_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    admins_notified_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
 class Setting(Base):
     __tablename__ = "settings"
 
     key: Mapped[str] = mapped_column(String(64), primary_key=True)
     value: Mapped[str] = mapped_column(String(2048), nullable=False)
+
+
+class Broadcast(Base):
+    __tablename__ = "broadcasts"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    created_by_tg_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    city_filter: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    leader_filter: Mapped[str | None] = mapped_column(String(128), nullable=True)
+
+    status: Mapped[BroadcastStatus] = mapped_column(
+        Enum(BroadcastStatus, name="broadcast_status"),
+        default=BroadcastStatus.RUNNING,
+        nullable=False,
+    )
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    sent: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    progress_chat_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    progress_message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class BroadcastDelivery(Base):
+    __tablename__ = "broadcast_deliveries"
+    __table_args__ = (
+        UniqueConstraint("broadcast_id", "tg_id", name="uq_broadcast_delivery"),
+        Index("ix_broadcast_delivery_pending", "broadcast_id", "status", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    broadcast_id: Mapped[int] = mapped_column(ForeignKey("broadcasts.id", ondelete="CASCADE"))
+    tg_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    status: Mapped[DeliveryStatus] = mapped_column(
+        Enum(DeliveryStatus, name="delivery_status"),
+        default=DeliveryStatus.PENDING,
+        nullable=False,
+    )
+    error: Mapped[str | None] = mapped_column(String(256), nullable=True)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_outbox_pending_chat", "status", "chat_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    chat_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    reply_markup: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    status: Mapped[DeliveryStatus] = mapped_column(
+        Enum(DeliveryStatus, name="outbox_status"),
+        default=DeliveryStatus.PENDING,
+        nullable=False,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    error: Mapped[str | None] = mapped_column(String(256), nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class FsmState(Base):
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String(256), primary_key=True)
+    state: Mapped[str] = mapped_column(String(128), nullable=False)
+    data: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .db import after_commit, commit
+from .enums import MediaType
+from .repositories import enqueue_notifications, list_outbox_heads, record_outbox_results
+from .sender import RateLimitedSender
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH = 50
+OUTBOX_POLL = 2.0
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF_BASE = 5.0
+OUTBOX_BACKOFF_MAX = 600.0
+
+_task: asyncio.Task | None = None
+_wakeup: asyncio.Event | None = None
+
+
+def message_item(chat_id: int, text: str, reply_markup: InlineKeyboardMarkup | None = None) -> dict:
+    return {
+        "chat_id": chat_id,
+        "kind": "message",
+        "body": text,
+        "reply_markup": reply_markup.model_dump_json(exclude_none=True) if reply_markup is not None else None,
+    }
+
+
+def media_item(chat_id: int, media_type: MediaType, file_id: str) -> dict:
+    return {"chat_id": chat_id, "kind": MediaType(media_type).value, "body": file_id, "reply_markup": None}
+
+
+async def enqueue(session: AsyncSession, items: list[dict]) -> list[int]:
+    if not items:
+        return []
+    ids = await enqueue_notifications(session, items)
+    after_commit(session, _wake)
+    return ids
+
+
+def _wake() -> None:
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1)))
+
+
+async def deliver_due(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    sender: RateLimitedSender,
+    limit: int = OUTBOX_BATCH,
+) -> int:
+    async with sessionmaker() as session:
+        rows = await list_outbox_heads(session, datetime.utcnow(), limit)
+    if not rows:
+        return 0
+
+    results = await asyncio.gather(*(
+        sender.deliver(
+            r.chat_id, r.kind, r.body,
+            **({"reply_markup": InlineKeyboardMarkup.model_validate_json(r.reply_markup)} if r.reply_markup else {}),
+        )
+        for r in rows
+    ))
+
+    now = datetime.utcnow()
+    sent_ids, retries, failed = [], [], []
+    for r, (error, permanent) in zip(rows, results):
+        if error is None:
+            sent_ids.append(r.id)
+        elif permanent or r.attempts + 1 >= OUTBOX_MAX_ATTEMPTS:
+            failed.append((r.id, error))
+            logger.warning("Outbox #%s to %s failed: %s", r.id, r.chat_id, error)
+        else:
+            retries.append((r.id, now + _backoff(r.attempts + 1), error))
+    async with sessionmaker() as session:
+        await record_outbox_results(session, sent_ids, retries, failed)
+        await commit(session)
+    return len(rows)
+
+
+async def _run(sessionmaker: async_sessionmaker[AsyncSession], sender: RateLimitedSender, wakeup: asyncio.Event) -> None:
+    while True:
+        wakeup.clear()
+        try:
+            delivered = await deliver_due(sessionmaker, sender)
+        except Exception:
+            logger.exception("Outbox delivery failed")
+            delivered = 0
+        if delivered:
+            continue
+        try:
+            await asyncio.wait_for(wakeup.wait(), OUTBOX_POLL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_outbox(sessionmaker: async_sessionmaker[AsyncSession], sender: RateLimitedSender) -> None:
+    global _task, _wakeup
+    if _task is not None and not _task.done():
+        return
+    _wakeup = asyncio.Event()
+    _task = asyncio.create_task(_run(sessionmaker, sender, _wakeup))
+
+
+async def stop_outbox() -> None:
+    global _task, _wakeup
+    task, _task, _wakeup = _task, None, None
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
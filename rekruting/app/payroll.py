@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from datetime import date as dt_date, datetime, time as dt_time, timedelta
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .archive import archived_payroll_tasks
+from .db import seconds_between
+from .enums import ReportStatus
+from .models import User, Report, ReportTask, PayRate, WorkSession, Setting
+
+_CACHE_MAX = 24
+MAX_MONEY_CENTS = 100_000_000
+_cache: dict[tuple[int, int, str], "Payroll"] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class PayrollRow:
+    user_id: int
+    tg_id: int
+    name: str
+    city: str | None
+    tasks_qty: int
+    piece_cents: int
+    hours: float
+    hourly_cents: int
+
+    @property
+    def total_cents(self) -> int:
+        return self.piece_cents + self.hourly_cents
+
+
+@dataclass(frozen=True, slots=True)
+class Payroll:
+    year: int
+    month: int
+    rates_version: str
+    hourly_rate_cents: int
+    rows: list[PayrollRow]
+
+    @property
+    def total_cents(self) -> int:
+        return sum(r.total_cents for r in self.rows)
+
+
+def fmt_money(cents: int) -> str:
+    return f"{cents / 100:.2f}"
+
+
+def parse_money(text: str) -> int | None:
+    try:
+        value = Decimal(text.strip().replace(",", "."))
+    except InvalidOperation:
+        return None
+    if not value.is_finite() or value < 0 or value * 100 > MAX_MONEY_CENTS:
+        return None
+    return int((value * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def invalidate_payroll_cache() -> None:
+    _cache.clear()
+
+
+def _month_bounds(year: int, month: int) -> tuple[dt_date, dt_date]:
+    start = dt_date(year, month, 1)
+    end = dt_date(year + 1, 1, 1) if month == 12 else dt_date(year, month + 1, 1)
+    return start, end
+
+
+async def _with_archived_piece(
+    session: AsyncSession, rows: list[list], archive_dir: str | None, start: dt_date, end: dt_date,
+) -> list[list]:
+    archived = await archived_payroll_tasks(session, archive_dir, start, end - timedelta(days=1))
+    if not archived:
+        return rows
+
+    rates = dict((await session.execute(select(PayRate.work_type_id, PayRate.rate_cents))).all())
+    extra: dict[int, list[int]] = {}
+    for user_id, work_type_id, qty in archived:
+        acc = extra.setdefault(user_id, [0, 0])
+        acc[0] += qty
+        acc[1] += qty * (rates.get(work_type_id) or 0)
+
+    by_user = {r[0]: r for r in rows}
+    missing = set(extra) - set(by_user)
+    if missing:
+        for u in (await session.execute(
+            select(User.id, User.tg_id, User.first_name, User.last_name, User.city).where(User.id.in_(missing))
+        )).all():
+            by_user[u.id] = [*u, 0, 0, 0]
+            rows.append(by_user[u.id])
+        rows.sort(key=lambda r: (r[3] or "", r[2] or "", r[0]))
+
+    for user_id, (qty, cents) in extra.items():
+        r = by_user.get(user_id)
+        if r is not None:
+            r[5] = (r[5] or 0) + qty
+            r[6] = (r[6] or 0) + cents
+    return rows
+
+
+async def compute_month_payroll(session: AsyncSession, year: int, month: int, archive_dir: str | None = None) -> Payroll:
+    settings = dict((await session.execute(
+        select(Setting.key, Setting.value).where(Setting.key.in_(["pay_rates_version", "hourly_rate_cents"]))
+    )).all())
+    version = settings.get("pay_rates_version", "0")
+    hourly_rate = int(settings.get("hourly_rate_cents") or 0)
+
+    key = (year, month, version)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    start, end = _month_bounds(year, month)
+    dialect = session.bind.dialect.name
+
+    piece = (
+        select(
+            Report.user_id.label("user_id"),
+            func.sum(ReportTask.quantity).label("qty"),
+            func.sum(ReportTask.quantity * func.coalesce(PayRate.rate_cents, 0)).label("piece_cents"),
+        )
+        .join(ReportTask, ReportTask.report_id == Report.id)
+        .outerjoin(PayRate, PayRate.work_type_id == ReportTask.work_type_id)
+        .where(Report.status == ReportStatus.ACCEPTED)
+        .where(Report.report_date >= start)
+        .where(Report.report_date < end)
+        .group_by(Report.user_id)
+        .subquery()
+    )
+    worked = (
+        select(
+            WorkSession.user_id.label("user_id"),
+            func.sum(seconds_between(dialect, WorkSession.started_at, WorkSession.ended_at)).label("seconds"),
+        )
+        .where(WorkSession.ended_at.is_not(None))
+        .where(WorkSession.started_at >= datetime.combine(start, dt_time.min))
+        .where(WorkSession.started_at < datetime.combine(end, dt_time.min))
+        .group_by(WorkSession.user_id)
+        .subquery()
+    )
+    rows = (await session.execute(
+        select(
+            User.id, User.tg_id, User.first_name, User.last_name, User.city,
+            func.coalesce(piece.c.qty, 0),
+            func.coalesce(piece.c.piece_cents, 0),
+            func.coalesce(worked.c.seconds, 0),
+        )
+        .outerjoin(piece, piece.c.user_id == User.id)
+        .outerjoin(worked, worked.c.user_id == User.id)
+        .where((piece.c.user_id.is_not(None)) | (worked.c.user_id.is_not(None)))
+        .order_by(User.last_name, User.first_name, User.id)
+    )).all()
+    rows = await _with_archived_piece(session, [list(r) for r in rows], archive_dir, start, end)
+
+    out: list[PayrollRow] = []
+    for user_id, tg_id, first_name, last_name, city, qty, piece_cents, seconds in rows:
+        hours = float(seconds or 0) / 3600.0
+        out.append(PayrollRow(
+            user_id=user_id,
+            tg_id=tg_id,
+            name=f"{first_name or ''} {last_name or ''}".strip() or str(tg_id),
+            city=city,
+            tasks_qty=int(qty or 0),
+            piece_cents=int(piece_cents or 0),
+            hours=round(hours, 2),
+            hourly_cents=round(hours * hourly_rate),
+        ))
+
+    payroll = Payroll(year=year, month=month, rates_version=version, hourly_rate_cents=hourly_rate, rows=out)
+    if len(_cache) >= _CACHE_MAX:
+        _cache.clear()
+    _cache[key] = payroll
+    return payroll
+
+
+PAYROLL_HEADER = ["tg_id", "name", "city", "tasks_qty", "piece_pln", "hours", "hourly_pln", "total_pln"]
+
+
+def payroll_rows(payroll: Payroll) -> list[list]:
+    return [
+        [r.tg_id, r.name, r.city or "", r.tasks_qty, fmt_money(r.piece_cents), r.hours,
+         fmt_money(r.hourly_cents), fmt_money(r.total_cents)]
+        for r in payroll.rows
+    ]
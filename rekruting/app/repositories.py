@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import html
 import json
-from datetime import date as dt_date, datetime, time as dt_time
+import re
+import zlib
+from datetime import date as dt_date, datetime, time as dt_time, timedelta
 from zoneinfo import ZoneInfo
 
 _TZ = ZoneInfo("Europe/Warsaw")
@@ -10,8 +13,10 @@ def now_local() -> datetime:
     return datetime.now(tz=_TZ).replace(tzinfo=None)
 
 
-from sqlalchemy import select, func, delete
+from sqlalchemy import select, func, delete, update, insert, literal, bindparam, text, or_, and_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from .models import (
     User,
@@ -24,8 +29,18 @@ from .models import (
     Setting,
     WorkSession,
     ReportEditLog,
+    PayRate,
+    Broadcast,
+    BroadcastDelivery,
+    MediaFingerprint,
+    Incident,
+    NotificationOutbox,
+    FsmState,
 )
-from .enums import ReportStatus, MediaType, ProblemUrgency
+from .enums import ReportStatus, MediaType, ProblemUrgency, BroadcastStatus, DeliveryStatus
+from .admins import invalidate_admins
+from .db import add_hours, after_commit, upsert
+from .utils import normalize_scooter, normalize_address
 
 
 DEFAULT_WORK_TYPES = [
@@ -40,6 +55,8 @@ DEFAULT_SETTINGS = {
     "photo_required_reports": "0",
     "photo_required_problems": "0",
     "motd": "",
+    "hourly_rate_cents": "0",
+    "pay_rates_version": "0",
 }
 
 
@@ -48,12 +65,33 @@ async def get_or_create_user(session: AsyncSession, tg_id: int, *, mark_admin: b
     if user is None:
         user = User(tg_id=tg_id, is_admin=mark_admin)
         session.add(user)
-        await session.commit()
+        await session.flush()
         await session.refresh(user)
+        if mark_admin:
+            after_commit(session, invalidate_admins)
     else:
         if mark_admin and not user.is_admin:
             user.is_admin = True
-            await session.commit()
+            await session.flush()
+            after_commit(session, invalidate_admins)
+    return user
+
+
+async def get_user(session: AsyncSession, tg_id: int) -> User | None:
+    return (await session.execute(select(User).where(User.tg_id == tg_id))).scalar_one_or_none()
+
+
+async def save_user_profile(session: AsyncSession, tg_id: int, profile: dict[str, str], *, mark_admin: bool = False) -> User:
+    stmt = upsert(session.bind.dialect.name, User).values(
+        tg_id=tg_id, is_admin=mark_admin, is_working=False, created_at=datetime.utcnow(), **profile
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.tg_id],
+        set_={**{k: stmt.excluded[k] for k in profile}, "is_admin": User.is_admin | stmt.excluded.is_admin},
+    ).returning(User)
+    user = (await session.execute(stmt, execution_options={"populate_existing": True})).scalar_one()
+    if mark_admin:
+        after_commit(session, invalidate_admins)
     return user
 
 
@@ -66,19 +104,17 @@ async def seed_defaults(session: AsyncSession) -> None:
     if not existing:
         for k, v in DEFAULT_SETTINGS.items():
             session.add(Setting(key=k, value=v))
-        await session.commit()
     else:
         existing_keys = {s.key for s in existing}
         for k, v in DEFAULT_SETTINGS.items():
             if k not in existing_keys:
                 session.add(Setting(key=k, value=v))
-        await session.commit()
 
     cnt = (await session.execute(select(func.count(WorkType.id)))).scalar_one()
     if cnt == 0:
         for name in DEFAULT_WORK_TYPES:
             session.add(WorkType(name=name, is_active=True))
-        await session.commit()
+        await session.flush()
 
 
 
@@ -95,7 +131,7 @@ async def set_setting_bool(session: AsyncSession, key: str, value: bool) -> None
         session.add(Setting(key=key, value="1" if value else "0"))
     else:
         row.value = "1" if value else "0"
-    await session.commit()
+    await session.flush()
 
 
 async def get_setting_text(session: AsyncSession, key: str) -> str:
@@ -109,7 +145,7 @@ async def set_setting_text(session: AsyncSession, key: str, value: str) -> None:
         session.add(Setting(key=key, value=value))
     else:
         row.value = value
-    await session.commit()
+    await session.flush()
 
 
 
@@ -125,49 +161,95 @@ async def add_work_type(session: AsyncSession, name: str) -> WorkType:
         session.add(wt)
     else:
         wt.is_active = True
-    await session.commit()
+    await session.flush()
     await session.refresh(wt)
     return wt
 
 
 
-async def start_work(session: AsyncSession, user: User) -> WorkSession:
-    open_ws = (await session.execute(
-        select(WorkSession).where(WorkSession.user_id == user.id).where(WorkSession.ended_at.is_(None))
+async def list_pay_rates(session: AsyncSession) -> list[tuple[WorkType, int | None]]:
+    rows = (await session.execute(
+        select(WorkType, PayRate.rate_cents)
+        .outerjoin(PayRate, PayRate.work_type_id == WorkType.id)
+        .where(WorkType.is_active.is_(True))
+        .order_by(WorkType.id)
+    )).all()
+    return [(wt, rate) for (wt, rate) in rows]
+
+
+async def _bump_pay_rates_version(session: AsyncSession) -> None:
+    row = (await session.execute(select(Setting).where(Setting.key == "pay_rates_version"))).scalar_one_or_none()
+    if row is None:
+        session.add(Setting(key="pay_rates_version", value="1"))
+    else:
+        row.value = str(int(row.value or 0) + 1)
+
+
+async def set_pay_rate(session: AsyncSession, work_type_id: int, rate_cents: int) -> None:
+    row = (await session.execute(select(PayRate).where(PayRate.work_type_id == work_type_id))).scalar_one_or_none()
+    if row is None:
+        session.add(PayRate(work_type_id=work_type_id, rate_cents=rate_cents))
+    else:
+        row.rate_cents = rate_cents
+        row.updated_at = datetime.utcnow()
+    await _bump_pay_rates_version(session)
+    await session.flush()
+
+
+async def set_hourly_rate(session: AsyncSession, rate_cents: int) -> None:
+    row = (await session.execute(select(Setting).where(Setting.key == "hourly_rate_cents"))).scalar_one_or_none()
+    if row is None:
+        session.add(Setting(key="hourly_rate_cents", value=str(rate_cents)))
+    else:
+        row.value = str(rate_cents)
+    await _bump_pay_rates_version(session)
+    await session.flush()
+
+
+async def get_work_type_by_name(session: AsyncSession, name: str) -> WorkType | None:
+    return (await session.execute(
+        select(WorkType).where(WorkType.name == name.strip().lower())
     )).scalar_one_or_none()
-    if open_ws is not None:
-        user.is_working = True
-        user.work_started_at = open_ws.started_at
-        await session.commit()
-        return open_ws
-
-    now = now_local()
-    ws = WorkSession(user_id=user.id, started_at=now, ended_at=None, linked_report_id=None)
-    session.add(ws)
-    user.is_working = True
-    user.work_started_at = now
-    await session.commit()
-    await session.refresh(ws)
+
+
+
+def _set_working(session: AsyncSession, user: User, started_at: datetime | None) -> None:
+    if session.bind.dialect.name == "sqlite":
+        set_committed_value(user, "is_working", started_at is not None)
+        set_committed_value(user, "work_started_at", started_at)
+    else:
+        user.is_working = started_at is not None
+        user.work_started_at = started_at
+
+
+async def start_work(session: AsyncSession, user: User) -> WorkSession:
+    stmt = upsert(session.bind.dialect.name, WorkSession).values(
+        user_id=user.id, started_at=now_local(), ended_at=None, linked_report_id=None
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WorkSession.user_id],
+        index_where=WorkSession.ended_at.is_(None),
+        set_={"started_at": WorkSession.started_at},
+    ).returning(WorkSession)
+    ws = (await session.execute(stmt, execution_options={"populate_existing": True})).scalar_one()
+    _set_working(session, user, ws.started_at)
     return ws
 
 
 async def stop_work(session: AsyncSession, user: User) -> WorkSession | None:
     ws = (await session.execute(
-        select(WorkSession).where(WorkSession.user_id == user.id).where(WorkSession.ended_at.is_(None))
-        .order_by(WorkSession.started_at.desc())
+        update(WorkSession)
+        .where(WorkSession.user_id == user.id)
+        .where(WorkSession.ended_at.is_(None))
+        .values(ended_at=now_local())
+        .returning(WorkSession),
+        execution_options={"populate_existing": True},
     )).scalar_one_or_none()
     if ws is None:
         user.is_working = False
         user.work_started_at = None
-        await session.commit()
-        return None
-
-    now = now_local()
-    ws.ended_at = now
-    user.is_working = False
-    user.work_started_at = None
-    await session.commit()
-    await session.refresh(ws)
+    else:
+        _set_working(session, user, None)
     return ws
 
 
@@ -187,12 +269,59 @@ async def get_last_closed_session_for_date(session: AsyncSession, user_id: int,
     return None
 
 
+async def close_stale_work_sessions(session: AsyncSession, max_hours: int) -> list[int]:
+    cutoff = now_local() - timedelta(hours=max_hours)
+    dialect = session.bind.dialect.name
+    user_ids = (await session.execute(
+        update(WorkSession)
+        .where(WorkSession.ended_at.is_(None))
+        .where(WorkSession.started_at < cutoff)
+        .values(ended_at=add_hours(dialect, WorkSession.started_at, max_hours))
+        .returning(WorkSession.user_id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    if not user_ids:
+        return []
+
+    still_open = select(WorkSession.id).where(WorkSession.user_id == User.id).where(WorkSession.ended_at.is_(None))
+    tg_ids = (await session.execute(
+        update(User)
+        .where(User.id.in_(set(user_ids)))
+        .where(~still_open.exists())
+        .values(is_working=False, work_started_at=None)
+        .returning(User.tg_id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    await session.flush()
+    return list(tg_ids)
+
+
+async def list_tg_ids_missing_report(session: AsyncSession, day: dt_date) -> list[int]:
+    day_start = datetime.combine(day, dt_time.min)
+    day_end = day_start + timedelta(days=1)
+    has_report = (
+        select(Report.id)
+        .where(Report.user_id == WorkSession.user_id)
+        .where(Report.report_date == day)
+    )
+    return (await session.execute(
+        select(User.tg_id)
+        .join(WorkSession, WorkSession.user_id == User.id)
+        .where(WorkSession.started_at >= day_start)
+        .where(WorkSession.started_at < day_end)
+        .where(WorkSession.ended_at.is_not(None))
+        .where(WorkSession.linked_report_id.is_(None))
+        .where(~has_report.exists())
+        .distinct()
+    )).scalars().all()
+
+
 async def link_session_to_report(session: AsyncSession, work_session_id: int, report_id: int) -> None:
     ws = (await session.execute(select(WorkSession).where(WorkSession.id == work_session_id))).scalar_one_or_none()
     if ws is None:
         return
     ws.linked_report_id = report_id
-    await session.commit()
+    await session.flush()
 
 
 
@@ -205,35 +334,42 @@ async def create_report(
     partner_name: str | None,
     comment: str | None,
     tasks: list[tuple[int, int]],  
-    media: tuple[str, MediaType] | None,
+    media: tuple[str, MediaType, str | None] | None,
 ) -> Report:
+    work_types = await _work_types_by_id(session, [wt_id for wt_id, _ in tasks])
     report = Report(
-        user_id=user_id,
+        user=await session.get(User, user_id),
         report_date=report_date,
         start_time=start_time,
         end_time=end_time,
         partner_name=partner_name,
         comment=comment,
         status=ReportStatus.PENDING,
+        tasks=[ReportTask(work_type=work_types[wt_id], quantity=qty) for wt_id, qty in tasks],
+        media=_report_media(media),
     )
     session.add(report)
-    await session.flush()  
-
-    for wt_id, qty in tasks:
-        session.add(ReportTask(report_id=report.id, work_type_id=wt_id, quantity=qty))
+    await session.flush()
 
     if media is not None:
-        file_id, media_type = media
-        session.add(ReportMedia(report_id=report.id, file_id=file_id, media_type=media_type))
-
-    await session.commit()
-    await session.refresh(report)
-    await session.refresh(report, attribute_names=["user", "tasks", "media"])
-    for t in report.tasks:
-        await session.refresh(t, attribute_names=["work_type"])
+        await _touch_media_fingerprints(session, [media], user_id=user_id, report_id=report.id)
     return report
 
 
+async def _work_types_by_id(session: AsyncSession, ids: list[int]) -> dict[int, WorkType]:
+    if not ids:
+        return {}
+    rows = (await session.execute(select(WorkType).where(WorkType.id.in_(set(ids))))).scalars().all()
+    return {wt.id: wt for wt in rows}
+
+
+def _report_media(media: tuple[str, MediaType, str | None] | None) -> list[ReportMedia]:
+    if media is None:
+        return []
+    file_id, media_type, file_unique_id = media
+    return [ReportMedia(file_id=file_id, file_unique_id=file_unique_id, media_type=media_type)]
+
+
 async def get_report_with_user_and_tasks(session: AsyncSession, report_id: int) -> Report | None:
     report = (await session.execute(select(Report).where(Report.id == report_id))).scalar_one_or_none()
     if report is None:
@@ -266,7 +402,11 @@ async def sum_user_tasks_for_month(session: AsyncSession, user_id: int, year: in
 
 async def list_pending_reports(session: AsyncSession, limit: int = 20) -> list[Report]:
     return (await session.execute(
-        select(Report).where(Report.status == ReportStatus.PENDING).order_by(Report.created_at.desc()).limit(limit)
+        select(Report)
+        .options(selectinload(Report.user))
+        .where(Report.status == ReportStatus.PENDING)
+        .order_by(Report.created_at.desc())
+        .limit(limit)
     )).scalars().all()
 
 
@@ -304,33 +444,74 @@ async def set_report_status(session: AsyncSession, report_id: int, status: Repor
         return None
     report.status = status
     report.admin_comment = admin_comment
-    await session.commit()
+    await session.flush()
     await session.refresh(report, attribute_names=["user"])
     return report
 
 
-async def _snapshot_report(session: AsyncSession, report_id: int) -> dict:
-    rep = await get_report_with_user_and_tasks(session, report_id)
-    if rep is None:
-        return {}
+async def set_reports_status_bulk(
+    session: AsyncSession,
+    report_ids: list[int],
+    status: ReportStatus,
+    admin_comment: str | None,
+) -> list[Report]:
+    if not report_ids:
+        return []
+    changed_ids = (await session.execute(
+        update(Report)
+        .where(Report.id.in_(report_ids))
+        .where(Report.status == ReportStatus.PENDING)
+        .values(status=status, admin_comment=admin_comment)
+        .returning(Report.id)
+    )).scalars().all()
+    await session.flush()
+    if not changed_ids:
+        return []
+    return (await session.execute(
+        select(Report)
+        .options(
+            selectinload(Report.user),
+            selectinload(Report.tasks).selectinload(ReportTask.work_type),
+            selectinload(Report.media),
+        )
+        .where(Report.id.in_(changed_ids))
+        .order_by(Report.id)
+        .execution_options(populate_existing=True)
+    )).scalars().all()
+
+
+REPORT_EDIT_FIELDS = ("report_date", "start_time", "end_time", "partner_name", "comment", "tasks", "media")
+
+
+def _report_state(report: Report) -> dict:
     return {
-        "id": rep.id,
-        "user_id": rep.user_id,
-        "report_date": rep.report_date.isoformat(),
-        "start_time": rep.start_time.strftime("%H:%M"),
-        "end_time": rep.end_time.strftime("%H:%M"),
-        "partner_name": rep.partner_name,
-        "comment": rep.comment,
-        "status": rep.status.value,
-        "admin_comment": rep.admin_comment,
-        "tasks": [{"work_type_id": t.work_type_id, "work_type": t.work_type.name, "quantity": t.quantity} for t in rep.tasks],
-        "media": [{"file_id": m.file_id, "media_type": m.media_type.value} for m in rep.media],
-        "edit_count": rep.edit_count,
-        "edited_at": rep.edited_at.isoformat() if rep.edited_at else None,
-        "edited_by_user_id": rep.edited_by_user_id,
+        "report_date": report.report_date.isoformat(),
+        "start_time": report.start_time.strftime("%H:%M"),
+        "end_time": report.end_time.strftime("%H:%M"),
+        "partner_name": report.partner_name,
+        "comment": report.comment,
+        "tasks": [[t.work_type_id, t.quantity] for t in report.tasks],
+        "media": [[m.file_id, m.media_type.value, m.file_unique_id] for m in report.media],
     }
 
 
+def _legacy_state(snapshot: dict) -> dict:
+    state = {k: snapshot.get(k) for k in REPORT_EDIT_FIELDS if k in snapshot}
+    if "tasks" in state:
+        state["tasks"] = [[t["work_type_id"], t["quantity"]] for t in state["tasks"] or []]
+    if "media" in state:
+        state["media"] = [[m["file_id"], m["media_type"], m.get("file_unique_id")] for m in state["media"] or []]
+    return state
+
+
+def report_edit_diff(log: ReportEditLog) -> dict[str, list]:
+    if log.diff_z is not None:
+        return json.loads(zlib.decompress(log.diff_z))
+    old = _legacy_state(json.loads(log.old_snapshot_json or "{}"))
+    new = _legacy_state(json.loads(log.new_snapshot_json or "{}"))
+    return {k: [old.get(k), new[k]] for k in new if old.get(k) != new[k]}
+
+
 async def update_report_with_log(
     session: AsyncSession,
     report_id: int,
@@ -341,13 +522,22 @@ async def update_report_with_log(
     partner_name: str | None,
     comment: str | None,
     tasks: list[tuple[int, int]],
-    media: tuple[str, MediaType] | None,
+    media: tuple[str, MediaType, str | None] | None,
 ) -> Report | None:
-    report = (await session.execute(select(Report).where(Report.id == report_id))).scalar_one_or_none()
+    report = (await session.execute(
+        select(Report)
+        .options(
+            selectinload(Report.user),
+            selectinload(Report.tasks).selectinload(ReportTask.work_type),
+            selectinload(Report.media),
+        )
+        .where(Report.id == report_id)
+    )).scalar_one_or_none()
     if report is None:
         return None
 
-    old = await _snapshot_report(session, report_id)
+    old = _report_state(report)
+    prev_unique_ids = {m.file_unique_id for m in report.media}
 
     report.report_date = report_date
     report.start_time = start_time
@@ -355,48 +545,73 @@ async def update_report_with_log(
     report.partner_name = partner_name
     report.comment = comment
 
-    await session.execute(delete(ReportTask).where(ReportTask.report_id == report_id))
-    await session.execute(delete(ReportMedia).where(ReportMedia.report_id == report_id))
-
-    for wt_id, qty in tasks:
-        session.add(ReportTask(report_id=report_id, work_type_id=wt_id, quantity=qty))
-
-    if media is not None:
-        file_id, media_type = media
-        session.add(ReportMedia(report_id=report_id, file_id=file_id, media_type=media_type))
+    kept = {t.work_type_id: t for t in report.tasks}
+    work_types = await _work_types_by_id(session, [wt_id for wt_id, _ in tasks if wt_id not in kept])
+    report.tasks = [kept.get(wt_id) or ReportTask(work_type=work_types[wt_id]) for wt_id, _ in tasks]
+    for t, (_, qty) in zip(report.tasks, tasks):
+        t.quantity = qty
+    report.media = _report_media(media)
+    if media is not None and media[2] not in prev_unique_ids:
+        await _touch_media_fingerprints(session, [media], user_id=report.user_id, report_id=report_id)
 
     report.edit_count += 1
     report.edited_at = datetime.utcnow()
     report.edited_by_user_id = editor_user_id
 
     new = {
-        **old,
         "report_date": report_date.isoformat(),
         "start_time": start_time.strftime("%H:%M"),
         "end_time": end_time.strftime("%H:%M"),
         "partner_name": partner_name,
         "comment": comment,
-        "tasks": [{"work_type_id": wt_id, "quantity": qty} for wt_id, qty in tasks],
-        "media": [{"file_id": media[0], "media_type": media[1].value}] if media else [],
-        "edit_count": report.edit_count,
-        "edited_at": report.edited_at.isoformat() if report.edited_at else None,
-        "edited_by_user_id": report.edited_by_user_id,
+        "tasks": [[wt_id, qty] for wt_id, qty in tasks],
+        "media": [[media[0], media[1].value, media[2]]] if media else [],
     }
+    diff = {k: [old[k], new[k]] for k in REPORT_EDIT_FIELDS if old[k] != new[k]}
     session.add(ReportEditLog(
         report_id=report_id,
         editor_user_id=editor_user_id,
-        old_snapshot_json=json.dumps(old, ensure_ascii=False),
-        new_snapshot_json=json.dumps(new, ensure_ascii=False),
+        edited_at=report.edited_at,
+        diff_z=zlib.compress(json.dumps(diff, ensure_ascii=False, separators=(",", ":")).encode()),
     ))
 
-    await session.commit()
-    await session.refresh(report)
-    await session.refresh(report, attribute_names=["user", "tasks", "media"])
-    for t in report.tasks:
-        await session.refresh(t, attribute_names=["work_type"])
+    await session.flush()
     return report
 
 
+async def get_report_version(session: AsyncSession, report_id: int, version: int | None = None) -> dict | None:
+    report = (await session.execute(
+        select(Report)
+        .options(selectinload(Report.tasks), selectinload(Report.media))
+        .where(Report.id == report_id)
+    )).scalar_one_or_none()
+    if report is None:
+        return None
+    logs = (await session.execute(
+        select(ReportEditLog)
+        .where(ReportEditLog.report_id == report_id)
+        .order_by(ReportEditLog.edited_at, ReportEditLog.id)
+    )).scalars().all()
+
+    latest = len(logs)
+    if version is None:
+        version = latest
+    if not 0 <= version <= latest:
+        return None
+
+    state = _report_state(report)
+    for log in reversed(logs[version:]):
+        for field, (old, _new) in report_edit_diff(log).items():
+            state[field] = old
+    return {
+        "report_id": report_id,
+        "version": version,
+        "versions": latest,
+        "edited_at": logs[version - 1].edited_at if version else None,
+        "editor_user_id": logs[version - 1].editor_user_id if version else None,
+        **state,
+    }
+
 
 async def create_problem(
     session: AsyncSession,
@@ -406,7 +621,8 @@ async def create_problem(
     address: str,
     scooter_number: str | None,
     urgency: ProblemUrgency,
-    media: list[tuple[str, MediaType]],
+    media: list[tuple[str, MediaType, str | None]],
+    incident_window_hours: int = 0,
 ) -> Problem:
     p = Problem(
         user_id=user_id,
@@ -414,26 +630,459 @@ async def create_problem(
         description=description,
         address=address,
         scooter_number=scooter_number,
+        scooter_norm=normalize_scooter(scooter_number),
+        address_norm=normalize_address(address),
         urgency=urgency,
     )
     session.add(p)
     await session.flush()
 
-    for file_id, media_type in media:
-        session.add(ProblemMedia(problem_id=p.id, file_id=file_id, media_type=media_type))
+    for file_id, media_type, file_unique_id in media:
+        session.add(ProblemMedia(problem_id=p.id, file_id=file_id, file_unique_id=file_unique_id, media_type=media_type))
+    await _touch_media_fingerprints(session, media, user_id=user_id, problem_id=p.id)
+
+    if incident_window_hours > 0:
+        await _attach_to_incident(session, p, incident_window_hours)
 
-    await session.commit()
+    await session.flush()
     await session.refresh(p)
-    await session.refresh(p, attribute_names=["user", "media"])
+    await session.refresh(p, attribute_names=["user", "media", "incident"])
     return p
 
 
+async def _attach_to_incident(session: AsyncSession, p: Problem, window_hours: int) -> Incident:
+    now = p.created_at or datetime.utcnow()
+    match = []
+    if p.scooter_norm:
+        match.append(Incident.scooter_norm == p.scooter_norm)
+    if p.address_norm:
+        same_address = Incident.address_norm == p.address_norm
+        match.append(same_address if p.scooter_norm is None else and_(same_address, Incident.scooter_norm.is_(None)))
+
+    incident = None
+    if match:
+        incident = (await session.execute(
+            select(Incident)
+            .where(or_(*match))
+            .where(Incident.last_problem_at >= now - timedelta(hours=window_hours))
+            .order_by(Incident.last_problem_at.desc())
+            .limit(1)
+        )).scalar_one_or_none()
+
+    if incident is None:
+        incident = Incident(
+            scooter_norm=p.scooter_norm,
+            address_norm=p.address_norm,
+            first_problem_id=p.id,
+            opened_at=now,
+            last_problem_at=now,
+        )
+        session.add(incident)
+        await session.flush()
+        p.incident_id = incident.id
+    else:
+        p.incident_id = incident.id
+        incident.problem_count += 1
+        if not await escalates_incident(session, p):
+            incident.undigested_count += 1
+        incident.last_problem_at = now
+        if incident.scooter_norm is None:
+            incident.scooter_norm = p.scooter_norm
+    return incident
+
+
+_URGENCY_RANK = {ProblemUrgency.LOW: 0, ProblemUrgency.MEDIUM: 1, ProblemUrgency.URGENT: 2}
+
+
+def _escalates(urgency: ProblemUrgency, top_rank: int) -> bool:
+    return urgency == ProblemUrgency.URGENT or _URGENCY_RANK[urgency] > top_rank
+
+
+async def escalates_incident(session: AsyncSession, p: Problem) -> bool:
+    if p.urgency == ProblemUrgency.URGENT:
+        return True
+    earlier = (await session.execute(
+        select(Problem.urgency).where(Problem.incident_id == p.incident_id).where(Problem.id != p.id).distinct()
+    )).scalars().all()
+    return _escalates(p.urgency, max((_URGENCY_RANK[u] for u in earlier), default=-1))
+
+
+async def list_incidents_for_digest(session: AsyncSession, limit: int = 50) -> list[tuple[Incident, list[Problem]]]:
+    incidents = (await session.execute(
+        select(Incident)
+        .where(Incident.undigested_count > 0)
+        .order_by(Incident.last_problem_at)
+        .limit(limit)
+    )).scalars().all()
+    out = []
+    for inc in incidents:
+        digest_ids, top_rank = [], -1
+        for problem_id, urgency in (await session.execute(
+            select(Problem.id, Problem.urgency).where(Problem.incident_id == inc.id).order_by(Problem.id)
+        )).all():
+            if not _escalates(urgency, top_rank):
+                digest_ids.append(problem_id)
+            top_rank = max(top_rank, _URGENCY_RANK[urgency])
+        problems = (await session.execute(
+            select(Problem)
+            .options(selectinload(Problem.user))
+            .where(Problem.id.in_(digest_ids[-min(inc.undigested_count, 10):]))
+            .order_by(Problem.id)
+        )).scalars().all()
+        out.append((inc, list(problems)))
+    return out
+
+
+async def mark_incidents_digested(session: AsyncSession, counts: list[tuple[int, int]]) -> None:
+    if not counts:
+        return
+    await session.execute(
+        update(Incident.__table__)
+        .where(Incident.__table__.c.id == bindparam("i_id"))
+        .values(
+            undigested_count=Incident.__table__.c.undigested_count - bindparam("i_count"),
+            digest_sent_at=datetime.utcnow(),
+        ),
+        [{"i_id": i, "i_count": n} for i, n in counts],
+    )
+
+
+async def _touch_media_fingerprints(
+    session: AsyncSession,
+    media: list[tuple[str, MediaType, str | None]],
+    user_id: int,
+    report_id: int | None = None,
+    problem_id: int | None = None,
+) -> None:
+    now = datetime.utcnow()
+    rows = {
+        file_unique_id: {
+            "file_unique_id": file_unique_id,
+            "media_type": media_type,
+            "file_id": file_id,
+            "first_user_id": user_id,
+            "first_report_id": report_id,
+            "first_problem_id": problem_id,
+            "use_count": 1,
+            "first_seen_at": now,
+            "last_seen_at": now,
+        }
+        for file_id, media_type, file_unique_id in media
+        if file_unique_id
+    }
+    if not rows:
+        return
+    stmt = upsert(session.bind.dialect.name, MediaFingerprint).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MediaFingerprint.file_unique_id],
+        set_={"use_count": MediaFingerprint.use_count + 1, "last_seen_at": now},
+    )
+    await session.execute(stmt)
+
+
+async def get_media_fingerprints(session: AsyncSession, file_unique_ids: list[str]) -> dict[str, MediaFingerprint]:
+    ids = {uid for uid in file_unique_ids if uid}
+    if not ids:
+        return {}
+    rows = (await session.execute(
+        select(MediaFingerprint).where(MediaFingerprint.file_unique_id.in_(ids))
+    )).scalars().all()
+    return {fp.file_unique_id: fp for fp in rows}
+
+
+async def mark_media_sent_to_admins(session: AsyncSession, file_unique_ids: list[str]) -> None:
+    ids = {uid for uid in file_unique_ids if uid}
+    if not ids:
+        return
+    await session.execute(
+        update(MediaFingerprint)
+        .where(MediaFingerprint.file_unique_id.in_(ids))
+        .where(MediaFingerprint.admins_notified_at.is_(None))
+        .values(admins_notified_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+SEARCH_PAGE_SIZE = 10
+SEARCH_WINDOW = 500
+
+_SEARCH = {
+    "problems": (Problem, "problems_fts", "1.0, 2.0, 4.0", ("description", "address", "scooter_number")),
+    "reports": (Report, "reports_fts", "1.0", ("comment",)),
+}
+
 
-async def list_admins(session: AsyncSession) -> list[User]:
-    return (await session.execute(select(User).where(User.is_admin.is_(True)))).scalars().all()
+def _fts_query(words: list[str], prefix: bool) -> str:
+    return " ".join(f'"{w}"*' if prefix else f'"{w}"' for w in words)
+
+
+def _snippet(values: list[str | None], words: list[str], width: int = 90) -> str:
+    pattern = re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, words)) + r")\w*", re.IGNORECASE)
+    for value in values:
+        m = pattern.search(value or "")
+        if m is None:
+            continue
+        start = max(0, m.start() - width // 3)
+        frag = value[start:start + width]
+        out, pos = [], 0
+        for hit in pattern.finditer(frag):
+            out.append(html.escape(frag[pos:hit.start()]))
+            out.append(f"<b>{html.escape(hit.group())}</b>")
+            pos = hit.end()
+        out.append(html.escape(frag[pos:]))
+        return ("…" if start else "") + "".join(out) + ("…" if start + width < len(value) else "")
+    return ""
+
+
+async def search(
+    session: AsyncSession,
+    kind: str,
+    query: str,
+    page: int = 0,
+    page_size: int = SEARCH_PAGE_SIZE,
+) -> tuple[list[tuple[Problem | Report, str]], bool]:
+    model, fts, weights, fields = _SEARCH[kind]
+    words = re.findall(r"\w+", query)
+    if not words:
+        return [], False
+
+    if session.bind.dialect.name == "sqlite":
+        match = _fts_query(words, prefix=False)
+        exists = (await session.execute(
+            text(f"SELECT 1 FROM {fts} WHERE {fts} MATCH :q LIMIT 1"), {"q": match}
+        )).first()
+        if exists is None:
+            match = _fts_query(words, prefix=True)
+        ids = (await session.execute(
+            text(
+                f"SELECT rowid FROM ("
+                f"SELECT rowid, bm25({fts}, {weights}) AS score FROM {fts} WHERE {fts} MATCH :q "
+                f"ORDER BY rowid DESC LIMIT :window"
+                f") ORDER BY score, rowid DESC LIMIT :limit OFFSET :offset"
+            ),
+            {"q": match, "window": SEARCH_WINDOW, "limit": page_size + 1, "offset": page * page_size},
+        )).scalars().all()
+    else:
+        pattern = f"%{query.strip()}%"
+        ids = (await session.execute(
+            select(model.id)
+            .where(or_(*(getattr(model, f).ilike(pattern) for f in fields)))
+            .order_by(model.id.desc())
+            .limit(page_size + 1)
+            .offset(page * page_size)
+        )).scalars().all()
+
+    has_next = len(ids) > page_size
+    ids = ids[:page_size]
+    if not ids:
+        return [], False
+    objs = {
+        o.id: o for o in (await session.execute(
+            select(model).options(selectinload(model.user)).where(model.id.in_(ids))
+        )).scalars()
+    }
+    return [
+        (objs[i], _snippet([getattr(objs[i], f) for f in fields], words)) for i in ids if i in objs
+    ], has_next
 
 
 async def list_workers(session: AsyncSession, limit: int = 50) -> list[User]:
     return (await session.execute(
         select(User).order_by(User.created_at.desc()).limit(limit)
     )).scalars().all()
+
+
+
+async def create_broadcast(
+    session: AsyncSession,
+    text: str,
+    created_by_tg_id: int,
+    city: str | None = None,
+    leader: str | None = None,
+) -> Broadcast:
+    bc = Broadcast(text=text, created_by_tg_id=created_by_tg_id, city_filter=city, leader_filter=leader)
+    session.add(bc)
+    await session.flush()
+
+    recipients = select(literal(bc.id), User.tg_id, literal(DeliveryStatus.PENDING, BroadcastDelivery.status.type)).where(User.first_name.is_not(None))
+    if city:
+        recipients = recipients.where(User.city == city)
+    if leader:
+        recipients = recipients.where(User.leader == leader)
+    await session.execute(
+        insert(BroadcastDelivery).from_select(["broadcast_id", "tg_id", "status"], recipients)
+    )
+    bc.total = (await session.execute(
+        select(func.count(BroadcastDelivery.id)).where(BroadcastDelivery.broadcast_id == bc.id)
+    )).scalar_one()
+    if bc.total == 0:
+        bc.status = BroadcastStatus.DONE
+        bc.finished_at = datetime.utcnow()
+    await session.flush()
+    return bc
+
+
+async def set_broadcast_progress_message(session: AsyncSession, broadcast_id: int, chat_id: int, message_id: int) -> None:
+    await session.execute(
+        update(Broadcast)
+        .where(Broadcast.id == broadcast_id)
+        .values(progress_chat_id=chat_id, progress_message_id=message_id)
+    )
+
+
+async def list_pending_deliveries(
+    session: AsyncSession,
+    broadcast_id: int,
+    after_id: int = 0,
+    limit: int = 100,
+) -> list[tuple[int, int]]:
+    rows = (await session.execute(
+        select(BroadcastDelivery.id, BroadcastDelivery.tg_id)
+        .where(BroadcastDelivery.broadcast_id == broadcast_id)
+        .where(BroadcastDelivery.status == DeliveryStatus.PENDING)
+        .where(BroadcastDelivery.id > after_id)
+        .order_by(BroadcastDelivery.id)
+        .limit(limit)
+    )).all()
+    return [(delivery_id, tg_id) for (delivery_id, tg_id) in rows]
+
+
+async def record_deliveries(
+    session: AsyncSession,
+    broadcast_id: int,
+    results: list[tuple[int, str | None]],
+) -> Broadcast | None:
+    now = datetime.utcnow()
+    sent_ids = [delivery_id for delivery_id, error in results if error is None]
+    failed = [{"d_id": delivery_id, "d_error": error[:256]} for delivery_id, error in results if error is not None]
+
+    if sent_ids:
+        await session.execute(
+            update(BroadcastDelivery)
+            .where(BroadcastDelivery.id.in_(sent_ids))
+            .values(status=DeliveryStatus.SENT, sent_at=now, error=None)
+        )
+    if failed:
+        await session.execute(
+            update(BroadcastDelivery.__table__)
+            .where(BroadcastDelivery.__table__.c.id == bindparam("d_id"))
+            .values(status=DeliveryStatus.FAILED, error=bindparam("d_error"), sent_at=now),
+            failed,
+        )
+    await session.execute(
+        update(Broadcast)
+        .where(Broadcast.id == broadcast_id)
+        .values(sent=Broadcast.sent + len(sent_ids), failed=Broadcast.failed + len(failed))
+    )
+    return await session.get(Broadcast, broadcast_id, populate_existing=True)
+
+
+async def finish_broadcast(session: AsyncSession, broadcast_id: int) -> Broadcast | None:
+    await session.execute(
+        update(Broadcast)
+        .where(Broadcast.id == broadcast_id)
+        .values(status=BroadcastStatus.DONE, finished_at=datetime.utcnow())
+    )
+    return await session.get(Broadcast, broadcast_id, populate_existing=True)
+
+
+async def list_running_broadcast_ids(session: AsyncSession) -> list[int]:
+    return (await session.execute(
+        select(Broadcast.id).where(Broadcast.status == BroadcastStatus.RUNNING).order_by(Broadcast.id)
+    )).scalars().all()
+
+
+async def enqueue_notifications(session: AsyncSession, items: list[dict]) -> list[int]:
+    rows = [NotificationOutbox(**item) for item in items]
+    session.add_all(rows)
+    await session.flush()
+    return [r.id for r in rows]
+
+
+async def list_outbox_heads(session: AsyncSession, now: datetime, limit: int = 50) -> list[NotificationOutbox]:
+    heads = (
+        select(func.min(NotificationOutbox.id))
+        .where(NotificationOutbox.status == DeliveryStatus.PENDING)
+        .group_by(NotificationOutbox.chat_id)
+    )
+    return (await session.execute(
+        select(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(heads))
+        .where(NotificationOutbox.next_attempt_at <= now)
+        .order_by(NotificationOutbox.id)
+        .limit(limit)
+    )).scalars().all()
+
+
+async def record_outbox_results(
+    session: AsyncSession,
+    sent_ids: list[int],
+    retries: list[tuple[int, datetime, str]],
+    failed: list[tuple[int, str]],
+) -> None:
+    now = datetime.utcnow()
+    t = NotificationOutbox.__table__
+    if sent_ids:
+        await session.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(sent_ids))
+            .values(status=DeliveryStatus.SENT, sent_at=now, error=None, attempts=NotificationOutbox.attempts + 1)
+        )
+    if retries:
+        await session.execute(
+            update(t)
+            .where(t.c.id == bindparam("o_id"))
+            .values(attempts=t.c.attempts + 1, next_attempt_at=bindparam("o_next"), error=bindparam("o_error")),
+            [{"o_id": i, "o_next": at, "o_error": error[:256]} for i, at, error in retries],
+        )
+    if failed:
+        await session.execute(
+            update(t)
+            .where(t.c.id == bindparam("o_id"))
+            .values(status=DeliveryStatus.FAILED, attempts=t.c.attempts + 1, error=bindparam("o_error"), sent_at=now),
+            [{"o_id": i, "o_error": error[:256]} for i, error in failed],
+        )
+
+
+async def outbox_stats(session: AsyncSession) -> tuple[dict[DeliveryStatus, int], datetime | None]:
+    counts = dict((await session.execute(
+        select(NotificationOutbox.status, func.count()).group_by(NotificationOutbox.status)
+    )).all())
+    oldest = await session.scalar(
+        select(func.min(NotificationOutbox.created_at)).where(NotificationOutbox.status == DeliveryStatus.PENDING)
+    )
+    return counts, oldest
+
+
+async def list_outbox(session: AsyncSession, status: DeliveryStatus, limit: int = 10) -> list[NotificationOutbox]:
+    return (await session.execute(
+        select(NotificationOutbox)
+        .where(NotificationOutbox.status == status)
+        .order_by(NotificationOutbox.id.desc())
+        .limit(limit)
+    )).scalars().all()
+
+
+async def purge_outbox(session: AsyncSession, before: datetime) -> int:
+    res = await session.execute(
+        delete(NotificationOutbox)
+        .where(NotificationOutbox.status == DeliveryStatus.SENT)
+        .where(NotificationOutbox.sent_at < before)
+    )
+    return res.rowcount or 0
+
+
+async def list_fsm_states(session: AsyncSession) -> list[FsmState]:
+    return (await session.execute(select(FsmState))).scalars().all()
+
+
+async def save_fsm_states(session: AsyncSession, rows: list[dict], drop_keys: list[str]) -> None:
+    if rows:
+        stmt = upsert(session.bind.dialect.name, FsmState).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FsmState.key],
+            set_={"state": stmt.excluded.state, "data": stmt.excluded.data, "updated_at": stmt.excluded.updated_at},
+        )
+        await session.execute(stmt)
+    if drop_keys:
+        await session.execute(delete(FsmState).where(FsmState.key.in_(drop_keys)))
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class Job:
+    name: str
+    interval: float
+    func: Callable[[], Awaitable[Any]]
+    first_delay: float = 0.0
+    runs: int = 0
+    last_runtime: float | None = None
+    last_result: Any = None
+    task: asyncio.Task | None = field(default=None, repr=False)
+
+
+class Scheduler:
+    def __init__(self):
+        self._jobs: dict[str, Job] = {}
+
+    @property
+    def jobs(self) -> list[Job]:
+        return list(self._jobs.values())
+
+    def add_job(self, name: str, interval: float, func: Callable[[], Awaitable[Any]], *, first_delay: float = 0.0) -> Job:
+        if name in self._jobs:
+            raise ValueError(f"Job {name!r} already registered.")
+        job = Job(name=name, interval=interval, func=func, first_delay=first_delay)
+        self._jobs[name] = job
+        return job
+
+    def start(self) -> None:
+        for job in self._jobs.values():
+            if job.task is None:
+                job.task = asyncio.create_task(self._loop(job), name=f"job:{job.name}")
+
+    async def stop(self) -> None:
+        tasks = [j.task for j in self._jobs.values() if j.task is not None]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in self._jobs.values():
+            job.task = None
+
+    async def run_once(self, name: str) -> Any:
+        return await self._run(self._jobs[name])
+
+    async def _run(self, job: Job) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await job.func()
+        except Exception:
+            job.last_runtime = time.perf_counter() - started
+            logger.exception("Job %s failed after %.3fs", job.name, job.last_runtime)
+            return None
+        job.runs += 1
+        job.last_runtime = time.perf_counter() - started
+        job.last_result = result
+        logger.info("Job %s finished in %.3fs: %s", job.name, job.last_runtime, result)
+        return result
+
+    async def _loop(self, job: Job) -> None:
+        await asyncio.sleep(job.first_delay)
+        while True:
+            await self._run(job)
+            await asyncio.sleep(job.interval)
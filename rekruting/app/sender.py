@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 25.0
+
+
+class RateLimitedSender:
+    def __init__(self, bot: Bot, rate: float = GLOBAL_RATE, concurrency: int = 10):
+        self._bot = bot
+        self._interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+        self._sem = asyncio.Semaphore(concurrency)
+
+    async def _acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _call(self, call: Callable[[], Awaitable[Any]]) -> tuple[str | None, bool]:
+        async with self._sem:
+            for _ in range(3):
+                await self._acquire()
+                try:
+                    await call()
+                    return None, False
+                except TelegramRetryAfter as e:
+                    logger.warning("Flood control, retry after %ss", e.retry_after)
+                    async with self._lock:
+                        self._next_slot = max(self._next_slot, time.monotonic() + e.retry_after)
+                except (TelegramForbiddenError, TelegramBadRequest) as e:
+                    return str(e), True
+                except Exception as e:
+                    return str(e) or e.__class__.__name__, False
+            return "retry limit", False
+
+    async def send_message(self, chat_id: int, text: str, **kwargs: Any) -> str | None:
+        error, _ = await self._call(lambda: self._bot.send_message(chat_id, text, **kwargs))
+        return error
+
+    async def deliver(self, chat_id: int, kind: str, body: str, **kwargs: Any) -> tuple[str | None, bool]:
+        if kind == "photo":
+            return await self._call(lambda: self._bot.send_photo(chat_id, photo=body, **kwargs))
+        if kind == "video":
+            return await self._call(lambda: self._bot.send_video(chat_id, video=body, **kwargs))
+        return await self._call(lambda: self._bot.send_message(chat_id, body, **kwargs))
+
+    async def send_many(self, items: Iterable[tuple[int, str]], **kwargs: Any) -> tuple[int, int]:
+        results = await asyncio.gather(*(self.send_message(chat_id, text, **kwargs) for chat_id, text in items))
+        failed = sum(1 for r in results if r is not None)
+        return len(results) - failed, failed
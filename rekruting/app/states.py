@@ -37,6 +37,10 @@ class AdminReject(StatesGroup):
     comment = State()
 
 
+class AdminBulkReview(StatesGroup):
+    select = State()
+
+
 class AdminAddWorkType(StatesGroup):
     name = State()
 
@@ -47,3 +51,10 @@ class AdminMotd(StatesGroup):
 
 class AdminSendMessage(StatesGroup):
     text = State()
+
+
+class AdminBroadcast(StatesGroup):
+    text = State()
+    audience = State()
+    city = State()
+    leader = State()
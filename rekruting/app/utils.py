@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import re
 from datetime import datetime, date, time
 
 from .enums import MediaType
@@ -18,6 +19,17 @@ def parse_date(text: str) -> date | None:
     return None
 
 
+def parse_month(text: str) -> tuple[int, int] | None:
+    t = text.strip()
+    for fmt in ("%m.%Y", "%m.%y"):
+        try:
+            d = datetime.strptime(t, fmt)
+            return d.year, d.month
+        except ValueError:
+            continue
+    return None
+
+
 def parse_time(text: str) -> time | None:
     t = text.strip()
     try:
@@ -26,14 +38,29 @@ def parse_time(text: str) -> time | None:
         return None
 
 
-def detect_media(message) -> tuple[str, MediaType] | None:
+def detect_media(message) -> tuple[str, MediaType, str] | None:
     if message.photo:
-        return message.photo[-1].file_id, MediaType.PHOTO
+        photo = message.photo[-1]
+        return photo.file_id, MediaType.PHOTO, photo.file_unique_id
     if message.video:
-        return message.video.file_id, MediaType.VIDEO
+        return message.video.file_id, MediaType.VIDEO, message.video.file_unique_id
     return None
 
 
+def normalize_scooter(number: str | None) -> str | None:
+    if not number:
+        return None
+    norm = re.sub(r"[\W_]+", "", number).upper()
+    return norm or None
+
+
+def normalize_address(address: str | None) -> str | None:
+    if not address:
+        return None
+    norm = " ".join(re.findall(r"\w+", address.lower().replace("ё", "е")))
+    return norm or None
+
+
 def format_report_preview(
     user,
     report_date,
@@ -80,3 +107,31 @@ def format_admin_report(report, tasks_lines: str) -> str:
         f"Комментарий: {report.comment if report.comment else '-'}\n"
         f"Статус: <b>{human_report_status(report.status)}</b>"
     )
+
+
+def format_media_reuse(fingerprints) -> str:
+    lines = []
+    for fp in fingerprints:
+        if fp.first_report_id:
+            source = f"рапорт #{fp.first_report_id}"
+        elif fp.first_problem_id:
+            source = f"проблема #{fp.first_problem_id}"
+        else:
+            source = "ранее"
+        lines.append(f"⚠️ Вложение уже присылали: {source}, раз: <b>{fp.use_count}</b>")
+    return "\n".join(lines)
+
+
+def format_incident_digest(incident, problems) -> str:
+    subject = incident.scooter_norm or incident.address_norm or "-"
+    lines = [
+        f"<b>Инцидент #{incident.id}</b> ({subject})",
+        f"Новых сообщений: <b>{incident.undigested_count}</b>, всего: <b>{incident.problem_count}</b>",
+        f"Первое сообщение: #{incident.first_problem_id}",
+        "",
+    ]
+    for p in problems:
+        u = p.user
+        name = f"{u.first_name or ''} {u.last_name or ''}".strip() or str(u.tg_id)
+        lines.append(f"• #{p.id} {p.created_at.strftime('%H:%M')} {name}: {p.description}")
+    return "\n".join(lines)
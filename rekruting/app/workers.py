@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import logging
+
+from aiogram import Bot
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .broadcast import resume_broadcasts, stop_broadcasts
+from .config import Config
+from .fsm_storage import PersistentStorage
+from .jobs import register_jobs
+from .outbox import start_outbox, stop_outbox
+from .scheduler import Scheduler
+from .sender import RateLimitedSender
+
+logger = logging.getLogger(__name__)
+
+
+class Workers:
+    def __init__(self, config: Config, sessionmaker: async_sessionmaker[AsyncSession], storage: PersistentStorage):
+        self._sessionmaker = sessionmaker
+        self._storage = storage
+        self.scheduler = Scheduler()
+        register_jobs(self.scheduler, config, sessionmaker)
+        self.sender: RateLimitedSender | None = None
+
+    async def start(self, bot: Bot) -> None:
+        restored = await self._storage.load()
+        self._storage.start()
+        if restored:
+            logger.info("Restored %s unfinished registration(s).", restored)
+
+        if self.sender is None:
+            self.sender = RateLimitedSender(bot)
+        self.scheduler.start()
+        start_outbox(self._sessionmaker, self.sender)
+
+        resumed = await resume_broadcasts(bot, self._sessionmaker, self.sender)
+        if resumed:
+            logger.info("Resumed %s broadcast(s).", resumed)
+
+    async def stop(self) -> None:
+        await self.scheduler.stop()
+        await stop_broadcasts()
+        await stop_outbox()
+        await self._storage.stop()
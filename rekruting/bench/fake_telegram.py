@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+from collections import Counter
+from datetime import datetime
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from aiogram.enums import ParseMode
+from aiogram.methods import GetFile, TelegramMethod
+from aiogram.types import (
+    Update,
+    Message,
+    Chat,
+    User as TgUser,
+    CallbackQuery,
+    Contact,
+    File,
+)
+
+FAKE_TOKEN = "123456789:AAFakeTokenForLocalBenchmarksOnly_123"
+
+
+class FakeTelegramSession(BaseSession):
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self._message_ids = itertools.count(1_000_000)
+        self.files: dict[str, bytes] = {}
+
+    async def close(self) -> None:
+        pass
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: int | None = None) -> Any:
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if isinstance(method, GetFile):
+            payload = self.files.get(method.file_id, b"")
+            return File(file_id=method.file_id, file_unique_id=method.file_id, file_size=len(payload), file_path=method.file_id)
+
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return True
+        return Message(
+            message_id=next(self._message_ids),
+            date=datetime.now(),
+            chat=Chat(id=int(chat_id), type="private"),
+            text=getattr(method, "text", None),
+        ).as_(bot)
+
+    async def stream_content(self, url: str, headers: dict | None = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True):
+        self.calls["stream_content"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        payload = self.files.get(url.rsplit("/", 1)[-1], b"")
+        for offset in range(0, len(payload), chunk_size):
+            yield payload[offset:offset + chunk_size]
+
+
+def make_fake_bot(latency: float = 0.0) -> Bot:
+    return Bot(
+        token=FAKE_TOKEN,
+        session=FakeTelegramSession(latency),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+
+
+class UpdateFactory:
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._callback_ids = itertools.count(1)
+
+    @staticmethod
+    def _user(tg_id: int) -> TgUser:
+        return TgUser(id=tg_id, is_bot=False, first_name=f"u{tg_id}")
+
+    @staticmethod
+    def _chat(tg_id: int) -> Chat:
+        return Chat(id=tg_id, type="private")
+
+    def message(self, tg_id: int, text: str | None = None, **extra: Any) -> Update:
+        return Update(
+            update_id=next(self._update_ids),
+            message=Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=self._chat(tg_id),
+                from_user=self._user(tg_id),
+                text=text,
+                **extra,
+            ),
+        )
+
+    def contact(self, tg_id: int, phone: str) -> Update:
+        return self.message(tg_id, contact=Contact(phone_number=phone, first_name=f"u{tg_id}", user_id=tg_id))
+
+    def command(self, tg_id: int, command: str) -> Update:
+        from aiogram.types import MessageEntity
+
+        return self.message(tg_id, command, entities=[MessageEntity(type="bot_command", offset=0, length=len(command.split()[0]))])
+
+    def callback(self, tg_id: int, data: str) -> Update:
+        return Update(
+            update_id=next(self._update_ids),
+            callback_query=CallbackQuery(
+                id=str(next(self._callback_ids)),
+                from_user=self._user(tg_id),
+                chat_instance="bench",
+                data=data,
+                message=Message(
+                    message_id=next(self._message_ids),
+                    date=datetime.now(),
+                    chat=self._chat(tg_id),
+                    from_user=TgUser(id=1, is_bot=True, first_name="bot"),
+                    text="...",
+                ),
+            ),
+        )
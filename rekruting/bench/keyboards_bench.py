@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from app import keyboards
+from app.callbacks import ReportCb, ProblemCb
+
+CASES: list[tuple[str, Callable[..., Any], tuple, dict]] = [
+    ("main_menu_inline", keyboards.main_menu_inline, (), {"is_working": False}),
+    ("admin_menu_inline", keyboards.admin_menu_inline, (), {}),
+    ("urgency_inline", keyboards.urgency_inline, (), {}),
+    ("problem_type_inline", keyboards.problem_type_inline, (), {}),
+    ("city_pick_inline", keyboards.city_pick_inline, (), {}),
+    ("confirm_inline", keyboards.confirm_inline, (ReportCb, "confirm", "cancel"), {}),
+    ("done_inline", keyboards.done_inline, (ProblemCb, "media_done", "skip_media"), {}),
+]
+
+
+def _time_per_call(fn: Callable[..., Any], args: tuple, kwargs: dict, calls: int) -> float:
+    t = time.perf_counter()
+    for _ in range(calls):
+        fn(*args, **kwargs)
+    return (time.perf_counter() - t) / calls
+
+
+def _bytes_per_call(fn: Callable[..., Any], args: tuple, kwargs: dict, calls: int) -> float:
+    keep = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(calls):
+        keep.append(fn(*args, **kwargs))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / calls
+
+
+def run(calls: int) -> list[dict]:
+    results = []
+    for name, cached, args, kwargs in CASES:
+        uncached = cached.__wrapped__
+        cached(*args, **kwargs)
+        row = {
+            "builder": name,
+            "uncached_us": round(_time_per_call(uncached, args, kwargs, calls) * 1e6, 2),
+            "cached_us": round(_time_per_call(cached, args, kwargs, calls) * 1e6, 3),
+            "uncached_bytes": round(_bytes_per_call(uncached, args, kwargs, calls)),
+            "cached_bytes": round(_bytes_per_call(cached, args, kwargs, calls)),
+        }
+        row["speedup"] = round(row["uncached_us"] / max(row["cached_us"], 1e-3), 1)
+        results.append(row)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare cached and freshly built keyboard markups.")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    results = run(args.calls)
+    print(f"{'builder':<22}{'uncached µs':>13}{'cached µs':>11}{'uncached B':>12}{'cached B':>10}{'x':>8}")
+    for r in results:
+        print(
+            f"{r['builder']:<22}{r['uncached_us']:>13}{r['cached_us']:>11}"
+            f"{r['uncached_bytes']:>12}{r['cached_bytes']:>10}{r['speedup']:>8}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from sqlalchemy import event, select
+
+from app.callbacks import ProblemTypeCb, UrgencyCb
+from app.config import Config
+from app.db import make_engine, make_sessionmaker, init_db
+from app.main import build_dispatcher, setup_bot
+from app.models import Report
+from app.enums import ReportStatus
+from app.repositories import seed_defaults
+
+from .fake_telegram import FAKE_TOKEN, UpdateFactory, make_fake_bot
+
+ADMIN_TG_ID = 1
+WORKER_TG_BASE = 10_000
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    def __init__(self):
+        super().__init__()
+        self.samples: dict[str, list[float]] = defaultdict(list)
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        name = data["handler"].callback.__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.samples[name].append(time.perf_counter() - started)
+
+
+class Pacer:
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self._interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def registration_flow(f: UpdateFactory, tg_id: int, city: str) -> list:
+    return [
+        f.command(tg_id, "/start"),
+        f.message(tg_id, "Имя"),
+        f.message(tg_id, "Фамилия"),
+        f.message(tg_id, "Курьер"),
+        f.contact(tg_id, f"+48{tg_id:09d}"),
+        f.message(tg_id, "Лидер"),
+        f.callback(tg_id, f"city:set:{city}"),
+    ]
+
+
+def report_flow(f: UpdateFactory, tg_id: int) -> list:
+    return [
+        f.callback(tg_id, "menu:report"),
+        f.message(tg_id, "сегодня"),
+        f.callback(tg_id, "r:skip_partner"),
+        f.callback(tg_id, "wt:toggle:1"),
+        f.callback(tg_id, "wt:toggle:3"),
+        f.callback(tg_id, "wt:next"),
+        f.message(tg_id, "12"),
+        f.message(tg_id, "4"),
+        f.message(tg_id, "09:00"),
+        f.message(tg_id, "17:30"),
+        f.callback(tg_id, "r:skip_comment"),
+        f.callback(tg_id, "r:skip_media"),
+        f.callback(tg_id, "r:confirm"),
+    ]
+
+
+def problem_flow(f: UpdateFactory, tg_id: int) -> list:
+    return [
+        f.callback(tg_id, "menu:problem"),
+        f.callback(tg_id, ProblemTypeCb(index=0).pack()),
+        f.message(tg_id, "Не заряжается самокат"),
+        f.message(tg_id, "ul. Marszałkowska 1"),
+        f.message(tg_id, f"SC-{tg_id}"),
+        f.callback(tg_id, "p:skip_media"),
+        f.callback(tg_id, UrgencyCb(action="urgency", level="medium").pack()),
+        f.callback(tg_id, "p:confirm"),
+    ]
+
+
+class Harness:
+    def __init__(self, database_url: str, rate: float, latency: float):
+        self.config = Config(
+            bot_token=FAKE_TOKEN,
+            database_url=database_url,
+            admin_ids={ADMIN_TG_ID},
+            google_sheets=None,
+        )
+        self.engine = make_engine(database_url)
+        self.sessionmaker = make_sessionmaker(self.engine)
+        self.dp = build_dispatcher(self.config, self.engine, self.sessionmaker, None)
+        self.bot = setup_bot(make_fake_bot(latency))
+        self.pacer = Pacer(rate)
+        self.factory = UpdateFactory()
+
+        self.timing = HandlerTimingMiddleware()
+        self.dp.message.middleware(self.timing)
+        self.dp.callback_query.middleware(self.timing)
+
+        self.statements = 0
+        self.write_commits = 0
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self._on_statement)
+        event.listen(self.engine.sync_engine, "commit", self._on_commit)
+
+        self.update_latency: list[float] = []
+        self.errors = 0
+
+    def _on_statement(self, conn, cursor, statement: str, *args: Any) -> None:
+        self.statements += 1
+        if statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+            conn.info["wrote"] = True
+
+    def _on_commit(self, conn) -> None:
+        if conn.info.pop("wrote", False):
+            self.write_commits += 1
+
+    async def setup(self) -> None:
+        await init_db(self.engine)
+        async with self.sessionmaker() as session:
+            await seed_defaults(session)
+            await session.commit()
+        await self.dp.storage.load()
+        self.dp.storage.start()
+
+    async def feed(self, update) -> None:
+        await self.pacer.wait()
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            self.errors += 1
+        self.update_latency.append(time.perf_counter() - started)
+
+    async def run_script(self, updates: list) -> None:
+        for u in updates:
+            await self.feed(u)
+
+    async def phase(self, name: str, scripts: list[list]) -> dict:
+        self.timing.samples.clear()
+        self.update_latency.clear()
+        statements_before = self.statements
+        commits_before = self.write_commits
+        db_sessions = self.dp["db_sessions"]
+        updates_before, sessions_before = db_sessions.updates, db_sessions.sessions_opened
+        calls_before = sum(self.bot.session.calls.values())
+        errors_before = self.errors
+
+        started = time.perf_counter()
+        await asyncio.gather(*(self.run_script(s) for s in scripts))
+        await self.dp.storage.flush()
+        elapsed = time.perf_counter() - started
+
+        n = len(self.update_latency)
+        return {
+            "phase": name,
+            "updates": n,
+            "seconds": round(elapsed, 3),
+            "updates_per_sec": round(n / elapsed, 1) if elapsed else None,
+            "update_latency": _percentiles(self.update_latency),
+            "handlers": {k: _percentiles(v) | {"count": len(v)} for k, v in sorted(self.timing.samples.items())},
+            "db_statements": self.statements - statements_before,
+            "db_statements_per_update": round((self.statements - statements_before) / n, 2) if n else None,
+            "db_write_commits": self.write_commits - commits_before,
+            "db_sessions": db_sessions.sessions_opened - sessions_before,
+            "db_session_updates": db_sessions.updates - updates_before,
+            "api_calls": sum(self.bot.session.calls.values()) - calls_before,
+            "errors": self.errors - errors_before,
+        }
+
+    async def pending_report_ids(self) -> list[int]:
+        async with self.sessionmaker() as session:
+            return (await session.execute(
+                select(Report.id).where(Report.status == ReportStatus.PENDING).order_by(Report.id)
+            )).scalars().all()
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {"p50_ms": pick(0.50), "p99_ms": pick(0.99), "mean_ms": round(statistics.fmean(ordered) * 1000, 2)}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="loadsim_"), "bot.db")
+    h = Harness(f"sqlite+aiosqlite:///{db_path}", args.rate, args.latency)
+    await h.setup()
+
+    if args.trace_memory:
+        tracemalloc.start()
+    f = h.factory
+    workers = [WORKER_TG_BASE + i for i in range(args.workers)]
+    cities = ["Варшава", "Вроцлав"]
+
+    phases = [
+        await h.phase("registration", [registration_flow(f, tg, cities[i % 2]) for i, tg in enumerate(workers)]),
+        await h.phase("reports", [report_flow(f, tg) for tg in workers]),
+        await h.phase("problems", [problem_flow(f, tg) for tg in workers[: max(1, args.workers // 5)]]),
+    ]
+    await h.feed(f.command(ADMIN_TG_ID, "/start"))
+    pending = await h.pending_report_ids()
+    phases.append(await h.phase("admin_accept", [[f.callback(ADMIN_TG_ID, f"r:accept:{rid}") for rid in pending]]))
+
+    peak = None
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    await h.dp.storage.close()
+    await h.bot.session.close()
+    await h.engine.dispose()
+
+    return {
+        "workers": args.workers,
+        "target_rate": args.rate,
+        "api_latency_ms": args.latency * 1000,
+        "database": db_path,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_traced_memory_mb": round(peak / 1024 / 1024, 2) if peak is not None else None,
+        "api_calls_by_method": dict(h.bot.session.calls),
+        "phases": phases,
+    }
+
+
+def _print(result: dict) -> None:
+    print(f"workers={result['workers']} rate={result['target_rate']}/s api_latency={result['api_latency_ms']}ms "
+          f"max_rss={result['max_rss_mb']}MB traced_peak={result['peak_traced_memory_mb']}MB")
+    for ph in result["phases"]:
+        lat = ph["update_latency"]
+        print(f"\n[{ph['phase']}] {ph['updates']} updates in {ph['seconds']}s ({ph['updates_per_sec']}/s), "
+              f"p50={lat.get('p50_ms')}ms p99={lat.get('p99_ms')}ms, "
+              f"db={ph['db_statements']} ({ph['db_statements_per_update']}/update), commits={ph['db_write_commits']}, "
+              f"sessions={ph['db_sessions']}/{ph['db_session_updates']} updates, errors={ph['errors']}")
+        for name, st in ph["handlers"].items():
+            print(f"  {name:<28} n={st['count']:<6} p50={st['p50_ms']}ms p99={st['p99_ms']}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drive the bot Dispatcher with synthetic updates.")
+    parser.add_argument("--workers", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=200.0, help="target updates per second (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Telegram API latency, seconds")
+    parser.add_argument("--db", default=None, help="SQLite file (default: fresh temp file)")
+    parser.add_argument("--trace-memory", action="store_true", help="track Python allocations (slows the run)")
+    parser.add_argument("--json", default=None, help="write full results to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    _print(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
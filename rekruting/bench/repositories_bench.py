@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Any, Awaitable, Callable
+
+import sqlalchemy
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app import repositories as repo
+from app.db import make_engine, make_sessionmaker, init_db
+from app.enums import ReportStatus, MediaType, ProblemUrgency, DeliveryStatus
+from app.models import User, WorkType, Report, ReportTask, ReportEditLog, WorkSession, Problem
+
+SEED_CHUNK = 10_000
+CITIES = ["Варшава", "Вроцлав", "Краков", "Гданьск"]
+
+Case = Callable[[AsyncSession, "Context"], Awaitable[Any]]
+
+
+class Context:
+    def __init__(self, users: int, reports: int, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.users = users
+        self.reports = reports
+        self.today = date.today()
+
+    def user_id(self) -> int:
+        return self.rng.randint(1, self.users)
+
+    def tg_id(self) -> int:
+        return 100_000 + self.user_id()
+
+    def report_id(self) -> int:
+        return self.rng.randint(1, self.reports)
+
+    def day(self) -> date:
+        return self.today - timedelta(days=self.rng.randint(0, 364))
+
+
+async def _insert_chunked(conn, table, rows_iter) -> None:
+    chunk: list[dict] = []
+    for row in rows_iter:
+        chunk.append(row)
+        if len(chunk) >= SEED_CHUNK:
+            await conn.execute(insert(table), chunk)
+            chunk.clear()
+    if chunk:
+        await conn.execute(insert(table), chunk)
+
+
+async def seed(engine: AsyncEngine, sm: async_sessionmaker[AsyncSession], args: argparse.Namespace) -> None:
+    await init_db(engine)
+    async with sm() as session:
+        await repo.seed_defaults(session)
+        await session.commit()
+        existing = (await session.execute(select(func.count(Report.id)))).scalar_one()
+        n_wt = (await session.execute(select(func.count(WorkType.id)))).scalar_one()
+    if existing:
+        print(f"Reusing seeded database ({existing} reports).")
+        return
+
+    rng = random.Random(1)
+    today = date.today()
+    now = datetime.now().replace(microsecond=0)
+    started = time.perf_counter()
+
+    async with engine.begin() as conn:
+        await _insert_chunked(conn, User.__table__, (
+            {
+                "id": i, "tg_id": 100_000 + i, "first_name": f"Имя{i}", "last_name": f"Фамилия{i}",
+                "position": "курьер", "city": CITIES[i % len(CITIES)], "phone": f"+48{i:09d}",
+                "leader": f"Лидер{i % 25}", "is_admin": i <= 3, "is_working": False, "created_at": now,
+            }
+            for i in range(1, args.users + 1)
+        ))
+
+        statuses = [ReportStatus.PENDING, ReportStatus.ACCEPTED, ReportStatus.ACCEPTED, ReportStatus.REJECTED]
+        await _insert_chunked(conn, Report.__table__, (
+            {
+                "id": i, "user_id": rng.randint(1, args.users),
+                "report_date": today - timedelta(days=rng.randint(0, 364)),
+                "start_time": dt_time(9, 0), "end_time": dt_time(17, 0), "partner_name": None,
+                "comment": "комментарий" if i % 7 == 0 else None, "status": statuses[i % 4].name,
+                "admin_comment": None, "edit_count": 0, "created_at": now - timedelta(minutes=args.reports - i),
+            }
+            for i in range(1, args.reports + 1)
+        ))
+
+        per_report = max(1, min(n_wt, args.tasks // max(1, args.reports)))
+        await _insert_chunked(conn, ReportTask.__table__, (
+            {"report_id": r, "work_type_id": wt, "quantity": rng.randint(1, 40)}
+            for r in range(1, args.reports + 1)
+            for wt in range(1, per_report + 1)
+        ))
+
+        def sessions():
+            for i in range(1, args.sessions + 1):
+                start = now - timedelta(days=rng.randint(1, 364), hours=rng.randint(0, 12))
+                yield {
+                    "user_id": rng.randint(1, args.users), "started_at": start,
+                    "ended_at": start + timedelta(hours=rng.randint(4, 10)),
+                    "linked_report_id": rng.randint(1, args.reports) if i % 2 else None,
+                }
+        await _insert_chunked(conn, WorkSession.__table__, sessions())
+
+        await _insert_chunked(conn, Problem.__table__, (
+            {
+                "user_id": rng.randint(1, args.users), "problem_type": "поломка техники",
+                "description": "описание", "address": "адрес", "scooter_number": f"SC{i % 5000}",
+                "urgency": ProblemUrgency.MEDIUM.name, "created_at": now - timedelta(minutes=i),
+            }
+            for i in range(1, args.problems + 1)
+        ))
+
+        await _insert_chunked(conn, ReportEditLog.__table__, (
+            {
+                "report_id": rng.randint(1, args.reports), "editor_user_id": rng.randint(1, args.users),
+                "edited_at": now - timedelta(minutes=i), "old_snapshot_json": "{}", "new_snapshot_json": "{}",
+            }
+            for i in range(1, args.reports // 100 + 1)
+        ))
+
+    print(f"Seeded in {time.perf_counter() - started:.1f}s.")
+
+
+def build_cases() -> dict[str, Case]:
+    async def create_report(s: AsyncSession, c: Context):
+        return await repo.create_report(
+            s, c.user_id(), c.day(), dt_time(9), dt_time(17), None, "bench", [(1, 5), (2, 3)], ("file", MediaType.PHOTO, f"u{c.rng.randint(1, 500)}"),
+        )
+
+    async def update_report_with_log(s: AsyncSession, c: Context):
+        return await repo.update_report_with_log(
+            s, c.report_id(), c.user_id(), c.day(), dt_time(8), dt_time(16), "напарник", "edit", [(1, 7)], None,
+        )
+
+    async def start_stop_work(s: AsyncSession, c: Context):
+        user = await repo.get_or_create_user(s, c.tg_id())
+        await repo.start_work(s, user)
+        return await repo.stop_work(s, user)
+
+    async def broadcast_cycle(s: AsyncSession, c: Context):
+        bc = await repo.create_broadcast(s, "bench", 1, city=CITIES[0])
+        await repo.set_broadcast_progress_message(s, bc.id, 1, 1)
+        batch = await repo.list_pending_deliveries(s, bc.id, limit=100)
+        await repo.record_deliveries(s, bc.id, [(d_id, None) for d_id, _ in batch])
+        return await repo.finish_broadcast(s, bc.id)
+
+    async def outbox_cycle(s: AsyncSession, c: Context):
+        await repo.enqueue_notifications(s, [
+            {"chat_id": c.tg_id(), "kind": "message", "body": "bench"} for _ in range(20)
+        ])
+        heads = await repo.list_outbox_heads(s, datetime.utcnow(), limit=50)
+        await repo.record_outbox_results(s, [n.id for n in heads], [], [])
+        return await repo.purge_outbox(s, datetime.utcnow() - timedelta(days=14))
+
+    async def fsm_cycle(s: AsyncSession, c: Context):
+        keys = [f"[1,{c.tg_id()},{c.tg_id()},null,null,\"default\"]" for _ in range(20)]
+        await repo.save_fsm_states(s, [
+            {"key": k, "state": "Registration:city", "data": '{"first_name": "Имя"}', "updated_at": datetime.utcnow()}
+            for k in keys
+        ], keys[:5])
+        return await repo.list_fsm_states(s)
+
+    async def escalates_incident(s: AsyncSession, c: Context):
+        p = await repo.create_problem(
+            s, c.user_id(), "поломка техники", "описание", "адрес", f"SC{c.rng.randint(1, 50)}", ProblemUrgency.MEDIUM, [],
+            incident_window_hours=6,
+        )
+        return await repo.escalates_incident(s, p)
+
+    async def is_user_registered(s: AsyncSession, c: Context):
+        return await repo.is_user_registered(await repo.get_or_create_user(s, c.tg_id()))
+
+    cases: dict[str, Case] = {
+        "get_or_create_user": lambda s, c: repo.get_or_create_user(s, c.tg_id()),
+        "is_user_registered": is_user_registered,
+        "get_user": lambda s, c: repo.get_user(s, c.tg_id()),
+        "save_user_profile": lambda s, c: repo.save_user_profile(s, c.tg_id(), {
+            "first_name": "Имя", "last_name": "Фамилия", "position": "Курьер",
+            "phone": "+48000000000", "leader": "Лидер", "city": CITIES[0],
+        }),
+        "fsm_cycle": fsm_cycle,
+        "seed_defaults": lambda s, c: repo.seed_defaults(s),
+        "get_setting_bool": lambda s, c: repo.get_setting_bool(s, "photo_required_reports"),
+        "set_setting_bool": lambda s, c: repo.set_setting_bool(s, "photo_required_reports", False),
+        "get_setting_text": lambda s, c: repo.get_setting_text(s, "motd"),
+        "set_setting_text": lambda s, c: repo.set_setting_text(s, "motd", ""),
+        "list_active_work_types": lambda s, c: repo.list_active_work_types(s),
+        "add_work_type": lambda s, c: repo.add_work_type(s, "деплой"),
+        "list_pay_rates": lambda s, c: repo.list_pay_rates(s),
+        "set_pay_rate": lambda s, c: repo.set_pay_rate(s, 1, 250),
+        "set_hourly_rate": lambda s, c: repo.set_hourly_rate(s, 3000),
+        "get_work_type_by_name": lambda s, c: repo.get_work_type_by_name(s, "деплой"),
+        "start_work+stop_work": start_stop_work,
+        "close_stale_work_sessions": lambda s, c: repo.close_stale_work_sessions(s, 14),
+        "list_tg_ids_missing_report": lambda s, c: repo.list_tg_ids_missing_report(s, c.day()),
+        "get_last_closed_session_for_date": lambda s, c: repo.get_last_closed_session_for_date(s, c.user_id(), c.day()),
+        "link_session_to_report": lambda s, c: repo.link_session_to_report(s, c.rng.randint(1, 1000), c.report_id()),
+        "create_report": create_report,
+        "get_report_with_user_and_tasks": lambda s, c: repo.get_report_with_user_and_tasks(s, c.report_id()),
+        "list_user_reports": lambda s, c: repo.list_user_reports(s, c.user_id(), limit=10),
+        "sum_user_tasks_for_month": lambda s, c: repo.sum_user_tasks_for_month(s, c.user_id(), c.today.year, c.today.month),
+        "list_pending_reports": lambda s, c: repo.list_pending_reports(s, limit=30),
+        "list_recent_reports": lambda s, c: repo.list_recent_reports(s, limit=20),
+        "list_recent_report_edits": lambda s, c: repo.list_recent_report_edits(s, limit=20),
+        "list_recent_problems": lambda s, c: repo.list_recent_problems(s, limit=20),
+        "set_report_status": lambda s, c: repo.set_report_status(s, c.report_id(), ReportStatus.ACCEPTED, None),
+        "set_reports_status_bulk": lambda s, c: repo.set_reports_status_bulk(
+            s, [c.report_id() for _ in range(20)], ReportStatus.ACCEPTED, None
+        ),
+        "update_report_with_log": update_report_with_log,
+        "get_report_version": lambda s, c: repo.get_report_version(s, c.report_id(), 0),
+        "create_problem": lambda s, c: repo.create_problem(
+            s, c.user_id(), "поломка техники", "описание", "адрес", "SC1", ProblemUrgency.LOW, [("f", MediaType.PHOTO, f"u{c.rng.randint(1, 500)}")]
+        ),
+        "get_media_fingerprints": lambda s, c: repo.get_media_fingerprints(s, [f"u{c.rng.randint(1, 500)}" for _ in range(5)]),
+        "mark_media_sent_to_admins": lambda s, c: repo.mark_media_sent_to_admins(s, [f"u{c.rng.randint(1, 500)}"]),
+        "create_problem(incident)": lambda s, c: repo.create_problem(
+            s, c.user_id(), "поломка техники", "описание", "адрес", f"SC{c.rng.randint(1, 50)}", ProblemUrgency.LOW, [],
+            incident_window_hours=6,
+        ),
+        "escalates_incident": escalates_incident,
+        "list_incidents_for_digest": lambda s, c: repo.list_incidents_for_digest(s),
+        "mark_incidents_digested": lambda s, c: repo.mark_incidents_digested(s, [(c.rng.randint(1, 50), 0)]),
+        "search(problems)": lambda s, c: repo.search(s, "problems", c.rng.choice(["адрес", "SC1", "поломка"]), 0),
+        "search(reports)": lambda s, c: repo.search(s, "reports", "комментарий", c.rng.randint(0, 5)),
+        "list_workers": lambda s, c: repo.list_workers(s, limit=30),
+        "broadcast_cycle": broadcast_cycle,
+        "list_running_broadcast_ids": lambda s, c: repo.list_running_broadcast_ids(s),
+        "outbox_cycle": outbox_cycle,
+        "outbox_stats": lambda s, c: repo.outbox_stats(s),
+        "list_outbox": lambda s, c: repo.list_outbox(s, DeliveryStatus.FAILED, limit=10),
+    }
+    return cases
+
+
+def public_repository_functions() -> set[str]:
+    return {
+        name for name, fn in inspect.getmembers(repo, inspect.iscoroutinefunction)
+        if not name.startswith("_") and fn.__module__ == repo.__name__
+    }
+
+
+def covered_functions(cases: dict[str, Case]) -> set[str]:
+    covered: set[str] = set()
+    public = public_repository_functions()
+    for name, case in cases.items():
+        src = inspect.getsource(case) if name not in public else f"repo.{name}("
+        covered |= {fn for fn in public if f"repo.{fn}(" in src}
+    return covered
+
+
+async def run_cases(sm: async_sessionmaker[AsyncSession], ctx: Context, cases: dict[str, Case],
+                    repeat: int, only: set[str] | None) -> dict[str, dict]:
+    results: dict[str, dict] = {}
+    for name, case in cases.items():
+        if only and name not in only:
+            continue
+        samples: list[float] = []
+        async with sm() as session:
+            await case(session, ctx)
+            await session.commit()
+        for _ in range(repeat):
+            async with sm() as session:
+                started = time.perf_counter()
+                await case(session, ctx)
+                await session.commit()
+                samples.append(time.perf_counter() - started)
+        samples.sort()
+        results[name] = {
+            "runs": repeat,
+            "min_ms": round(samples[0] * 1000, 3),
+            "median_ms": round(statistics.median(samples) * 1000, 3),
+            "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))] * 1000, 3),
+        }
+        print(f"{name:<36} median={results[name]['median_ms']:>10.3f}ms  p95={results[name]['p95_ms']:>10.3f}ms")
+    return results
+
+
+def compare(old_path: str, new: dict) -> None:
+    with open(old_path, encoding="utf-8") as fh:
+        old = json.load(fh)
+    print(f"\nCompared with {old_path} ({old['meta'].get('git_rev')}):")
+    for name, cur in new["results"].items():
+        prev = old["results"].get(name)
+        if not prev:
+            print(f"  {name:<36} new")
+            continue
+        delta = (cur["median_ms"] - prev["median_ms"]) / prev["median_ms"] * 100 if prev["median_ms"] else 0.0
+        flag = "  <-- regression" if delta > 20 else ""
+        print(f"  {name:<36} {prev['median_ms']:>10.3f} -> {cur['median_ms']:>10.3f}ms ({delta:+.1f}%){flag}")
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tempfile.gettempdir(), 'repo_bench.db')}"
+    engine = make_engine(database_url)
+    sm = make_sessionmaker(engine)
+    await seed(engine, sm, args)
+
+    async with sm() as session:
+        n_users = (await session.execute(select(func.count(User.id)))).scalar_one()
+        n_reports = (await session.execute(select(func.count(Report.id)))).scalar_one()
+
+    cases = build_cases()
+    results = await run_cases(sm, Context(n_users, n_reports), cases, args.repeat, set(args.only or []) or None)
+    await engine.dispose()
+
+    uncovered = sorted(public_repository_functions() - covered_functions(cases))
+    if uncovered:
+        print(f"\nNot covered by a case: {', '.join(uncovered)}")
+
+    return {
+        "meta": {
+            "git_rev": _git_rev(),
+            "database_url": database_url,
+            "users": n_users,
+            "reports": n_reports,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+        "uncovered": uncovered,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time repositories.py functions against a seeded database.")
+    parser.add_argument("--database-url", default=None, help="default: sqlite file in the temp dir (reused between runs)")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--reports", type=int, default=100_000)
+    parser.add_argument("--tasks", type=int, default=300_000)
+    parser.add_argument("--sessions", type=int, default=50_000)
+    parser.add_argument("--problems", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", nargs="*", help="run only these cases")
+    parser.add_argument("--json", default=None, help="write results to this file")
+    parser.add_argument("--compare", default=None, help="previous results JSON to diff against")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(args.compare, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any
+
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StorageKey
+
+from app.callbacks import (
+    CallbackPrefix,
+    MenuCb,
+    WorkCb,
+    ReportCb,
+    WorkTypeToggleCb,
+    ProblemCb,
+    ProblemTypeCb,
+    UrgencyCb,
+    HistoryCb,
+    CityPickCb,
+    AdminCb,
+    AdminHistoryCb,
+    ReviewCb,
+    BulkPickCb,
+    SettingToggleCb,
+    WorkerMsgCb,
+    BroadcastCb,
+    SearchCb,
+    BackupCb,
+)
+from app.config import Config
+from app.db import make_engine, make_sessionmaker, init_db
+from app.main import build_dispatcher
+from app.states import Registration, ReportCreate, ProblemCreate, AdminBulkReview, AdminBroadcast
+
+from .fake_telegram import FAKE_TOKEN, UpdateFactory, make_fake_bot
+
+USERS_PER_CASE = 2_000
+BASE_TG_ID = 10_000_000
+
+CASES: list[tuple[str, str, State | None]] = [
+    ("menu:main", MenuCb(action="main").pack(), None),
+    ("work:start", WorkCb(action="start").pack(), None),
+    ("city:set", CityPickCb(action="set", city="Варшава").pack(), Registration.city),
+    ("menu:report", MenuCb(action="report").pack(), None),
+    ("wt:toggle", WorkTypeToggleCb(action="toggle", work_type_id=3).pack(), ReportCreate.work_types),
+    ("r:confirm", ReportCb(action="confirm").pack(), ReportCreate.confirm),
+    ("menu:problem", MenuCb(action="problem").pack(), None),
+    ("pt", ProblemTypeCb(index=2).pack(), ProblemCreate.ptype),
+    ("p:urgency", UrgencyCb(action="urgency", level="low").pack(), ProblemCreate.urgency),
+    ("p:confirm", ProblemCb(action="confirm").pack(), ProblemCreate.confirm),
+    ("my:edit", HistoryCb(action="edit", report_id=42).pack(), None),
+    ("admin:pending", AdminCb(action="pending").pack(), None),
+    ("admin:history", AdminHistoryCb(action="history", kind="problems").pack(), None),
+    ("r:accept", ReviewCb(action="accept", report_id=42).pack(), None),
+    ("rb:toggle", BulkPickCb(action="toggle", report_id=42).pack(), AdminBulkReview.select),
+    ("set:toggle", SettingToggleCb(action="toggle", key="photo_required_reports").pack(), None),
+    ("admin:msg", WorkerMsgCb(action="msg", tg_id=42).pack(), None),
+    ("bc:all", BroadcastCb(action="all").pack(), AdminBroadcast.audience),
+    ("sr", SearchCb(kind="problems", page=1).pack(), None),
+    ("bk:cancel", BackupCb(action="cancel").pack(), None),
+]
+
+
+async def _noop(*args: Any, **kwargs: Any) -> None:
+    return None
+
+
+def _stub_handlers(dp) -> None:
+    for router in dp.chain_tail:
+        observer = router.callback_query
+        observer.handlers = [HandlerObject(callback=_noop, filters=h.filters, flags=h.flags) for h in observer.handlers]
+
+
+def _drop_prefix_index(dp) -> None:
+    for router in dp.chain_tail:
+        root = router.callback_query._handler
+        if root.filters:
+            root.filters = [f for f in root.filters if not isinstance(f.callback, CallbackPrefix)]
+
+
+class _CheckCounter:
+    def __init__(self):
+        self.count = 0
+        self._orig = HandlerObject.check
+
+    def __enter__(self) -> "_CheckCounter":
+        orig = self._orig
+        counter = self
+
+        async def check(obj, *args: Any, **kwargs: Any):
+            counter.count += 1
+            return await orig(obj, *args, **kwargs)
+
+        HandlerObject.check = check
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        HandlerObject.check = self._orig
+
+
+async def _measure(dp, bot, factory: UpdateFactory, first_tg_id: int, calls: int) -> dict[str, dict]:
+    results: dict[str, dict] = {}
+    for i, (name, data, _) in enumerate(CASES):
+        first = first_tg_id + i * USERS_PER_CASE
+        updates = [factory.callback(first + n % USERS_PER_CASE, data) for n in range(calls)]
+        with _CheckCounter() as counter:
+            started = time.perf_counter()
+            for u in updates:
+                await dp.feed_update(bot, u)
+            elapsed = time.perf_counter() - started
+        results[name] = {
+            "us_per_callback": round(elapsed / calls * 1e6, 1),
+            "handler_checks": round(counter.count / calls, 1),
+        }
+    return results
+
+
+async def run(calls: int) -> list[dict]:
+    database_url = f"sqlite+aiosqlite:///{os.path.join(tempfile.gettempdir(), 'routing_bench.db')}"
+    engine = make_engine(database_url)
+    sessionmaker = make_sessionmaker(engine)
+    await init_db(engine)
+
+    span = USERS_PER_CASE * len(CASES)
+    config = Config(
+        bot_token=FAKE_TOKEN,
+        database_url=database_url,
+        admin_ids=set(range(BASE_TG_ID, BASE_TG_ID + 3 * span)),
+        google_sheets=None,
+    )
+    dp = build_dispatcher(config, engine, sessionmaker, None)
+    _stub_handlers(dp)
+    bot = make_fake_bot()
+    factory = UpdateFactory()
+
+    for first in (BASE_TG_ID, BASE_TG_ID + span, BASE_TG_ID + 2 * span):
+        for i, (_, _, state) in enumerate(CASES):
+            if state is None:
+                continue
+            for tg_id in range(first + i * USERS_PER_CASE, first + (i + 1) * USERS_PER_CASE):
+                await dp.storage.set_state(StorageKey(bot_id=bot.id, chat_id=tg_id, user_id=tg_id), state)
+
+    await _measure(dp, bot, factory, BASE_TG_ID, min(calls, 50))
+    indexed = await _measure(dp, bot, factory, BASE_TG_ID + span, calls)
+    _drop_prefix_index(dp)
+    scan = await _measure(dp, bot, factory, BASE_TG_ID + 2 * span, calls)
+
+    await dp.storage.close()
+    await engine.dispose()
+    return [{"callback": name, "scan": scan[name], "indexed": indexed[name]} for name, _, _ in CASES]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure callback routing cost with and without the router prefix index.")
+    parser.add_argument("--calls", type=int, default=USERS_PER_CASE)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(min(args.calls, USERS_PER_CASE)))
+    print(f"{'callback':<16}{'scan µs':>10}{'checks':>8}{'indexed µs':>12}{'checks':>8}")
+    for r in results:
+        print(
+            f"{r['callback']:<16}{r['scan']['us_per_callback']:>10}{r['scan']['handler_checks']:>8}"
+            f"{r['indexed']['us_per_callback']:>12}{r['indexed']['handler_checks']:>8}"
+        )
+    n = len(results)
+    print(
+        f"{'mean':<16}{sum(r['scan']['us_per_callback'] for r in results) / n:>10.1f}"
+        f"{sum(r['scan']['handler_checks'] for r in results) / n:>8.1f}"
+        f"{sum(r['indexed']['us_per_callback'] for r in results) / n:>12.1f}"
+        f"{sum(r['indexed']['handler_checks'] for r in results) / n:>8.1f}"
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+IMPORT_PROBE = (
+    "import sys, time\n"
+    "t = time.perf_counter()\n"
+    "import app.main\n"
+    "dt = time.perf_counter() - t\n"
+    "print(dt, int('googleapiclient' in sys.modules), len(sys.modules))\n"
+)
+
+
+def measure_imports(runs: int) -> dict:
+    samples: list[float] = []
+    google_loaded = 0
+    modules = 0
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable, "-c", IMPORT_PROBE], cwd=cwd, text=True)
+        dt, google, mods = out.split()
+        samples.append(float(dt))
+        google_loaded = int(google)
+        modules = int(mods)
+    return {
+        "runs": runs,
+        "import_app_main_ms_median": round(statistics.median(samples) * 1000, 1),
+        "import_app_main_ms_min": round(min(samples) * 1000, 1),
+        "googleapiclient_imported": bool(google_loaded),
+        "modules_loaded": modules,
+    }
+
+
+async def measure_first_update() -> dict:
+    from app.config import Config
+    from app.db import make_engine, make_sessionmaker, init_db
+    from app.main import build_dispatcher, setup_bot
+    from app.repositories import seed_defaults
+
+    from .fake_telegram import FAKE_TOKEN, UpdateFactory, make_fake_bot
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="startup_"), "bot.db")
+    t0 = time.perf_counter()
+    config = Config(bot_token=FAKE_TOKEN, database_url=f"sqlite+aiosqlite:///{db_path}", admin_ids=set(), google_sheets=None)
+    engine = make_engine(config.database_url)
+    sessionmaker = make_sessionmaker(engine)
+    dp = build_dispatcher(config, engine, sessionmaker, None)
+    bot = setup_bot(make_fake_bot())
+    t_built = time.perf_counter()
+
+    await init_db(engine)
+    async with sessionmaker() as session:
+        await seed_defaults(session)
+        await session.commit()
+    t_db = time.perf_counter()
+
+    await dp.feed_update(bot, UpdateFactory().command(42, "/start"))
+    t_first = time.perf_counter()
+
+    await bot.session.close()
+    await engine.dispose()
+    return {
+        "build_dispatcher_ms": round((t_built - t0) * 1000, 1),
+        "init_db_ms": round((t_db - t_built) * 1000, 1),
+        "first_update_ms": round((t_first - t_db) * 1000, 1),
+        "ready_to_first_reply_ms": round((t_first - t0) * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure cold import time and first-update latency.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    result = {"imports": measure_imports(args.runs), "first_update": asyncio.run(measure_first_update())}
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()